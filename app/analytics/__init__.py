@@ -0,0 +1,38 @@
+"""
+Cálculo de indicadores SST sin Streamlit: funciones puras sobre DataFrames,
+memorizadas por versión de los datos. Los módulos de app/modules solo
+muestran los resultados.
+"""
+from app.analytics.kpis import (
+    NIVEL_RIESGO_CRITICO, DIAS_AVISO_EPP, contar_valores, calcular_tasa_frecuencia,
+    calcular_tasa_severidad, calcular_kpis, indicadores_legales, kpis_incidentes, kpis_epp
+)
+from app.analytics.indicadores import (
+    AREA_TOTAL, VENTANAS, COLUMNAS_INDICADORES, hora_local, accidentes_mensuales, calcular_indicadores,
+    serie_indicadores, totales_periodo
+)
+from app.analytics.tendencias import (
+    COLUMNAS_RESUMEN_INCIDENTES, resumir_incidentes, tendencia_mensual, conteo_por, conteo_por_hora
+)
+from app.analytics.riesgos import (
+    NIVELES, cubo_riesgos, opciones, matriz_riesgo, nivel_promedio, conteo_dimension, filtrar_riesgos
+)
+from app.analytics.memo import clave_version, memorizar, limpiar_memo
+
+def _clave_datos(nombre, data, filtros, hoy=None):
+    """
+    Clave de memo de un cálculo sobre data: incluye data['origen'] porque
+    cada carga (dashboard, reportes) aplica sus propias consultas a los
+    mismos filtros
+    """
+    return clave_version(f"{nombre}:{data.get('origen', '')}", filtros, data.get('versiones'), hoy)
+
+def kpis_por_version(data, filtros, hoy=None):
+    """calcular_kpis memorizado por filtros y data['versiones'] (si la carga las trae)"""
+    clave = _clave_datos('kpis', data, filtros, hoy)
+    return memorizar(clave, lambda: calcular_kpis(data, hoy))
+
+def cubo_por_version(data, filtros):
+    """cubo_riesgos de data['riesgos'] memorizado por filtros y data['versiones']"""
+    clave = _clave_datos('cubo_riesgos', data, filtros)
+    return memorizar(clave, lambda: cubo_riesgos(data['riesgos']))
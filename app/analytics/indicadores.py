@@ -0,0 +1,163 @@
+import pandas as pd
+from app.analytics.kpis import calcular_tasa_frecuencia, calcular_tasa_severidad
+
+AREA_TOTAL = 'TOTAL'  # Fila que agrega toda la empresa
+ZONA_HORARIA = 'America/Lima'
+MESES_VENTANA = 12
+VENTANAS = ('mensual', '12m')
+
+COMPONENTES = ['accidentes', 'dias_perdidos', 'horas_hombre', 'trabajadores']
+COLUMNAS_INDICADORES = [
+    'periodo', 'area', 'ventana', *COMPONENTES,
+    'tasa_frecuencia', 'tasa_severidad', 'indice_incidencia'
+]
+
+def hora_local(serie):
+    """
+    Fechas en hora de Lima sin zona. El texto ISO y las fechas con zona se
+    convierten (sin zona = UTC, como las devuelve Supabase); una columna
+    datetime64 sin zona se asume ya en hora local (app/utils/esquemas.py).
+    """
+    if pd.api.types.is_datetime64_dtype(serie) and getattr(serie.dt, 'tz', None) is None:
+        return serie
+    fechas = pd.to_datetime(serie, errors='coerce', utc=True, format='ISO8601')
+    return fechas.dt.tz_convert(ZONA_HORARIA).dt.tz_localize(None)
+
+def _periodo(serie):
+    """Primer día del mes de cada fecha, en hora de Lima"""
+    return hora_local(serie).dt.to_period('M').dt.to_timestamp()
+
+def accidentes_mensuales(incidentes):
+    """
+    Accidentes por mes y área.
+
+    Args:
+        incidentes: DataFrame con fecha_hora, area y tipo
+
+    Returns:
+        DataFrame periodo, area, accidentes; incluye las filas del área
+        AREA_TOTAL (todos los accidentes, también los que no tienen área)
+    """
+    if incidentes is None or incidentes.empty or 'fecha_hora' not in incidentes.columns:
+        return pd.DataFrame(columns=['periodo', 'area', 'accidentes'])
+    df = incidentes[incidentes['tipo'] == 'accidente'] if 'tipo' in incidentes.columns else incidentes
+    df = pd.DataFrame({
+        'periodo': _periodo(df['fecha_hora']),
+        'area': df['area'] if 'area' in df.columns else None
+    }).dropna(subset=['periodo'])
+    por_area = df.dropna(subset=['area']).groupby(['periodo', 'area']).size()
+    total = df.groupby('periodo').size()
+    total.index = pd.MultiIndex.from_arrays([total.index, [AREA_TOTAL] * len(total)], names=['periodo', 'area'])
+    return pd.concat([por_area, total]).rename('accidentes').reset_index()
+
+def _tasas(df):
+    """TF, TS e Índice de Incidencia por fila (NaN si no hay horas o trabajadores)"""
+    horas = df['horas_hombre'].where(df['horas_hombre'] > 0)
+    trabajadores = df['trabajadores'].where(df['trabajadores'] > 0)
+    return df.assign(
+        tasa_frecuencia=df['accidentes'] * 1_000_000 / horas,
+        tasa_severidad=df['dias_perdidos'] * 1_000_000 / horas,
+        indice_incidencia=df['accidentes'] / trabajadores * 100
+    )
+
+def calcular_indicadores(horas, accidentes):
+    """
+    Indicadores mensuales y de 12 meses móviles por área.
+
+    Args:
+        horas: DataFrame de la tabla horas_hombre (periodo, area, trabajadores,
+            horas_trabajadas, dias_perdidos)
+        accidentes: Resultado de accidentes_mensuales
+
+    Returns:
+        DataFrame con COLUMNAS_INDICADORES. En la ventana de 12 meses se
+        suman accidentes, días y horas; los trabajadores son el promedio de
+        los meses con horas registradas.
+    """
+    if horas is None or horas.empty:
+        return pd.DataFrame(columns=COLUMNAS_INDICADORES)
+
+    h = pd.DataFrame({
+        'periodo': pd.to_datetime(horas['periodo']).dt.to_period('M').dt.to_timestamp(),
+        'area': horas['area'],
+        'trabajadores': pd.to_numeric(horas['trabajadores'], errors='coerce').fillna(0),
+        'horas_hombre': pd.to_numeric(horas['horas_trabajadas'], errors='coerce').fillna(0),
+        'dias_perdidos': pd.to_numeric(horas['dias_perdidos'], errors='coerce').fillna(0)
+    })
+    h = pd.concat([h, h.assign(area=AREA_TOTAL)]).groupby(['periodo', 'area']).sum()
+
+    base = h.join(accidentes.set_index(['periodo', 'area'])['accidentes'], how='outer').fillna(0)
+
+    # Grilla completa área × mes: las ventanas móviles cuentan meses de calendario
+    meses = pd.date_range(base.index.get_level_values('periodo').min(),
+                          base.index.get_level_values('periodo').max(), freq='MS')
+    areas = base.index.get_level_values('area').unique()
+    grilla = pd.MultiIndex.from_product([areas, meses], names=['area', 'periodo'])
+    mensual = base.reorder_levels(['area', 'periodo']).reindex(grilla, fill_value=0).sort_index()
+    mensual['meses_con_horas'] = (mensual['horas_hombre'] > 0).astype(int)
+
+    sumas = (
+        mensual.groupby(level='area', sort=False)
+        .rolling(MESES_VENTANA, min_periods=1).sum()
+        .droplevel(0)
+    )
+    movil = sumas.assign(trabajadores=sumas['trabajadores'] / sumas['meses_con_horas'].where(sumas['meses_con_horas'] > 0))
+    movil['trabajadores'] = movil['trabajadores'].fillna(0)
+
+    resultado = pd.concat([
+        mensual.assign(ventana='mensual'),
+        movil.assign(ventana='12m')
+    ]).reset_index()
+    resultado[['accidentes', 'dias_perdidos']] = resultado[['accidentes', 'dias_perdidos']].astype(int)
+    return _tasas(resultado)[COLUMNAS_INDICADORES]
+
+def serie_indicadores(indicadores, areas=None):
+    """
+    Serie por mes y ventana sumando las áreas pedidas (o AREA_TOTAL), con las
+    tasas recalculadas desde los componentes. Para gráficos de tendencia.
+    """
+    if indicadores is None or indicadores.empty:
+        return pd.DataFrame(columns=COLUMNAS_INDICADORES)
+    filas = indicadores[indicadores['area'].isin(areas)] if areas else indicadores[indicadores['area'] == AREA_TOTAL]
+    serie = filas.groupby(['periodo', 'ventana'], as_index=False)[COMPONENTES].sum()
+    return _tasas(serie.astype({c: float for c in COMPONENTES}))
+
+def totales_periodo(indicadores, areas=None, ventana='mensual'):
+    """
+    Totales de un período a partir de las filas de indicadores_sst.
+
+    Las tasas se recalculan con la suma de sus componentes (no se promedian
+    las tasas de cada mes ni de cada área).
+
+    Args:
+        indicadores: DataFrame de indicadores
+        areas: Áreas a sumar; vacío o None = toda la empresa (AREA_TOTAL)
+        ventana: 'mensual' suma los meses del período; '12m' toma los 12
+            meses móviles que terminan en el último mes del período
+
+    Returns:
+        Dict con accidentes, dias_perdidos, horas_hombre, trabajadores y las
+        tres tasas, o None si no hay horas hombre registradas en el período
+    """
+    if indicadores is None or indicadores.empty:
+        return None
+    filas = indicadores[indicadores['ventana'] == ventana]
+    filas = filas[filas['area'].isin(areas)] if areas else filas[filas['area'] == AREA_TOTAL]
+    if ventana == '12m' and not filas.empty:
+        filas = filas[filas['periodo'] == filas['periodo'].max()]
+    horas = float(pd.to_numeric(filas['horas_hombre']).sum())
+    if horas <= 0:
+        return None
+    accidentes = int(pd.to_numeric(filas['accidentes']).sum())
+    dias_perdidos = int(pd.to_numeric(filas['dias_perdidos']).sum())
+    trabajadores_mes = pd.to_numeric(filas['trabajadores']).groupby(filas['periodo']).sum()
+    trabajadores = float(trabajadores_mes[trabajadores_mes > 0].mean()) if (trabajadores_mes > 0).any() else 0
+    return {
+        'accidentes': accidentes,
+        'dias_perdidos': dias_perdidos,
+        'horas_hombre': horas,
+        'trabajadores': trabajadores,
+        'tasa_frecuencia': calcular_tasa_frecuencia(accidentes, horas),
+        'tasa_severidad': calcular_tasa_severidad(dias_perdidos, horas),
+        'indice_incidencia': accidentes / trabajadores * 100 if trabajadores > 0 else 0
+    }
@@ -0,0 +1,174 @@
+import json
+from datetime import date, timedelta
+import pandas as pd
+
+NIVEL_RIESGO_CRITICO = 15
+DIAS_AVISO_EPP = 30
+
+def _tiene(df, columna):
+    return df is not None and not df.empty and columna in df.columns
+
+def _fechas(serie):
+    """Fechas sin zona horaria a nivel de día (NaT si no se pueden leer)"""
+    return pd.to_datetime(serie, errors='coerce', utc=True, format='ISO8601').dt.tz_localize(None).dt.normalize()
+
+def contar_valores(df, columna):
+    """Conteo por valor de una columna en un solo value_counts ({} si no existe)"""
+    if not _tiene(df, columna):
+        return {}
+    return {valor: int(n) for valor, n in df[columna].value_counts().items() if n > 0}
+
+def calcular_tasa_frecuencia(incidentes, horas_hombre):
+    """Tasa de Frecuencia = (N° Accidentes × 1,000,000) / Horas Hombre Trabajadas"""
+    return (incidentes * 1_000_000) / horas_hombre if horas_hombre > 0 else 0
+
+def calcular_tasa_severidad(dias_perdidos, horas_hombre):
+    """Tasa de Severidad = (Días Perdidos × 1,000,000) / Horas Hombre Trabajadas"""
+    return (dias_perdidos * 1_000_000) / horas_hombre if horas_hombre > 0 else 0
+
+def calcular_kpis(data, hoy=None):
+    """
+    Indicadores SST de un conjunto de datos, con un value_counts por columna.
+
+    Args:
+        data: Dict de DataFrames (incidentes, riesgos, epp, hallazgos, capacitaciones...)
+        hoy: Fecha de referencia para los vencimientos de EPP (por defecto hoy)
+
+    Returns:
+        Dict de indicadores; los que dependen de una columna ausente quedan en None
+    """
+    hoy = pd.Timestamp(hoy or date.today())
+    incidentes = data.get('incidentes')
+    riesgos = data.get('riesgos')
+    epp = data.get('epp')
+    hallazgos = data.get('hallazgos')
+    capacitaciones = data.get('capacitaciones')
+
+    por_tipo = contar_valores(incidentes, 'tipo')
+    tiene_tipo = _tiene(incidentes, 'tipo')
+
+    estados_riesgos = contar_valores(riesgos, 'estado')
+    if _tiene(riesgos, 'nivel_riesgo'):
+        riesgos_criticos = int((pd.to_numeric(riesgos['nivel_riesgo'], errors='coerce') >= NIVEL_RIESGO_CRITICO).sum())
+    else:
+        riesgos_criticos = None
+
+    if _tiene(epp, 'fecha_vencimiento'):
+        vencimientos = _fechas(epp['fecha_vencimiento'])
+        epp_vencidos = int((vencimientos <= hoy).sum())
+        epp_vence_30_dias = int((vencimientos <= hoy + timedelta(days=DIAS_AVISO_EPP)).sum())
+    else:
+        epp_vencidos = epp_vence_30_dias = None
+
+    estados_capacitaciones = contar_valores(capacitaciones, 'estado')
+    capacitaciones_total = len(capacitaciones) if capacitaciones is not None else 0
+    capacitaciones_realizadas = estados_capacitaciones.get('realizada', 0)
+
+    return {
+        'registros': {clave: len(df) for clave, df in data.items() if isinstance(df, pd.DataFrame)},
+        'incidentes_total': len(incidentes) if incidentes is not None else 0,
+        'incidentes_por_tipo': por_tipo,
+        'accidentes': por_tipo.get('accidente', 0) if tiene_tipo else None,
+        'incidentes': por_tipo.get('incidente', 0) if tiene_tipo else None,
+        'enfermedades': por_tipo.get('enfermedad_laboral', 0) if tiene_tipo else None,
+        'riesgos_pendientes': estados_riesgos.get('pendiente', 0) if _tiene(riesgos, 'estado') else None,
+        'riesgos_criticos': riesgos_criticos,
+        'epp_vencidos': epp_vencidos,
+        'epp_vence_30_dias': epp_vence_30_dias,
+        'hallazgos_abiertos': contar_valores(hallazgos, 'estado').get('abierto', 0) if _tiene(hallazgos, 'estado') else None,
+        'capacitaciones_total': capacitaciones_total,
+        'capacitaciones_realizadas': capacitaciones_realizadas if _tiene(capacitaciones, 'estado') else None,
+        'cumplimiento_capacitaciones': (
+            capacitaciones_realizadas / capacitaciones_total * 100 if capacitaciones_total > 0 else 0
+        ) if _tiene(capacitaciones, 'estado') else None
+    }
+
+def indicadores_legales(kpis, totales):
+    """
+    Indicadores obligatorios (Art. 37 Ley 29783) del reporte.
+
+    Args:
+        kpis: Resultado de calcular_kpis (incidentes y enfermedades del período)
+        totales: Resultado de indicadores.totales_periodo (tasas calculadas con
+            las horas hombre y días perdidos registrados), o None
+
+    Returns:
+        Dict con tasa_frecuencia, tasa_severidad, indice_incidencia,
+        accidentes, dias_perdidos, incidentes y enfermedades; None si no
+        hay horas hombre registradas
+    """
+    if totales is None:
+        return None
+    return {
+        'tasa_frecuencia': totales['tasa_frecuencia'],
+        'tasa_severidad': totales['tasa_severidad'],
+        'indice_incidencia': totales['indice_incidencia'],
+        'accidentes': totales['accidentes'],
+        'dias_perdidos': totales['dias_perdidos'],
+        'incidentes': kpis['incidentes'] or 0,
+        'enfermedades': kpis['enfermedades'] or 0
+    }
+
+def _leer_consecuencias(valor):
+    if isinstance(valor, str):
+        try:
+            valor = json.loads(valor)
+        except ValueError:
+            return {}
+    return valor if isinstance(valor, dict) else {}
+
+def kpis_incidentes(df, horas_hombre=None):
+    """
+    Indicadores del dashboard de incidentes: cierre, gravedad promedio y TF
+    con los accidentes con lesión (None si no hay horas hombre registradas).
+    """
+    total = len(df)
+    cerrados = contar_valores(df, 'estado').get('cerrado', 0)
+    if _tiene(df, 'gravedad'):
+        # Columnas de consecuencias ya decodificadas al cargar (aplicar_esquema)
+        gravedad = pd.to_numeric(df['gravedad'], errors='coerce').fillna(0)
+        con_lesion = int((df['lesiones'].astype(object).fillna('No') != 'No').sum()) if 'lesiones' in df.columns else 0
+    elif _tiene(df, 'consecuencias'):
+        consecuencias = pd.DataFrame.from_records(
+            df['consecuencias'].map(_leer_consecuencias).tolist(), index=df.index
+        ).reindex(columns=['gravedad', 'lesiones'])
+        gravedad = pd.to_numeric(consecuencias['gravedad'], errors='coerce').fillna(0)
+        con_lesion = int((consecuencias['lesiones'].fillna('No') != 'No').sum())
+    else:
+        gravedad = pd.Series(0, index=df.index)
+        con_lesion = 0
+    return {
+        'total': total,
+        'cerrados': cerrados,
+        'tasa_cierre': cerrados / total * 100 if total > 0 else 0,
+        'riesgo_promedio': float(gravedad.mean()) if total > 0 else 0,
+        'con_lesion': con_lesion,
+        'tasa_frecuencia': calcular_tasa_frecuencia(con_lesion, horas_hombre) if horas_hombre else None
+    }
+
+def kpis_epp(asignaciones, hoy=None):
+    """
+    Indicadores de inventario de EPP sobre las asignaciones activas.
+
+    Args:
+        asignaciones: DataFrame con estado y fecha_vencimiento
+        hoy: Fecha de referencia (por defecto hoy)
+    """
+    hoy = pd.Timestamp(hoy or date.today())
+    if not _tiene(asignaciones, 'estado'):
+        return {'activos': 0, 'vencidos': 0, 'por_vencer': 0, 'cumplimiento': 0}
+    activos = asignaciones['estado'] == 'activo'
+    if 'fecha_vencimiento' in asignaciones.columns:
+        vencimientos = _fechas(asignaciones['fecha_vencimiento'])
+        vencidos = activos & (vencimientos <= hoy)
+        por_vencer = activos & (vencimientos > hoy) & (vencimientos <= hoy + timedelta(days=DIAS_AVISO_EPP))
+    else:
+        vencidos = por_vencer = pd.Series(False, index=asignaciones.index)
+    n_activos = int(activos.sum())
+    n_vencidos = int(vencidos.sum())
+    return {
+        'activos': n_activos,
+        'vencidos': n_vencidos,
+        'por_vencer': int(por_vencer.sum()),
+        'cumplimiento': (n_activos - n_vencidos) / n_activos * 100 if n_activos > 0 else 0
+    }
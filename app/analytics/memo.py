@@ -0,0 +1,48 @@
+import json
+import threading
+from collections import OrderedDict
+from datetime import date
+from app.utils.filtros import clave_filtros
+
+MAXIMO_ENTRADAS = 128
+
+_lock = threading.Lock()
+_resultados = OrderedDict()
+
+def clave_version(nombre, filtros, versiones, hoy=None):
+    """
+    Clave de un cálculo sobre un conjunto de datos: nombre + filtros
+    normalizados + versión de las tablas + día. None si no hay versiones
+    (los datos no se pueden identificar y no se memoriza).
+    """
+    if versiones is None:
+        return None
+    return (
+        nombre,
+        clave_filtros(filtros),
+        json.dumps(versiones, sort_keys=True),
+        (hoy or date.today()).isoformat()
+    )
+
+def memorizar(clave, calcular):
+    """
+    Resultado de calcular() guardado por clave (LRU en el proceso).
+
+    Los resultados se comparten entre sesiones: no se deben modificar.
+    """
+    if clave is None:
+        return calcular()
+    with _lock:
+        if clave in _resultados:
+            _resultados.move_to_end(clave)
+            return _resultados[clave]
+    resultado = calcular()
+    with _lock:
+        _resultados[clave] = resultado
+        while len(_resultados) > MAXIMO_ENTRADAS:
+            _resultados.popitem(last=False)
+    return resultado
+
+def limpiar_memo():
+    with _lock:
+        _resultados.clear()
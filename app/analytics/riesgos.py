@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+
+NIVELES = [1, 2, 3, 4, 5]
+DIMENSIONES = ['area', 'tipo_peligro', 'estado']
+
+def cubo_riesgos(riesgos):
+    """
+    Conteos de riesgos por (probabilidad, severidad, área, tipo de peligro,
+    estado) en una sola pasada con np.bincount.
+
+    La probabilidad y la severidad ocupan las posiciones 1 a 5 de su eje; la
+    posición 0 agrupa los valores vacíos o fuera de rango (no entran en la
+    matriz 5x5 pero sí en los demás conteos).
+
+    Returns:
+        Dict con:
+            categorias: {dimensión: Index de valores (incluye NaN si hay vacíos)}
+            codigos: {dimensión: posición de cada fila en su eje}
+            conteos: ndarray (6, 6, áreas, tipos, estados)
+            suma_nivel, con_nivel: suma y cantidad de nivel_riesgo no vacío
+    """
+    n = len(riesgos) if riesgos is not None else 0
+    categorias, codigos = {}, {}
+    for columna in DIMENSIONES:
+        valores = riesgos[columna] if n and columna in riesgos.columns else pd.Series([None] * n, dtype=object)
+        codigos[columna], categorias[columna] = pd.factorize(valores, use_na_sentinel=False)
+        categorias[columna] = pd.Index(categorias[columna])
+
+    def eje_nivel(columna):
+        if not n or columna not in riesgos.columns:
+            return np.zeros(n, dtype=np.int64)
+        valores = pd.to_numeric(riesgos[columna], errors='coerce').to_numpy()
+        return np.where(np.isin(valores, NIVELES), np.nan_to_num(valores), 0).astype(np.int64)
+
+    forma = (6, 6) + tuple(max(len(categorias[c]), 1) for c in DIMENSIONES)
+    indice = np.ravel_multi_index(
+        (eje_nivel('probabilidad'), eje_nivel('severidad'), *(codigos[c] for c in DIMENSIONES)),
+        forma
+    ) if n else np.zeros(0, dtype=np.int64)
+
+    nivel = (
+        pd.to_numeric(riesgos['nivel_riesgo'], errors='coerce').to_numpy(dtype=float)
+        if n and 'nivel_riesgo' in riesgos.columns else np.full(n, np.nan)
+    )
+    tiene_nivel = ~np.isnan(nivel)
+    tamano = int(np.prod(forma))
+    return {
+        'categorias': categorias,
+        'codigos': codigos,
+        'conteos': np.bincount(indice, minlength=tamano).reshape(forma),
+        'suma_nivel': np.bincount(indice, weights=np.where(tiene_nivel, nivel, 0), minlength=tamano).reshape(forma),
+        'con_nivel': np.bincount(indice, weights=tiene_nivel, minlength=tamano).reshape(forma)
+    }
+
+def opciones(cubo, dimension):
+    """Valores no vacíos de una dimensión, ordenados (para los selectores)"""
+    return sorted(v for v in cubo['categorias'][dimension] if pd.notna(v))
+
+def _mascaras(cubo, areas=None, tipos=None, estados=None):
+    """Máscara booleana por eje; None = todos los valores (incluidos vacíos)"""
+    seleccion = {'area': areas, 'tipo_peligro': tipos, 'estado': estados}
+    mascaras = []
+    for columna, tamano in zip(DIMENSIONES, cubo['conteos'].shape[2:]):
+        categorias = cubo['categorias'][columna]
+        if seleccion[columna] is None:
+            mascaras.append(np.ones(tamano, dtype=bool))
+        else:
+            mascaras.append(np.resize(categorias.isin(seleccion[columna]), tamano) & bool(len(categorias)))
+    return mascaras
+
+def _recortar(arreglo, mascaras):
+    for eje, mascara in enumerate(mascaras, start=2):
+        arreglo = arreglo.compress(mascara, axis=eje)
+    return arreglo
+
+def matriz_riesgo(cubo, areas=None, tipos=None, estados=None):
+    """Conteo por probabilidad (filas) y severidad (columnas), 1 a 5"""
+    conteos = _recortar(cubo['conteos'], _mascaras(cubo, areas, tipos, estados))
+    return pd.DataFrame(conteos.sum(axis=(2, 3, 4))[1:, 1:], index=NIVELES, columns=NIVELES)
+
+def nivel_promedio(cubo):
+    """
+    Nivel de riesgo promedio por área (filas) y tipo de peligro (columnas),
+    como groupby(['area', 'tipo_peligro']).mean().unstack(fill_value=0)
+    """
+    areas, tipos = cubo['categorias']['area'], cubo['categorias']['tipo_peligro']
+    recorte = (slice(len(areas)), slice(len(tipos)))
+    conteos = cubo['conteos'].sum(axis=(0, 1, 4))[recorte]
+    suma = cubo['suma_nivel'].sum(axis=(0, 1, 4))[recorte]
+    cantidad = cubo['con_nivel'].sum(axis=(0, 1, 4))[recorte]
+
+    promedio = np.where(conteos > 0, np.nan, 0.0)
+    np.divide(suma, cantidad, out=promedio, where=cantidad > 0)
+    promedio = pd.DataFrame(promedio, index=areas, columns=tipos).loc[areas.notna(), tipos.notna()]
+    existe = pd.DataFrame(conteos > 0, index=areas, columns=tipos).loc[areas.notna(), tipos.notna()]
+    promedio = promedio.loc[existe.any(axis=1).to_numpy(), existe.any(axis=0).to_numpy()]
+    return promedio.sort_index().sort_index(axis=1)
+
+def conteo_dimension(cubo, dimension):
+    """Cantidad de riesgos por valor de una dimensión (sin vacíos), ordenada por valor"""
+    eje = 2 + DIMENSIONES.index(dimension)
+    otros = tuple(i for i in range(5) if i != eje)
+    categorias = cubo['categorias'][dimension]
+    conteos = pd.Series(cubo['conteos'].sum(axis=otros)[:len(categorias)], index=categorias, name='cantidad')
+    return conteos[conteos.index.notna() & (conteos > 0)].sort_index()
+
+def filtrar_riesgos(cubo, riesgos, areas=None, tipos=None, estados=None):
+    """Filas de riesgos de la selección, usando los códigos del cubo (sin volver a comparar textos)"""
+    mascara = np.ones(len(riesgos), dtype=bool)
+    for columna, eje in zip(DIMENSIONES, _mascaras(cubo, areas, tipos, estados)):
+        mascara &= eje[cubo['codigos'][columna]]
+    return riesgos[mascara]
@@ -0,0 +1,61 @@
+import pandas as pd
+from app.analytics.indicadores import hora_local
+
+COLUMNAS_RESUMEN_INCIDENTES = ['dia', 'area', 'tipo', 'hora', 'cantidad']
+
+def resumir_incidentes(incidentes):
+    """
+    Conteos diarios por (área, tipo, hora) a partir de los incidentes crudos,
+    con la misma forma que resumen_incidentes_diario (ver
+    scripts/sql/resumenes_diarios.sql). Se usa si la tabla de resumen no
+    está disponible.
+    """
+    if incidentes is None or incidentes.empty or 'fecha_hora' not in incidentes.columns:
+        return pd.DataFrame(columns=COLUMNAS_RESUMEN_INCIDENTES)
+    if {'dia', 'hora'} <= set(incidentes.columns):
+        # Columnas derivadas al cargar (app/utils/esquemas.py)
+        dia, hora = incidentes['dia'], incidentes['hora']
+    else:
+        fechas = hora_local(incidentes['fecha_hora'])
+        dia, hora = fechas.dt.normalize(), fechas.dt.hour
+    df = pd.DataFrame({
+        'dia': dia,
+        'area': incidentes['area'].astype(object).fillna('') if 'area' in incidentes.columns else '',
+        'tipo': incidentes['tipo'].astype(object).fillna('') if 'tipo' in incidentes.columns else '',
+        'hora': hora
+    }).dropna(subset=['dia'])
+    df['hora'] = df['hora'].astype(int)
+    return df.groupby(['dia', 'area', 'tipo', 'hora']).size().rename('cantidad').reset_index()
+
+def _meses(resumen):
+    return resumen['dia'].dt.to_period('M').astype(str).rename('mes')
+
+def tendencia_mensual(resumen, columna=None):
+    """
+    Suma mensual de un resumen diario.
+
+    Args:
+        resumen: DataFrame con 'dia' (datetime) y 'cantidad'
+        columna: Columna por la que abrir la serie (p. ej. 'tipo'); None = total
+
+    Returns:
+        Serie {mes: cantidad}, o DataFrame mes × valores de la columna
+    """
+    if resumen is None or resumen.empty:
+        return pd.Series(dtype=int, name='cantidad') if columna is None else pd.DataFrame()
+    if columna is None:
+        return resumen.groupby(_meses(resumen))['cantidad'].sum()
+    return resumen.groupby([_meses(resumen), resumen[columna]])['cantidad'].sum().unstack(fill_value=0)
+
+def conteo_por(resumen, columna):
+    """Total por valor de una columna del resumen, de mayor a menor (sin el valor vacío '')"""
+    if resumen is None or resumen.empty or columna not in resumen.columns:
+        return pd.Series(dtype=int, name='cantidad')
+    conteos = resumen.groupby(columna)['cantidad'].sum().drop('', errors='ignore')
+    return conteos.sort_values(ascending=False)
+
+def conteo_por_hora(resumen):
+    """Total por hora del día (0-23), en orden"""
+    if resumen is None or resumen.empty or 'hora' not in resumen.columns:
+        return pd.Series(dtype=int, name='cantidad')
+    return resumen.groupby('hora')['cantidad'].sum().sort_index()
@@ -1,10 +1,15 @@
 import streamlit as st
+import pandas as pd
 from app.auth import autenticar_usuario, cerrar_sesion
 from app.modules import (
     riesgos, inspecciones, capacitaciones, 
     incidentes, epp, documental, reportes
 )
 
+# Copy-on-write: los filtros y copias de los datos cacheados (compartidos
+# entre sesiones con cache_resource) no duplican memoria ni los modifican
+pd.options.mode.copy_on_write = True
+
 # Configuración de página
 st.set_page_config(
     page_title="Sistema SST Perú",
@@ -3,6 +3,7 @@ import pandas as pd
 from datetime import datetime, timedelta
 from app.utils.supabase_client import get_supabase_client
 from app.utils.storage_helper import subir_archivo_storage
+from app.utils.codigos import generar_codigo
 from app.auth import requerir_rol
 import json
 import requests
@@ -46,10 +47,11 @@ def programar_capacitacion(usuario):
         col1, col2 = st.columns(2)
 
         with col1:
+            codigo_sugerido = f"CAP-{datetime.now().strftime('%Y%m%d')}-"
             codigo = st.text_input(
                 "Código de Capacitación",
-                value=f"CAP-{datetime.now().strftime('%Y%m%d')}-",
-                help="Formato: CAP-YYYYMMdd-###"
+                value=codigo_sugerido,
+                help="Déjalo como está para asignar el código automáticamente (CAP-YYYYMMdd-######)"
             )
 
             tema = st.text_input(
@@ -105,10 +107,18 @@ def programar_capacitacion(usuario):
     # Acción fuera del form
     # -----------------------
     if submitted:
-        if not tema.strip() or not codigo.strip():
-            st.error("❌ Tema y código son obligatorios")
+        if not tema.strip():
+            st.error("❌ El tema es obligatorio")
             return
 
+        # Código automático si no se ingresó uno propio
+        if codigo.strip() in ("", codigo_sugerido):
+            try:
+                codigo = generar_codigo('CAP')
+            except Exception as e:
+                st.error(f"❌ No se pudo generar el código: {e}")
+                return
+
         # area_destino en BD es VARCHAR(100).
         # Guardamos lista como string JSON (puede truncarse si es muy largo).
         area_str = json.dumps(area_destino)
@@ -5,7 +5,18 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from app.utils.supabase_client import get_supabase_client
 from app.auth import requerir_rol
-import io
+from app.utils.versiones import leer_versiones_tablas
+from app.utils.indicadores_sst import leer_indicadores, recalcular_indicadores
+from app.utils.importacion_helper import leer_archivo_en_bloques, renombrar_columnas, insertar_en_lotes
+from app.utils.resumenes import leer_resumen, cargar_resumen_incidentes
+from app.utils.esquemas import aplicar_esquema, solo_lectura
+from app.utils.segmentos import cargar_rango
+from app.utils.cache_cargas import cache_por_filtros
+from app.utils.catalogos import cargar_areas
+from app.analytics import kpis_por_version, indicadores_legales, totales_periodo, serie_indicadores
+from app.analytics import tendencia_mensual, conteo_por, conteo_por_hora
+from app.analytics import cubo_por_version, nivel_promedio, conteo_dimension
+from app.utils.excel_streaming import crear_libro_streaming, escribir_hoja, guardar_libro, bloques_dataframe
 
 def mostrar(usuario):
     """Dashboard Principal de Seguridad y Salud en el Trabajo"""
@@ -24,8 +35,15 @@ def mostrar(usuario):
         st.warning("No hay datos para mostrar con los filtros seleccionados")
         return
     
+    if usuario['rol'] == 'admin':
+        cache = cargar_datos_dashboard.estadisticas()
+        st.sidebar.caption(
+            f"Caché de datos: {cache['entradas']} entradas, {cache['aciertos']} aciertos, "
+            f"{cache['fallos']} fallos, {cache['expulsiones']} expulsiones"
+        )
+    
     # KPI Cards
-    mostrar_kpi_cards(data)
+    mostrar_kpi_cards(data, filtros)
     
     # Tabs de visualización
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -40,7 +58,7 @@ def mostrar(usuario):
         mostrar_tendencias(data, filtros)
     
     with tab2:
-        mostrar_analisis_riesgos(data)
+        mostrar_analisis_riesgos(data, filtros)
     
     with tab3:
         mostrar_analisis_incidentes(data)
@@ -50,6 +68,10 @@ def mostrar(usuario):
     
     with tab5:
         mostrar_reportes_legales(data, filtros)
+        importar_horas_hombre(usuario)
+
+# Filtros que usa cargar_datos_dashboard (los demás no cambian los datos)
+CAMPOS_CARGA = ['fecha_inicio', 'fecha_fin', 'areas', 'tipos_incidente']
 
 def crear_filtros_dashboard():
     """Crear filtros interactivos para el dashboard"""
@@ -65,9 +87,7 @@ def crear_filtros_dashboard():
     )
     
     # Áreas
-    supabase = get_supabase_client()
-    areas = supabase.table('riesgos').select('area').execute().data
-    areas_unicas = sorted(list(set([a['area'] for a in areas]))) if areas else []
+    areas_unicas = cargar_areas()
     
     areas_seleccionadas = st.multiselect(
         "Áreas",
@@ -96,13 +116,20 @@ def crear_filtros_dashboard():
         'nivel_riesgo_min': nivel_riesgo
     }
 
-@st.cache_data(ttl=300)
+@cache_por_filtros(CAMPOS_CARGA, ttl=300, max_entradas=20)
 def cargar_datos_dashboard(filtros):
-    """Cargar y procesar datos para el dashboard con caching de 5 min"""
+    """
+    Cargar y procesar datos para el dashboard con caching de 5 min.
+
+    Un solo conjunto compartido por filtros canónicos (cache_cargas, sin copia
+    por rerun): es de solo lectura, ver esquemas.solo_lectura.
+    """
     
     supabase = get_supabase_client()
-
     
+    # Versión de las tablas antes de consultar: identifica estos datos para
+    # memorizar los indicadores (app/analytics)
+    versiones = leer_versiones_tablas()
     
     try:
         # Cargar riesgos
@@ -112,22 +139,19 @@ def cargar_datos_dashboard(filtros):
         
         riesgos = query_riesgos.execute().data
         
-        # Cargar incidentes con filtro de fecha
-        query_incidentes = supabase.table('incidentes').select('*').gte(
-            'fecha_hora', filtros['fecha_inicio']
-        ).lte('fecha_hora', filtros['fecha_fin'])
-        
-        if filtros['tipos_incidente']:
-            query_incidentes = query_incidentes.in_('tipo', filtros['tipos_incidente'])
-        if filtros['areas']:
-            query_incidentes = query_incidentes.in_('area', filtros['areas'])
-        
-        incidentes = query_incidentes.execute().data
+        # Incidentes e inspecciones por meses en caché (utils/segmentos): al
+        # cambiar el rango de fechas solo se consultan los meses que faltan
+        incidentes = cargar_rango(
+            'incidentes', filtros['fecha_inicio'], filtros['fecha_fin'],
+            version=(versiones or {}).get('incidentes'),
+            tipo=filtros['tipos_incidente'], area=filtros['areas']
+        )
         
-        # Cargar inspecciones
-        inspecciones = supabase.table('inspecciones').select('*').gte(
-            'fecha_programada', filtros['fecha_inicio']
-        ).execute().data
+        # Inspecciones desde fecha_inicio, incluidas las programadas a futuro
+        inspecciones = cargar_rango(
+            'inspecciones', filtros['fecha_inicio'], filtros['fecha_fin'],
+            version=(versiones or {}).get('inspecciones'), posteriores=True
+        )
         
         # Cargar hallazgos
         hallazgos = supabase.table('hallazgos').select('*').execute().data
@@ -138,30 +162,50 @@ def cargar_datos_dashboard(filtros):
         # Cargar capacitaciones
         capacitaciones = supabase.table('capacitaciones').select('*').execute().data
         
-        return {
-            'riesgos': pd.DataFrame(riesgos) if riesgos else pd.DataFrame(),
-            'incidentes': pd.DataFrame(incidentes) if incidentes else pd.DataFrame(),
-            'inspecciones': pd.DataFrame(inspecciones) if inspecciones else pd.DataFrame(),
-            'hallazgos': pd.DataFrame(hallazgos) if hallazgos else pd.DataFrame(),
-            'epp': pd.DataFrame(epp) if epp else pd.DataFrame(),
-            'capacitaciones': pd.DataFrame(capacitaciones) if capacitaciones else pd.DataFrame()
-        }
+        # Indicadores legales precalculados (vacío si la tabla aún no existe)
+        try:
+            indicadores = leer_indicadores(filtros['fecha_inicio'], filtros['fecha_fin'])
+        except Exception:
+            indicadores = pd.DataFrame()
+        
+        # Resúmenes diarios para los gráficos de tendencia
+        resumen_incidentes = cargar_resumen_incidentes(filtros, incidentes)
+        try:
+            resumen_hallazgos = leer_resumen('hallazgos')
+        except Exception:
+            resumen_hallazgos = None
+        
+        return solo_lectura({
+            'riesgos': aplicar_esquema('riesgos', riesgos),
+            'incidentes': incidentes,
+            'inspecciones': inspecciones,
+            'hallazgos': aplicar_esquema('hallazgos', hallazgos),
+            'epp': aplicar_esquema('epp_asignaciones', epp),
+            'capacitaciones': aplicar_esquema('capacitaciones', capacitaciones),
+            'indicadores': indicadores,
+            'resumen_incidentes': resumen_incidentes,
+            'resumen_hallazgos': resumen_hallazgos,
+            'versiones': versiones,
+            'origen': 'dashboard'
+        })
         
     except Exception as e:
         st.error(f"Error cargando datos: {e}")
         return None
 
-def mostrar_kpi_cards(data):
+def mostrar_kpi_cards(data, filtros):
     """Mostrar tarjetas de métricas clave en tiempo real"""
     
     st.markdown("### 📊 Indicadores Clave de Desempeño")
     
+    kpis = kpis_por_version(data, filtros)
+    
     col1, col2, col3, col4, col5 = st.columns(5)
     
     # KPI 1: Riesgos Pendientes
     with col1:
-        if not data['riesgos'].empty and 'estado' in data['riesgos'].columns:
-            riesgos_pendientes = len(data['riesgos'][data['riesgos']['estado'] == 'pendiente'])
+        riesgos_pendientes = kpis['riesgos_pendientes']
+        if riesgos_pendientes is not None:
             st.metric(
                 label="⚠️ Riesgos Pendientes",
                 value=riesgos_pendientes,
@@ -175,35 +219,33 @@ def mostrar_kpi_cards(data):
                 delta="Sin datos"
             )
     
-    # KPI 2: Incidentes Mes
+    # KPI 2: Tasa de Frecuencia del período (horas hombre registradas)
     with col2:
-        incidentes_mes = len(data['incidentes'])
-        tasa_frecuencia = calcular_tasa_frecuencia(incidentes_mes, 50000)  # 50k horas hombre
-        st.metric(
-            label="🚨 Tasa Frecuencia",
-            value=f"{tasa_frecuencia:.2f}",
-            delta="vs meta: 5.0",
-            delta_color="inverse"
-        )
+        totales = totales_periodo(data['indicadores'], filtros['areas'])
+        if totales:
+            st.metric(
+                label="🚨 Tasa Frecuencia",
+                value=f"{totales['tasa_frecuencia']:.2f}",
+                delta="vs meta: 5.0",
+                delta_color="inverse"
+            )
+        else:
+            st.metric(
+                label="🚨 Tasa Frecuencia",
+                value="N/A",
+                delta="Sin horas hombre"
+            )
     
     # KPI 3: EPP por Vencer
     with col3:
-        if not data['epp'].empty and 'fecha_vencimiento' in data['epp'].columns:
-            try:
-                fecha_limite = datetime.now().date() + timedelta(days=30)
-                epp_vencer = len(data['epp'][pd.to_datetime(data['epp']['fecha_vencimiento']).dt.date <= fecha_limite])
-                st.metric(
-                    label="🛡️ EPP por Vencer",
-                    value=epp_vencer,
-                    delta=f"{epp_vencer} en 30 días",
-                    delta_color="inverse"
-                )
-            except Exception as e:
-                st.metric(
-                    label="🛡️ EPP por Vencer",
-                    value="N/A",
-                    delta="Error al calcular"
-                )
+        epp_vencer = kpis['epp_vence_30_dias']
+        if epp_vencer is not None:
+            st.metric(
+                label="🛡️ EPP por Vencer",
+                value=epp_vencer,
+                delta=f"{epp_vencer} en 30 días",
+                delta_color="inverse"
+            )
         else:
             st.metric(
                 label="🛡️ EPP por Vencer",
@@ -213,8 +255,8 @@ def mostrar_kpi_cards(data):
     
     # KPI 4: Hallazgos Abiertos
     with col4:
-        if not data['hallazgos'].empty and 'estado' in data['hallazgos'].columns:
-            hallazgos_abiertos = len(data['hallazgos'][data['hallazgos']['estado'] == 'abierto'])
+        hallazgos_abiertos = kpis['hallazgos_abiertos']
+        if hallazgos_abiertos is not None:
             st.metric(
                 label="📋 Hallazgos Abiertos",
                 value=hallazgos_abiertos,
@@ -230,43 +272,27 @@ def mostrar_kpi_cards(data):
     
     # KPI 5: Cumplimiento Capacitación
     with col5:
-        if not data['capacitaciones'].empty and 'estado' in data['capacitaciones'].columns:
-            capac_completadas = len(data['capacitaciones'][data['capacitaciones']['estado'] == 'realizada'])
-            capac_total = len(data['capacitaciones'])
-            cumplimiento = (capac_completadas / capac_total * 100) if capac_total > 0 else 0
+        if kpis['cumplimiento_capacitaciones'] is not None and kpis['capacitaciones_total'] > 0:
             st.metric(
                 label="🎓 % Capacitación",
-                value=f"{cumplimiento:.1f}%",
-                delta=f"{capac_completadas}/{capac_total} completadas"
+                value=f"{kpis['cumplimiento_capacitaciones']:.1f}%",
+                delta=f"{kpis['capacitaciones_realizadas']}/{kpis['capacitaciones_total']} completadas"
             )
         else:
             st.metric(label="🎓 % Capacitación", value="N/A")
 
-def calcular_tasa_frecuencia(incidentes, horas_hombre):
-    """Tasa de Frecuencia = (N° Accidentes × 1,000,000) / Horas Hombre Trabajadas"""
-    return (incidentes * 1_000_000) / horas_hombre if horas_hombre > 0 else 0
-
-def calcular_tasa_severidad(dias_perdidos, horas_hombre):
-    """Tasa de Severidad = (Días Perdidos × 1,000,000) / Horas Hombre Trabajadas"""
-    return (dias_perdidos * 1_000_000) / horas_hombre if horas_hombre > 0 else 0
-
 def mostrar_tendencias(data, filtros):
     """Análisis de tendencias históricas"""
     
     st.subheader("📈 Tendencias Históricas")
     
-    if data['incidentes'].empty:
+    resumen = data['resumen_incidentes']
+    if resumen.empty:
         st.info("No hay datos de incidentes para mostrar tendencias")
         return
     
-    # Preparar datos mensuales
-    if 'fecha_hora' not in data['incidentes'].columns or 'tipo' not in data['incidentes'].columns:
-        st.info("Los datos de incidentes no tienen las columnas necesarias (fecha_hora, tipo)")
-        return
-    
-    data['incidentes']['mes'] = pd.to_datetime(data['incidentes']['fecha_hora']).dt.to_period('M').astype(str)
-    tendencias = data['incidentes'].groupby(['mes', 'tipo']).size().unstack(fill_value=0)
-    tendencias.index = tendencias.index.astype(str)
+    # Conteos mensuales desde el resumen diario
+    tendencias = tendencia_mensual(resumen, 'tipo')
     
     # Gráfico de líneas
     fig = px.line(
@@ -287,7 +313,7 @@ def mostrar_tendencias(data, filtros):
     )
     st.plotly_chart(fig2, use_container_width=True)
 
-def mostrar_analisis_riesgos(data):
+def mostrar_analisis_riesgos(data, filtros):
     """Análisis detallado de riesgos"""
     
     st.subheader("⚠️ Análisis de Riesgos Laborales")
@@ -303,11 +329,12 @@ def mostrar_analisis_riesgos(data):
         st.warning(f"Faltan columnas en los datos de riesgos: {', '.join(columnas_faltantes)}")
         return
     
+    cubo = cubo_por_version(data, filtros)
     col1, col2 = st.columns([2, 1])
     
     with col1:
         # Heatmap de riesgos por área y tipo
-        heatmap_data = data['riesgos'].groupby(['area', 'tipo_peligro'])['nivel_riesgo'].mean().unstack(fill_value=0)
+        heatmap_data = nivel_promedio(cubo)
         
         # Verificar que hay datos antes de crear el gráfico
         if not heatmap_data.empty and heatmap_data.shape[0] > 0 and heatmap_data.shape[1] > 0:
@@ -324,9 +351,10 @@ def mostrar_analisis_riesgos(data):
     
     with col2:
         # Distribución por severidad
+        por_estado = conteo_dimension(cubo, 'estado')
         fig2 = px.pie(
-            data['riesgos'],
-            names='estado',
+            names=por_estado.index,
+            values=por_estado.values,
             title="Distribución por Estado",
             hole=0.5
         )
@@ -350,23 +378,17 @@ def mostrar_analisis_incidentes(data):
     
     st.subheader("🚨 Análisis de Incidentes")
     
-    if data['incidentes'].empty:
+    resumen = data['resumen_incidentes']
+    if resumen.empty:
         st.info("No hay datos de incidentes")
         return
     
-    # Validar columnas necesarias
-    columnas_necesarias = ['area', 'tipo', 'fecha_hora']
-    columnas_faltantes = [col for col in columnas_necesarias if col not in data['incidentes'].columns]
-    if columnas_faltantes:
-        st.warning(f"Faltan columnas en los datos de incidentes: {', '.join(columnas_faltantes)}")
-        return
-    
     col1, col2 = st.columns(2)
     
     with col1:
         # Distribución por área
         fig = px.bar(
-            data['incidentes']['area'].value_counts(),
+            conteo_por(resumen, 'area'),
             title="Incidentes por Área",
             labels={'value': 'N° Incidentes', 'index': 'Área'},
             orientation='v'
@@ -375,18 +397,18 @@ def mostrar_analisis_incidentes(data):
     
     with col2:
         # Distribución por tipo
+        por_tipo = conteo_por(resumen, 'tipo')
         fig2 = px.pie(
-            data['incidentes'],
-            names='tipo',
+            names=por_tipo.index,
+            values=por_tipo.values,
             title="Proporción por Tipo",
             color_discrete_sequence=px.colors.qualitative.Set2
         )
         st.plotly_chart(fig2, use_container_width=True)
     
-    # Análisis temporal
+    # Análisis temporal (hora de Lima)
     st.markdown("#### ⏱️ Análisis Temporal")
-    data['incidentes']['hora'] = pd.to_datetime(data['incidentes']['fecha_hora']).dt.hour
-    incidentes_hora = data['incidentes']['hora'].value_counts().sort_index()
+    incidentes_hora = conteo_por_hora(resumen)
     
     fig3 = px.bar(
         incidentes_hora,
@@ -418,8 +440,13 @@ def mostrar_analisis_inspecciones(data):
     
     with col2:
         # Hallazgos por categoría
-        if not data['hallazgos'].empty and 'categoria' in data['hallazgos'].columns:
+        if data['resumen_hallazgos'] is not None:
+            hallazgos_cat = conteo_por(data['resumen_hallazgos'], 'categoria').head(10)
+        elif not data['hallazgos'].empty and 'categoria' in data['hallazgos'].columns:
             hallazgos_cat = data['hallazgos']['categoria'].value_counts().head(10)
+        else:
+            hallazgos_cat = None
+        if hallazgos_cat is not None and not hallazgos_cat.empty:
             fig2 = px.bar(
                 hallazgos_cat,
                 title="Top 10 Categorías de Hallazgos",
@@ -436,7 +463,7 @@ def mostrar_analisis_inspecciones(data):
                 right_on='id'
             )
             if not merged.empty and 'fecha_cierre' in merged.columns and 'categoria' in merged.columns:
-                merged['dias_cierre'] = (pd.to_datetime(merged['fecha_cierre']) - pd.to_datetime(merged['fecha_realizada'])).dt.days
+                merged['dias_cierre'] = (merged['fecha_cierre'] - merged['fecha_realizada']).dt.days
                 
                 fig3 = px.scatter(
                     merged,
@@ -455,24 +482,23 @@ def mostrar_reportes_legales(data, filtros):
     # Cálculo de indicadores legales
     st.markdown("#### 📋 Indicadores Obligatorios")
     
-    # Simular datos de horas hombre (en realidad debería venir de sistema de asistencia)
-    horas_hombre_mes = st.number_input(
-        "Horas Hombre Trabajadas (último mes)",
-        min_value=1,
-        value=50000,
-        help="Obtén este dato de tu sistema de marcación de asistencia"
-    )
-    
-    # Calcular tasas
-    if not data['incidentes'].empty and 'tipo' in data['incidentes'].columns:
-        accidentes = len(data['incidentes'][data['incidentes']['tipo'] == 'accidente'])
-    else:
-        accidentes = 0
+    # Horas hombre y días perdidos registrados (tabla horas_hombre → indicadores_sst)
+    totales = totales_periodo(data['indicadores'], filtros['areas'])
+    indicadores = indicadores_legales(kpis_por_version(data, filtros), totales)
+    if indicadores is None:
+        st.warning("⚠️ No hay horas hombre registradas para el período y áreas seleccionadas. Cárguelas abajo desde la exportación del sistema de asistencia.")
+        return
     
-    dias_perdidos = accidentes * 15  # Simulación (en realidad debería ser campo calculado)
+    accidentes = indicadores['accidentes']
+    dias_perdidos = indicadores['dias_perdidos']
+    tasa_frecuencia = indicadores['tasa_frecuencia']
+    tasa_severidad = indicadores['tasa_severidad']
+    indice_inc = indicadores['indice_incidencia']
     
-    tasa_frecuencia = calcular_tasa_frecuencia(accidentes, horas_hombre_mes)
-    tasa_severidad = calcular_tasa_severidad(dias_perdidos, horas_hombre_mes)
+    st.caption(
+        f"Horas hombre trabajadas: {totales['horas_hombre']:,.0f} · "
+        f"N° promedio de trabajadores: {totales['trabajadores']:,.0f} · Días perdidos: {dias_perdidos}"
+    )
     
     col1, col2, col3 = st.columns(3)
     
@@ -491,13 +517,23 @@ def mostrar_reportes_legales(data, filtros):
         )
     
     with col3:
-        indice_inc = (accidentes / (horas_hombre_mes / 2000)) if horas_hombre_mes > 0 else 0
         st.metric(
             "📊 Índice Incidencia",
             f"{indice_inc:.2f}",
-            help="Accidentes / N° trabajadores (asumiendo 2000h/año)"
+            help="Accidentes × 100 / N° promedio de trabajadores"
         )
     
+    # Tendencia mensual y de 12 meses móviles
+    serie = serie_indicadores(data['indicadores'], filtros['areas'])
+    if not serie.empty:
+        fig = px.line(
+            serie, x='periodo', y='tasa_frecuencia', color='ventana', markers=True,
+            title="Tasa de Frecuencia: mensual y 12 meses móviles",
+            labels={'periodo': 'Mes', 'tasa_frecuencia': 'TF', 'ventana': 'Ventana'},
+            template="plotly_white"
+        )
+        st.plotly_chart(fig, use_container_width=True)
+    
     # Tabla de referencia legal
     st.info("""
     **Referencias Ley 29783:**
@@ -526,36 +562,142 @@ def mostrar_reportes_legales(data, filtros):
         )
 
 def generar_reporte_legal(data, indicadores):
-    """Generar reporte legal en formato Excel para SUNAFIL/gerencia"""
-    
-    output = io.BytesIO()
-    
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Hoja 1: Resumen Ejecutivo
-        resumen = pd.DataFrame({
-            'Indicador': ['Tasa Frecuencia', 'Tasa Severidad', 'Índice Incidencia', 'N° Accidentes'],
-            'Valor': [indicadores['tasa_frecuencia'], indicadores['tasa_severidad'], 
-                     indicadores['indice_inc'], indicadores['accidentes']],
-            'Meta': [5.0, 100.0, 1.0, 0],
-            'Cumple': [indicadores['tasa_frecuencia'] < 5.0, 
-                      indicadores['tasa_severidad'] < 100.0,
-                      indicadores['indice_inc'] < 1.0,
-                      indicadores['accidentes'] == 0]
-        })
-        resumen.to_excel(writer, sheet_name='Resumen_Legal', index=False)
-        
-        # Hoja 2: Detalle Incidentes
-        if not data['incidentes'].empty:
-            data['incidentes'].to_excel(writer, sheet_name='Incidentes', index=False)
-        
-        # Hoja 3: Riesgos Críticos
-        if not data['riesgos'].empty:
-            riesgos_criticos = data['riesgos'][data['riesgos']['nivel_riesgo'] >= 15]
-            riesgos_criticos.to_excel(writer, sheet_name='Riesgos_Criticos', index=False)
-    
-    output.seek(0)
+    """Generar reporte legal en formato Excel para SUNAFIL/gerencia (escritura en streaming)"""
+    
+    libro = crear_libro_streaming()
+    
+    # Hoja 1: Resumen Ejecutivo
+    resumen = pd.DataFrame({
+        'Indicador': ['Tasa Frecuencia', 'Tasa Severidad', 'Índice Incidencia', 'N° Accidentes'],
+        'Valor': [indicadores['tasa_frecuencia'], indicadores['tasa_severidad'], 
+                 indicadores['indice_inc'], indicadores['accidentes']],
+        'Meta': [5.0, 100.0, 1.0, 0],
+        'Cumple': [indicadores['tasa_frecuencia'] < 5.0, 
+                  indicadores['tasa_severidad'] < 100.0,
+                  indicadores['indice_inc'] < 1.0,
+                  indicadores['accidentes'] == 0]
+    })
+    escribir_hoja(libro, 'Resumen_Legal', resumen.columns, [resumen])
+    
+    # Hoja 2: Detalle Incidentes
+    if not data['incidentes'].empty:
+        escribir_hoja(libro, 'Incidentes', data['incidentes'].columns, bloques_dataframe(data['incidentes']))
+    
+    # Hoja 3: Riesgos Críticos
+    if not data['riesgos'].empty:
+        riesgos_criticos = data['riesgos'][data['riesgos']['nivel_riesgo'] >= 15]
+        escribir_hoja(libro, 'Riesgos_Criticos', riesgos_criticos.columns, bloques_dataframe(riesgos_criticos))
     
     return {
-        'excel': output.read(),
+        'excel': guardar_libro(libro),
         'nombre_excel': f"Reporte_SST_{datetime.now().strftime('%Y%m')}.xlsx"
     }
+
+# Encabezados aceptados en las exportaciones del sistema de asistencia
+ALIAS_COLUMNAS_HORAS = {
+    'periodo': ['mes', 'periodo (aaaa-mm)', 'fecha'],
+    'area': ['área'],
+    'trabajadores': ['n° trabajadores', 'nro trabajadores', 'personal'],
+    'horas_trabajadas': ['horas', 'horas hombre', 'hh'],
+    'dias_perdidos': ['días perdidos', 'dias de descanso medico']
+}
+
+def validar_horas_hombre(bloque):
+    """
+    Validar un bloque de la exportación de asistencia con operaciones vectorizadas.
+    
+    Returns:
+        Tupla (validos, errores): DataFrame listo para horas_hombre y
+        DataFrame con columnas 'fila' y 'error'
+    """
+    df = renombrar_columnas(bloque, ALIAS_COLUMNAS_HORAS)
+    for columna in ALIAS_COLUMNAS_HORAS:
+        if columna not in df.columns:
+            df[columna] = ''
+    
+    periodo = pd.to_datetime(df['periodo'].astype(str).str.strip().str[:7], format='%Y-%m', errors='coerce')
+    area = df['area'].fillna('').astype(str).str.strip()
+    trabajadores = pd.to_numeric(df['trabajadores'], errors='coerce')
+    horas = pd.to_numeric(df['horas_trabajadas'], errors='coerce')
+    dias = pd.to_numeric(df['dias_perdidos'].replace('', '0'), errors='coerce')
+    
+    reglas = [
+        (periodo.isna(), "'periodo' debe tener el formato AAAA-MM"),
+        (area == '', "'area' es obligatorio"),
+        (trabajadores.isna() | (trabajadores < 0) | (trabajadores % 1 != 0), "'trabajadores' debe ser un entero ≥ 0"),
+        (horas.isna() | (horas < 0), "'horas_trabajadas' debe ser un número ≥ 0"),
+        (dias.isna() | (dias < 0) | (dias % 1 != 0), "'dias_perdidos' debe ser un entero ≥ 0")
+    ]
+    error = pd.Series('', index=df.index, dtype=object)
+    for mascara, mensaje in reglas:
+        error = error.mask(mascara, error + mensaje + '; ')
+    error = error.str.rstrip('; ')
+    con_error = error != ''
+    
+    validos = pd.DataFrame({
+        'periodo': periodo.dt.strftime('%Y-%m-%d'),
+        'area': area,
+        'trabajadores': trabajadores,
+        'horas_trabajadas': horas,
+        'dias_perdidos': dias,
+        '_fila': df.index
+    })[~con_error]
+    validos = validos.astype({'trabajadores': int, 'dias_perdidos': int})
+    errores = pd.DataFrame({'fila': df.index[con_error], 'error': error[con_error].values})
+    return validos, errores
+
+def importar_horas_hombre(usuario):
+    """Carga masiva de horas hombre y días perdidos por área y mes"""
+    if usuario['rol'] not in ['admin', 'sst']:
+        return
+    
+    with st.expander("📥 Cargar horas hombre (sistema de asistencia)"):
+        st.caption(
+            "Columnas esperadas: periodo (AAAA-MM), área, trabajadores, horas trabajadas, días perdidos. "
+            "Si un mes y área ya existen, se reemplazan."
+        )
+        
+        plantilla = pd.DataFrame(columns=list(ALIAS_COLUMNAS_HORAS.keys()))
+        st.download_button(
+            "📄 Descargar plantilla CSV",
+            plantilla.to_csv(index=False).encode('utf-8'),
+            "plantilla_horas_hombre.csv",
+            "text/csv"
+        )
+        
+        archivo = st.file_uploader("Exportación de asistencia", type=['xlsx', 'csv'], key="archivo_horas_hombre")
+        
+        if not archivo or not st.button("🚀 Validar e Importar", key="importar_horas_hombre", type="primary"):
+            return
+        
+        total_filas = 0
+        total_guardados = 0
+        reporte_errores = []
+        
+        with st.spinner("Importando horas hombre..."):
+            for bloque in leer_archivo_en_bloques(archivo):
+                validos, errores = validar_horas_hombre(bloque)
+                total_filas += len(bloque)
+                reporte_errores.append(errores)
+                if not validos.empty:
+                    registros = [dict(r, fuente=archivo.name) for r in validos.to_dict('records')]
+                    guardados, errores_bd = insertar_en_lotes('horas_hombre', registros, on_conflict='periodo,area')
+                    total_guardados += len(guardados)
+                    if errores_bd:
+                        reporte_errores.append(pd.DataFrame(errores_bd))
+            
+            try:
+                recalcular_indicadores()
+                cargar_datos_dashboard.clear()
+            except Exception as e:
+                st.error(f"Error recalculando indicadores: {e}")
+        
+        errores_df = pd.concat(reporte_errores, ignore_index=True) if reporte_errores else pd.DataFrame(columns=['fila', 'error'])
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("📄 Filas leídas", total_filas)
+        col2.metric("✅ Meses/áreas guardados", total_guardados)
+        col3.metric("❌ Filas con error", len(errores_df))
+        
+        if not errores_df.empty:
+            st.dataframe(errores_df.sort_values('fila'), use_container_width=True)
@@ -2,6 +2,7 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 from app.utils.supabase_client import get_supabase_client
+from app.utils.esquemas import aplicar_esquema
 from app.utils.storage_helper import subir_archivo_storage
 from app.auth import requerir_rol
 import requests
@@ -701,12 +702,10 @@ def generar_reporte_vencimiento(supabase):
         st.info("No hay documentos por vencer en 30 días")
         return
     
-    df = pd.DataFrame(documentos)
-    df['dias_restantes'] = (pd.to_datetime(df['fecha_vigencia']).dt.date - datetime.now().date()).apply(lambda x: x.days)
+    df = aplicar_esquema('documentos', documentos)
+    df['dias_restantes'] = (df['fecha_vigencia'] - pd.Timestamp(datetime.now().date())).dt.days
     
-    df_export = df[['codigo', 'titulo', 'tipo', 'area', 'fecha_vigencia', 'dias_restantes', 'usuarios']]
-    df_export['responsable'] = df_export['usuarios'].apply(lambda x: x['nombre_completo'])
-    df_export.drop('usuarios', axis=1, inplace=True)
+    df_export = df[['codigo', 'titulo', 'tipo', 'area', 'fecha_vigencia', 'dias_restantes', 'responsable']]
     
     csv = df_export.to_csv(index=False).encode('utf-8')
     st.download_button(
@@ -1,11 +1,35 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
-from app.utils.supabase_client import get_supabase_client
+from app.utils.supabase_client import get_supabase_client, leer_paginado
+from app.utils.versiones import leer_versiones_tablas
+from app.utils.resumenes import leer_resumen
+from app.utils.esquemas import aplicar_esquema
+from app.analytics import kpis_epp, clave_version, memorizar, tendencia_mensual
 from app.utils.storage_helper import subir_archivo_storage
 from app.auth import requerir_rol
 import json
 import requests
+import numpy as np
+from app.utils.catalogos import (
+    cargar_usuarios, indice_usuarios_por_nombre, cargar_catalogo_epp, indice_epp_por_nombre
+)
+from app.utils.importacion_helper import (
+    leer_archivo_en_bloques, renombrar_columnas, normalizar_serie, insertar_en_lotes
+)
+
+CONDICIONES_EPP = ["Nuevo", "Usado - Buena condición", "Usado - Regular", "Renovado"]
+
+# Encabezados aceptados en los archivos de asignación masiva
+ALIAS_COLUMNAS_ASIGNACION = {
+    'trabajador': ['nombre', 'nombre_completo', 'trabajador_nombre'],
+    'epp': ['epp_nombre', 'equipo'],
+    'fecha_entrega': ['fecha', 'entrega'],
+    'condicion': ['condición'],
+    'numero_serie': ['serie', 'lote', 'número de serie'],
+    'proveedor': [],
+    'orden_compra': ['orden de compra', 'oc']
+}
 
 def mostrar(usuario):
     """Módulo de Gestión de EPP (Ley 29783 Art. 29)"""
@@ -14,9 +38,10 @@ def mostrar(usuario):
     st.title("🛡️ Gestión de Equipos de Protección Personal (EPP)")
     
     # Tabs principales
-    tab1, tab2, tab3, tab4, tab5 = st.tabs([
+    tab1, tab2, tab_masiva, tab3, tab4, tab5 = st.tabs([
         "📦 Catálogo de EPP",
         "👤 Asignar EPP",
+        "👥 Asignación Masiva",
         "🔄 Renovar/Reasignar",
         "📊 Inventario y Vencimientos",
         "🔔 Configurar Alertas"
@@ -28,6 +53,9 @@ def mostrar(usuario):
     with tab2:
         asignar_epp(usuario)
     
+    with tab_masiva:
+        asignar_epp_masivo(usuario)
+    
     with tab3:
         renovar_epp(usuario)
     
@@ -265,7 +293,7 @@ def asignar_epp(usuario):
         with col_add1:
             condicion = st.selectbox(
                 "Condición del EPP",
-                options=["Nuevo", "Usado - Buena condición", "Usado - Regular", "Renovado"],
+                options=CONDICIONES_EPP,
                 help="Estado físico del equipo en la entrega"
             )
             
@@ -352,6 +380,220 @@ def notificar_asignacion_epp(data):
     except:
         pass
 
+def asignar_epp_masivo(usuario):
+    """Asignación masiva de EPP (matriz de selección o archivo CSV/Excel)"""
+    
+    st.subheader("👥 Asignación Masiva de EPP")
+    st.caption("Para incorporar turnos completos: una sola carga en lugar de un formulario por trabajador")
+    
+    catalogo = cargar_catalogo_epp()
+    trabajadores = [
+        u for u in cargar_usuarios()
+        if u.get('activo', True) and u.get('rol') != 'admin'
+    ]
+    
+    if not catalogo:
+        st.warning("⚠️ Primero registra EPP en el catálogo")
+        return
+    
+    if not trabajadores:
+        st.warning("⚠️ No hay trabajadores activos")
+        return
+    
+    modo = st.radio(
+        "Origen de las asignaciones",
+        ["Matriz de selección", "Archivo CSV/Excel"],
+        horizontal=True
+    )
+    
+    if modo == "Matriz de selección":
+        asignaciones = seleccionar_matriz_asignacion(trabajadores, catalogo)
+        errores = pd.DataFrame(columns=['fila', 'error'])
+    else:
+        archivo = st.file_uploader("Archivo de asignaciones", type=['xlsx', 'csv'], key="archivo_asignacion_epp")
+        st.caption("Columnas: trabajador, epp, fecha_entrega (opcional), condicion, numero_serie, proveedor, orden_compra")
+        if not archivo:
+            return
+        bloques = [validar_asignaciones_epp(b, trabajadores) for b in leer_archivo_en_bloques(archivo)]
+        asignaciones = pd.concat([b[0] for b in bloques], ignore_index=False) if bloques else pd.DataFrame()
+        errores = pd.concat([b[1] for b in bloques], ignore_index=True) if bloques else pd.DataFrame(columns=['fila', 'error'])
+    
+    if asignaciones.empty and errores.empty:
+        return
+    
+    asignaciones = calcular_vencimientos_epp(asignaciones, catalogo) if not asignaciones.empty else asignaciones
+    
+    col1, col2 = st.columns(2)
+    col1.metric("✅ Asignaciones válidas", len(asignaciones))
+    col2.metric("❌ Filas con error", len(errores))
+    
+    if not errores.empty:
+        with st.expander("❌ Reporte de errores", expanded=True):
+            st.dataframe(errores, use_container_width=True)
+    
+    if asignaciones.empty:
+        return
+    
+    with st.expander("👁️ Vista previa", expanded=False):
+        st.dataframe(
+            asignaciones[['trabajador_nombre', 'epp_nombre', 'fecha_entrega', 'fecha_vencimiento', 'condicion']].head(200),
+            use_container_width=True
+        )
+    
+    if st.button(f"🎁 Asignar {len(asignaciones)} EPP", type="primary"):
+        with st.spinner("Guardando asignaciones..."):
+            insertados, errores_bd = guardar_asignaciones_epp_masivo(asignaciones, usuario['id'])
+        
+        if insertados:
+            # Solo se notifica a los trabajadores cuyas filas se guardaron
+            fallidas = [e['fila'] for e in errores_bd]
+            notificar_asignacion_epp_masiva(asignaciones.drop(index=fallidas, errors='ignore'))
+            st.success(f"✅ {len(insertados)} asignaciones registradas")
+        if errores_bd:
+            st.error(f"❌ {len(errores_bd)} asignaciones no se pudieron guardar")
+            st.dataframe(pd.DataFrame(errores_bd), use_container_width=True)
+
+def seleccionar_matriz_asignacion(trabajadores, catalogo):
+    """Construir asignaciones como producto trabajadores × EPP seleccionados"""
+    
+    areas = sorted({t['area'] for t in trabajadores if t.get('area')})
+    areas_sel = st.multiselect("Preseleccionar trabajadores por área", areas)
+    
+    nombres = {t['id']: f"{t['nombre_completo']} ({t.get('area') or 'Sin área'})" for t in trabajadores}
+    trabajadores_ids = st.multiselect(
+        "Trabajadores",
+        options=list(nombres.keys()),
+        default=[t['id'] for t in trabajadores if t.get('area') in areas_sel],
+        format_func=lambda x: nombres[x]
+    )
+    
+    epp_nombres = {e['id']: e['nombre'] for e in catalogo}
+    epp_ids = st.multiselect(
+        "EPP a asignar",
+        options=list(epp_nombres.keys()),
+        format_func=lambda x: epp_nombres[x]
+    )
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        fecha_entrega = st.date_input("Fecha de Entrega", value=datetime.now().date(), key="fecha_entrega_masiva")
+    with col2:
+        condicion = st.selectbox("Condición del EPP", options=CONDICIONES_EPP, key="condicion_masiva")
+    
+    if not trabajadores_ids or not epp_ids:
+        st.info("ℹ️ Selecciona al menos un trabajador y un EPP")
+        return pd.DataFrame()
+    
+    matriz = pd.DataFrame({'trabajador_id': trabajadores_ids}).merge(
+        pd.DataFrame({'epp_id': epp_ids}), how='cross'
+    )
+    matriz['fecha_entrega'] = pd.Timestamp(fecha_entrega)
+    matriz['condicion'] = condicion
+    matriz.index = range(1, len(matriz) + 1)
+    return matriz
+
+def validar_asignaciones_epp(bloque, trabajadores):
+    """
+    Validar un bloque del archivo de asignaciones contra los índices cacheados.
+    
+    Args:
+        bloque: DataFrame leído del archivo
+        trabajadores: Usuarios que pueden recibir EPP (activos y no admin),
+            los mismos que ofrece el formulario manual
+    
+    Returns:
+        Tupla (validos, errores) con el mismo formato que el importador IPERC
+    """
+    df = renombrar_columnas(bloque, ALIAS_COLUMNAS_ASIGNACION)
+    for columna in ALIAS_COLUMNAS_ASIGNACION:
+        if columna not in df.columns:
+            df[columna] = ''
+    
+    df['trabajador_id'] = normalizar_serie(df['trabajador']).map(pd.Series(indice_usuarios_por_nombre(), dtype=object))
+    # Inactivos y administradores existen en el catálogo pero no reciben EPP
+    habilitados = {t['id'] for t in trabajadores}
+    no_habilitado = df['trabajador_id'].notna() & ~df['trabajador_id'].isin(habilitados)
+    df['epp_id'] = normalizar_serie(df['epp']).map(pd.Series(indice_epp_por_nombre(), dtype=object))
+    
+    fecha_texto = df['fecha_entrega'].fillna('').astype(str).str.strip()
+    df['fecha_entrega'] = pd.to_datetime(fecha_texto, errors='coerce', dayfirst=True)
+    df['fecha_entrega'] = df['fecha_entrega'].where(fecha_texto != '', pd.Timestamp(datetime.now().date()))
+    
+    canonicas = dict(zip(normalizar_serie(pd.Series(CONDICIONES_EPP)), CONDICIONES_EPP))
+    condicion_texto = normalizar_serie(df['condicion'])
+    df['condicion'] = condicion_texto.map(canonicas).where(condicion_texto != '', 'Nuevo')
+    
+    mensajes = {
+        'trabajador': np.where(df['trabajador_id'].isna(), "trabajador no encontrado; ", ''),
+        'habilitado': np.where(no_habilitado, "trabajador inactivo o sin asignación de EPP; ", ''),
+        'epp': np.where(df['epp_id'].isna(), "EPP no encontrado en el catálogo; ", ''),
+        'fecha_entrega': np.where(df['fecha_entrega'].isna(), "fecha_entrega inválida; ", ''),
+        'condicion': np.where(df['condicion'].isna(), "condición no válida; ", '')
+    }
+    error = pd.Series('', index=df.index, dtype=object)
+    for mensaje in mensajes.values():
+        error = error + mensaje
+    error = error.str.rstrip('; ')
+    con_error = error != ''
+    
+    errores = pd.DataFrame({'fila': df.index[con_error], 'error': error[con_error].values})
+    return df[~con_error], errores
+
+def calcular_vencimientos_epp(asignaciones, catalogo):
+    """Calcular fecha_vencimiento según la vida útil del catálogo (vectorizado)"""
+    df_catalogo = pd.DataFrame(catalogo)[['id', 'nombre', 'vida_util_meses']].rename(
+        columns={'id': 'epp_id', 'nombre': 'epp_nombre'}
+    )
+    nombres = pd.Series({u['id']: u['nombre_completo'] for u in cargar_usuarios()}, dtype=object)
+    
+    filas = asignaciones.index
+    resultado = asignaciones.drop(columns=['epp_nombre', 'vida_util_meses'], errors='ignore').merge(
+        df_catalogo, on='epp_id', how='left'
+    )
+    resultado.index = filas
+    resultado['trabajador_nombre'] = resultado['trabajador_id'].map(nombres)
+    # Misma regla que la asignación individual: vida útil en meses × 30 días
+    resultado['fecha_vencimiento'] = resultado['fecha_entrega'] + pd.to_timedelta(
+        resultado['vida_util_meses'].fillna(0).astype(int) * 30, unit='D'
+    )
+    return resultado
+
+def guardar_asignaciones_epp_masivo(asignaciones, usuario_id):
+    """Guardar asignaciones en lotes; devuelve (insertados, errores)"""
+    registros = pd.DataFrame({
+        'trabajador_id': asignaciones['trabajador_id'],
+        'epp_id': asignaciones['epp_id'],
+        'fecha_entrega': asignaciones['fecha_entrega'].dt.strftime('%Y-%m-%d'),
+        'fecha_vencimiento': asignaciones['fecha_vencimiento'].dt.strftime('%Y-%m-%d'),
+        'estado': 'activo',
+        'condicion': asignaciones['condicion'],
+        'numero_serie': asignaciones.get('numero_serie', ''),
+        'proveedor': asignaciones.get('proveedor', ''),
+        'orden_compra': asignaciones.get('orden_compra', ''),
+        'asignado_por': usuario_id,
+        '_fila': asignaciones.index
+    }, index=asignaciones.index)
+    
+    return insertar_en_lotes('epp_asignaciones', registros.to_dict('records'))
+
+def notificar_asignacion_epp_masiva(asignaciones):
+    """Notificar a n8n todas las asignaciones en un solo envío"""
+    areas = pd.Series({u['id']: u.get('area') for u in cargar_usuarios()}, dtype=object)
+    detalle = pd.DataFrame({
+        'trabajador_id': asignaciones['trabajador_id'],
+        'epp_nombre': asignaciones['epp_nombre'],
+        'fecha_vencimiento': asignaciones['fecha_vencimiento'].dt.strftime('%Y-%m-%d'),
+        'area': asignaciones['trabajador_id'].map(areas)
+    })
+    try:
+        requests.post(
+            st.secrets["N8N_WEBHOOK_URL"] + "/epp-asignado-masivo",
+            json={'total': len(detalle), 'asignaciones': detalle.to_dict('records')},
+            timeout=10
+        )
+    except:
+        pass
+
 def renovar_epp(usuario):
     """Renovar o reasignar EPP vencido o dañado"""
     
@@ -371,8 +613,7 @@ def renovar_epp(usuario):
         return
     
     # Filtrar por vencimiento (próximos 30 días o ya vencidos)
-    df_asignaciones = pd.DataFrame(asignaciones)
-    df_asignaciones['fecha_vencimiento'] = pd.to_datetime(df_asignaciones['fecha_vencimiento'])
+    df_asignaciones = aplicar_esquema('epp_asignaciones', asignaciones)
     df_asignaciones['dias_restantes'] = (df_asignaciones['fecha_vencimiento'] - pd.Timestamp.now()).dt.days
     
     df_vencidas = df_asignaciones[
@@ -384,9 +625,6 @@ def renovar_epp(usuario):
         st.success("✅ No hay EPP por renovar en los próximos 30 días")
         return
     
-    # Normalizar nombre de columna de usuarios
-    usuarios_col = 'usuarios!epp_asignaciones_trabajador_id_fkey' if 'usuarios!epp_asignaciones_trabajador_id_fkey' in df_vencidas.columns else 'usuarios'
-    
     # Mostrar tabla
     st.markdown("#### ⚠️ EPP por Renovar/Reasignar")
     
@@ -395,12 +633,11 @@ def renovar_epp(usuario):
             col1, col2, col3, col4 = st.columns([2, 3, 2, 2])
             
             with col1:
-                usuario_data = asig[usuarios_col] if isinstance(asig[usuarios_col], dict) else {}
-                st.write(f"**{usuario_data.get('nombre_completo', 'N/A')}**")
-                st.caption(f"Área: {usuario_data.get('area', 'N/A')}")
+                st.write(f"**{asig['nombre_completo'] if pd.notna(asig['nombre_completo']) else 'N/A'}**")
+                st.caption(f"Área: {asig['area'] if pd.notna(asig['area']) else 'N/A'}")
             
             with col2:
-                st.write(f"**{asig['epp_catalogo']['nombre']}**")
+                st.write(f"**{asig['epp_nombre']}**")
                 st.caption(f"Condición: {asig['condicion']}")
             
             with col3:
@@ -408,7 +645,7 @@ def renovar_epp(usuario):
                     st.error(f"🚨 VENCIDO hace {abs(asig['dias_restantes'])} días")
                 else:
                     st.warning(f"⏰ Vence en {asig['dias_restantes']} días")
-                st.caption(f"Fecha: {asig['fecha_vencimiento']}")
+                st.caption(f"Fecha: {asig['fecha_vencimiento'].date()}")
             
             with col4:
                 if st.button("🔄 Renovar", key=f"renov_{asig['id']}"):
@@ -471,6 +708,26 @@ def notificar_renovacion_epp(data):
     except:
         pass
 
+def calcular_kpis_epp():
+    """
+    Indicadores de EPP con una sola lectura (estado y vencimiento) de las
+    asignaciones, memorizados mientras la tabla no cambie
+    """
+    versiones = leer_versiones_tablas(['epp_asignaciones'])
+
+    def calcular():
+        supabase = get_supabase_client()
+        filas = [
+            fila
+            for pagina in leer_paginado(
+                lambda: supabase.table('epp_asignaciones').select('id, estado, fecha_vencimiento').order('id')
+            )
+            for fila in pagina
+        ]
+        return kpis_epp(pd.DataFrame(filas))
+
+    return memorizar(clave_version('kpis_epp', None, versiones), calcular)
+
 def dashboard_epp(usuario):
     """Dashboard de inventario y vencimientos"""
     
@@ -481,25 +738,24 @@ def dashboard_epp(usuario):
     # KPIs
     col_kpi1, col_kpi2, col_kpi3, col_kpi4 = st.columns(4)
     
-    total_asignaciones = supabase.table('epp_asignaciones').select('*', count='exact').execute()
-    total_activos = supabase.table('epp_asignaciones').select('*', count='exact').eq('estado', 'activo').execute()
-    total_vencidos = supabase.table('epp_asignaciones').select('*', count='exact').eq('estado', 'activo').lte('fecha_vencimiento', datetime.now().date()).execute()
+    try:
+        kpis = calcular_kpis_epp()
+    except Exception as e:
+        st.error(f"Error calculando indicadores de EPP: {e}")
+        kpis = kpis_epp(None)
     
     with col_kpi1:
-        st.metric("📦 Total Asignaciones", total_activos.count)
+        st.metric("📦 Total Asignaciones", kpis['activos'])
     
     with col_kpi2:
         # EPP por vencer en 30 días
-        fecha_vencimiento = datetime.now().date() + timedelta(days=30)
-        por_vencer = supabase.table('epp_asignaciones').select('*', count='exact').eq('estado', 'activo').lte('fecha_vencimiento', fecha_vencimiento).gt('fecha_vencimiento', datetime.now().date()).execute()
-        st.metric("⏰ Por Vencer", por_vencer.count)
+        st.metric("⏰ Por Vencer", kpis['por_vencer'])
     
     with col_kpi3:
-        st.metric("🚨 Vencidos", total_vencidos.count)
+        st.metric("🚨 Vencidos", kpis['vencidos'])
     
     with col_kpi4:
-        tasa_cumplimiento = (total_activos.count - total_vencidos.count) / total_activos.count * 100 if total_activos.count > 0 else 0
-        st.metric("✅ Cumplimiento", f"{tasa_cumplimiento:.1f}%")
+        st.metric("✅ Cumplimiento", f"{kpis['cumplimiento']:.1f}%")
     
     # Filtros
     st.markdown("### 🔍 Detalle de Asignaciones")
@@ -518,6 +774,20 @@ def dashboard_epp(usuario):
             options=["todos", "activo", "vencido", "renovado"]
         )
     
+    # Entregas por mes desde el resumen diario (se omite si la tabla no existe)
+    try:
+        resumen = leer_resumen(
+            'epp',
+            area=[area_filtro] if area_filtro != "todos" else None,
+            estado=[estado_filtro] if estado_filtro != "todos" else None
+        )
+        entregas = tendencia_mensual(resumen)
+        if not entregas.empty:
+            st.markdown("#### 📅 Entregas por Mes")
+            st.bar_chart(entregas)
+    except Exception:
+        pass
+    
     # Cargar asignaciones - especificar relación del trabajador para evitar ambigüedad
     query = supabase.from_('epp_asignaciones').select(
         '*, '
@@ -536,28 +806,25 @@ def dashboard_epp(usuario):
         st.info("ℹ️ No hay asignaciones con los filtros seleccionados")
         return
     
-    df = pd.DataFrame(asignaciones)
-    
-    # Normalizar nombre de columna de usuarios (puede venir con nombre de foreign key)
-    usuarios_col = 'usuarios!epp_asignaciones_trabajador_id_fkey' if 'usuarios!epp_asignaciones_trabajador_id_fkey' in df.columns else 'usuarios'
+    # Trabajador y catálogo ya aplanados (nombre_completo, area, epp_nombre)
+    df = aplicar_esquema('epp_asignaciones', asignaciones)
     
     # Aplicar filtro de área si es necesario
     if area_filtro != "todos":
-        df = df[df[usuarios_col].apply(lambda x: x.get('area') if isinstance(x, dict) else None) == area_filtro]
+        df = df[df['area'] == area_filtro]
     
     # Preparar datos
-    df['fecha_vencimiento'] = pd.to_datetime(df['fecha_vencimiento']).dt.date
-    df['dias_restantes'] = (df['fecha_vencimiento'] - datetime.now().date()).apply(lambda x: x.days)
+    df = df.assign(dias_restantes=(df['fecha_vencimiento'] - pd.Timestamp(datetime.now().date())).dt.days)
     
     # Mostrar tabla
-    df_display = df[['epp_catalogo', usuarios_col, 'fecha_entrega', 'fecha_vencimiento', 'estado', 'dias_restantes']].copy()
+    df_display = df[['epp_nombre', 'nombre_completo', 'area', 'fecha_entrega', 'fecha_vencimiento', 'estado', 'dias_restantes']].copy()
     
     # Renombrar columnas
-    df_display['EPP'] = df_display['epp_catalogo'].apply(lambda x: x['nombre'] if isinstance(x, dict) else '')
-    df_display['Trabajador'] = df_display[usuarios_col].apply(lambda x: x.get('nombre_completo') if isinstance(x, dict) else '')
-    df_display['Área'] = df_display[usuarios_col].apply(lambda x: x.get('area') if isinstance(x, dict) else '')
-    df_display['Fecha Entrega'] = pd.to_datetime(df_display['fecha_entrega']).dt.strftime('%d/%m/%Y')
-    df_display['Fecha Vencimiento'] = pd.to_datetime(df_display['fecha_vencimiento']).dt.strftime('%d/%m/%Y')
+    df_display['EPP'] = df_display['epp_nombre'].fillna('')
+    df_display['Trabajador'] = df_display['nombre_completo'].fillna('')
+    df_display['Área'] = df_display['area'].fillna('')
+    df_display['Fecha Entrega'] = df_display['fecha_entrega'].dt.strftime('%d/%m/%Y')
+    df_display['Fecha Vencimiento'] = df_display['fecha_vencimiento'].dt.strftime('%d/%m/%Y')
     
     # Seleccionar solo columnas para mostrar
     columnas_mostrar = ['EPP', 'Trabajador', 'Área', 'Fecha Entrega', 'Fecha Vencimiento', 'estado']
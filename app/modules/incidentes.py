@@ -2,11 +2,20 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, timedelta
 from app.utils.supabase_client import get_supabase_client
-from app.utils.storage_helper import subir_archivo_storage
+from app.utils.storage_helper import (
+    subir_archivo_storage, preparar_archivo_storage, url_publica_storage, subir_bytes_storage
+)
+from app.utils.codigos import generar_codigo
+from app.utils.catalogos import indice_usuarios_por_nombre
+from app.utils.importacion_helper import normalizar_texto
+from app.utils.tareas import ejecutar_en_segundo_plano
+import uuid
 from app.auth import requerir_rol
 import json
 import requests
-from app.modules.dashboard import calcular_tasa_frecuencia
+from app.analytics import kpis_incidentes, totales_periodo
+from app.utils.indicadores_sst import leer_indicadores
+from app.utils.esquemas import aplicar_esquema
 import plotly.express as px
 
 def mostrar(usuario):
@@ -44,18 +53,23 @@ def reportar_incidente(usuario):
     st.subheader("⚡ Reporte Rápido de Incidente")
     st.caption("Tiempo estimado: 90 segundos | Cumplimiento: Art. 33° Ley 29783")
     
+    # Clave de idempotencia del reporte en curso: un doble clic o un reintento
+    # reutilizan la misma clave y no duplican el incidente
+    if 'incidente_idempotency_key' not in st.session_state:
+        st.session_state.incidente_idempotency_key = str(uuid.uuid4())
+    
     # Formulario optimizado para móvil
     with st.form("form_incidente_rapido", clear_on_submit=True):
         col1, col2 = st.columns(2)
         
         with col1:
-            # Código automático
+            # Código automático (se asigna al guardar)
             fecha_actual = datetime.now()
-            codigo = st.text_input(
+            st.text_input(
                 "Código del Incidente",
-                value=f"INC-{fecha_actual.strftime('%Y%m%d-%H%M%S')}",
+                value=f"INC-{fecha_actual.strftime('%Y%m%d')}-######",
                 disabled=True,
-                help="Generado automáticamente"
+                help="Generado automáticamente al reportar"
             )
             
             tipo = st.selectbox(
@@ -200,22 +214,24 @@ def reportar_incidente(usuario):
                 st.error("❌ Descripción y nombre del trabajador son obligatorios")
                 return
             
-            # Buscar ID del trabajador
+            # Buscar ID del trabajador (índice cacheado de usuarios)
             trabajador_id = None
             if trabajador_nombre == usuario['nombre_completo']:
                 # Es el mismo usuario que reporta
                 trabajador_id = usuario['id']
             else:
-                # Buscar por nombre en la base de datos
-                try:
-                    supabase = get_supabase_client()
-                    trabajador_result = supabase.table('usuarios').select('id').eq('nombre_completo', trabajador_nombre).execute()
-                    if trabajador_result.data:
-                        trabajador_id = trabajador_result.data[0]['id']
-                except Exception as e:
+                trabajador_id = indice_usuarios_por_nombre().get(normalizar_texto(trabajador_nombre))
+                if trabajador_id is None:
                     st.warning(f"No se pudo encontrar el trabajador: {trabajador_nombre}")
             
-            # Preparar datos
+            # Preparar datos: un solo código por clave de idempotencia, así
+            # los reintentos del mismo reporte no consumen números
+            try:
+                codigo = codigo_para_reporte(st.session_state.incidente_idempotency_key)
+            except Exception as e:
+                st.error(f"Error generando código del incidente: {e}")
+                return
+            
             incidente_data = {
                 'codigo': codigo,
                 'tipo': tipo,
@@ -233,27 +249,38 @@ def reportar_incidente(usuario):
                 'estado': 'reportado'
             }
             
-            # Guardar incidente
-            incidente_id = guardar_incidente(incidente_data)
-
-            print("Este es el id del incidente guardado: ", incidente_id)
-
+            # Guardar incidente + referencias de evidencia en una sola llamada;
+            # las subidas y la notificación quedan en segundo plano
+            archivos = [a for a in [foto, video, audio, *(documentos or [])] if a]
+            resultado = registrar_incidente(
+                incidente_data,
+                archivos,
+                st.session_state.incidente_idempotency_key,
+                notificar=notificar_inmediato or prioridad['nivel'] in ['alto', 'crítico']
+            )
             
-            if incidente_id:
-                # Subir evidencia
-                with st.spinner("📤 Subiendo evidencia..."):
-                    subir_evidencia_incidente(incidente_id, foto, video, audio, documentos)
-                
-                # Notificar si es necesario
-                if notificar_inmediato or prioridad['nivel'] in ['alto', 'crítico']:
-                    notificar_incidente(incidente_data)
+            if resultado:
+                incidente, duplicado = resultado
+                # Nuevo reporte => nueva clave
+                st.session_state.incidente_idempotency_key = str(uuid.uuid4())
                 
-                st.success(f"✅ Incidente reportado: {codigo}")
-                st.info("El supervisor será notificado y se iniciará investigación")
+                if duplicado:
+                    st.info(f"ℹ️ Este reporte ya estaba registrado: {incidente.get('codigo')}")
+                else:
+                    st.success(f"✅ Incidente reportado: {incidente.get('codigo')}")
+                    st.info("El supervisor será notificado y se iniciará investigación")
                 
                 # Limpiar formulario
                 st.rerun()
 
+def codigo_para_reporte(idempotency_key):
+    """Código INC reservado para la clave del reporte (se reserva una sola vez)"""
+    codigos = st.session_state.setdefault('incidente_codigos', {})
+    if idempotency_key not in codigos:
+        codigos.clear()
+        codigos[idempotency_key] = generar_codigo('INC')
+    return codigos[idempotency_key]
+
 def calcular_prioridad(lesiones, danos):
     """Calcular nivel de prioridad según consecuencias"""
     # Puntuación de gravedad
@@ -271,110 +298,136 @@ def calcular_prioridad(lesiones, danos):
     else:
         return {'nivel': 'bajo', 'label': 'BAJO', 'descripcion': 'Respuesta estándar (72 horas)', 'gravedad': gravedad}
 
-def guardar_incidente(data):
-    """Guardar incidente en Supabase"""
-    supabase = get_supabase_client()
-    print("esto se va a guardar: ")
+def registrar_incidente(data, archivos, idempotency_key, notificar=False):
+    """
+    Registrar un incidente de forma idempotente.
+    
+    El incidente y las URLs de su evidencia se guardan en una sola llamada a la
+    función `registrar_incidente` de la BD (scripts/sql/registrar_incidente.sql).
+    Las URLs se calculan antes de subir los archivos, por lo que la subida y la
+    notificación a n8n se ejecutan en segundo plano. La ruta de cada archivo
+    depende solo de la clave y su posición: un reintento vuelve a subir (con
+    upsert) la evidencia que el primer intento no llegó a guardar.
+    
+    Args:
+        data: Datos del incidente
+        archivos: Archivos de evidencia (UploadedFile / camera_input)
+        idempotency_key: UUID generado por el cliente para este reporte
+        notificar: Si se debe notificar al supervisor vía n8n
+    
+    Returns:
+        Tupla (incidente, duplicado) o None si hubo error
+    """
+    bucket = 'sst-evidencias'
+    
     try:
-        response = supabase.table('incidentes').insert(data).execute()
-        return response.data[0]['id'] if response.data else None
+        preparados = [
+            preparar_archivo_storage(archivo, f'incidentes/{idempotency_key}/', nombre=f'evidencia_{i}')
+            for i, archivo in enumerate(archivos, start=1)
+        ]
+        payload = dict(data, evidencia=[url_publica_storage(bucket, p['ruta']) for p in preparados])
+        
+        supabase = get_supabase_client()
+        respuesta = supabase.rpc('registrar_incidente', {
+            'p_idempotency_key': idempotency_key,
+            'p_incidente': payload
+        }).execute().data
     except Exception as e:
         st.error(f"Error guardando incidente: {e}")
         return None
-
-def subir_evidencia_incidente(incidente_id, foto, video, audio, documentos):
-    """Subir múltiples tipos de evidencia"""
-    urls = []
-    
-    # Foto
-    if foto:
-        url = subir_archivo_storage(
-            foto,
-            bucket='sst-evidencias',
-            carpeta=f'incidentes/{incidente_id}/'
-        )
-        if url: urls.append(url)
-    
-    # Video
-    if video:
-        url = subir_archivo_storage(
-            video,
-            bucket='sst-evidencias',
-            carpeta=f'incidentes/{incidente_id}/'
-        )
-        if url: urls.append(url)
-    
-    # Audio
-    if audio:
-        url = subir_archivo_storage(
-            audio,
-            bucket='sst-evidencias',
-            carpeta=f'incidentes/{incidente_id}/'
+    
+    incidente = respuesta['incidente']
+    duplicado = respuesta['duplicado']
+    
+    if duplicado:
+        # Solo la evidencia que el incidente guardado referencia (o que falló)
+        registradas = set(incidente.get('evidencia') or []) | set(incidente.get('evidencia_fallida') or [])
+    else:
+        registradas = set(payload['evidencia'])
+    
+    for preparado, url in zip(preparados, payload['evidencia']):
+        if url not in registradas:
+            continue
+        ejecutar_en_segundo_plano(
+            subir_evidencia, bucket, preparado, idempotency_key, url, restaurar=duplicado,
+            al_fallar=lambda error, url=url: marcar_evidencia_fallida(idempotency_key, url)
         )
-        if url: urls.append(url)
     
-    # Documentos
-    if documentos:
-        for doc in documentos:
-            url = subir_archivo_storage(
-                doc,
-                bucket='sst-evidencias',
-                carpeta=f'incidentes/{incidente_id}/'
-            )
-            if url: urls.append(url)
+    if notificar and not duplicado:
+        notificar_incidente(data)
     
-    # Actualizar incidente con URLs
-    if urls:
-        supabase = get_supabase_client()
-        supabase.table('incidentes').update({
-            'evidencia': urls
-        }).eq('id', incidente_id).execute()
+    return incidente, duplicado
+
+def subir_evidencia(bucket, preparado, idempotency_key, url, restaurar=False):
+    """
+    Subir (o volver a subir) un archivo de evidencia a su ruta fija. Con
+    restaurar, en un reintento, devuelve la URL a evidencia si un intento
+    anterior la había marcado como fallida. Corre en segundo plano, sin st.*
+    """
+    subir_bytes_storage(
+        bucket, preparado['ruta'], preparado['bytes'], preparado['content_type'], upsert=True
+    )
+    if not restaurar:
+        return
+    supabase = get_supabase_client()
+    supabase.rpc('restaurar_evidencia', {
+        'p_idempotency_key': idempotency_key,
+        'p_url': url
+    }).execute()
+
+def marcar_evidencia_fallida(idempotency_key, url):
+    """
+    Pasar una URL de evidencia que no se pudo subir a evidencia_fallida
+    (ver scripts/sql/registrar_incidente.sql). Corre en segundo plano, sin st.*
+    """
+    supabase = get_supabase_client()
+    supabase.rpc('marcar_evidencia_fallida', {
+        'p_idempotency_key': idempotency_key,
+        'p_url': url
+    }).execute()
 
 def notificar_incidente(data):
-    """Notificar vía n8n sobre nuevo incidente"""
-    try:
-        supabase = get_supabase_client()
-        
-        # Obtener supervisor del área
-        supervisor = supabase.table('usuarios').select(
-            'id', 'nombre_completo', 'email'
-        ).eq('rol', 'supervisor').eq('area', data['area']).execute().data
-        
-        supervisor_email = supervisor[0]['email'] if supervisor else "sst@empresa.com"
-        supervisor_id = supervisor[0]['id'] if supervisor else None
+    """Notificar vía n8n sobre nuevo incidente (en segundo plano)"""
+    base_url = st.secrets.get("N8N_WEBHOOK_URL", "https://santos-n8n.siu9f2.easypanel.host/webhook")
+    ejecutar_en_segundo_plano(enviar_notificacion_incidente, data, base_url)
 
-        print("Este es el correo del supervisor: ", supervisor_email)
-        
-        # Extraer gravedad de las consecuencias
+def enviar_notificacion_incidente(data, base_url):
+    """Buscar supervisor del área y enviar el incidente a n8n (sin usar st.*)"""
+    supabase = get_supabase_client()
+    
+    # Obtener supervisor del área
+    supervisor = supabase.table('usuarios').select(
+        'id', 'nombre_completo', 'email'
+    ).eq('rol', 'supervisor').eq('area', data['area']).execute().data
+    
+    supervisor_email = supervisor[0]['email'] if supervisor else "sst@empresa.com"
+    supervisor_id = supervisor[0]['id'] if supervisor else None
+    
+    # Extraer gravedad de las consecuencias
+    gravedad_numerica = 0
+    try:
+        if data.get('consecuencias'):
+            consecuencias = json.loads(data['consecuencias']) if isinstance(data['consecuencias'], str) else data['consecuencias']
+            gravedad_numerica = consecuencias.get('gravedad', 0)
+    except:
         gravedad_numerica = 0
-        try:
-            if data.get('consecuencias'):
-                consecuencias = json.loads(data['consecuencias']) if isinstance(data['consecuencias'], str) else data['consecuencias']
-                gravedad_numerica = consecuencias.get('gravedad', 0)
-        except:
-            gravedad_numerica = 0
-        
-        # Enviar a n8n 
-        base_url = st.secrets.get("N8N_WEBHOOK_URL", "https://santos-n8n.siu9f2.easypanel.host/webhook")
-        webhook_url = base_url + "/incidente-reportado"
-        print("Este es el webhook url: ", webhook_url)
-        print("Gravedad a enviar: ", gravedad_numerica)
-        requests.post(
-            webhook_url,
-            json={
-                'codigo': data['codigo'],
-                'tipo': data['tipo'],
-                'area': data['area'],
-                'descripcion': data['descripcion'],
-                'puesto_trabajo': data.get('puesto_trabajo', ''),
-                'supervisor_email': supervisor_email,
-                'supervisor_id': supervisor_id,
-                'gravedad': gravedad_numerica
-            },
-            timeout=5
-        )
-    except Exception as e:
-        st.warning(f"⚠️ No se pudo notificar al supervisor: {e}")
+    
+    # Enviar a n8n
+    respuesta = requests.post(
+        base_url + "/incidente-reportado",
+        json={
+            'codigo': data['codigo'],
+            'tipo': data['tipo'],
+            'area': data['area'],
+            'descripcion': data['descripcion'],
+            'puesto_trabajo': data.get('puesto_trabajo', ''),
+            'supervisor_email': supervisor_email,
+            'supervisor_id': supervisor_id,
+            'gravedad': gravedad_numerica
+        },
+        timeout=5
+    )
+    respuesta.raise_for_status()
 
 def investigar_incidente(usuario):
     """Investigar incidente y aplicar análisis de causa raíz (5 Porqués)"""
@@ -436,6 +489,11 @@ def investigar_incidente(usuario):
             st.markdown("**Evidencia:**")
             for url in incidente_seleccionado['evidencia']:
                 st.link_button("Ver evidencia", url)
+        if incidente_seleccionado.get('evidencia_fallida'):
+            st.warning(
+                f"⚠️ {len(incidente_seleccionado['evidencia_fallida'])} archivo(s) de evidencia no se "
+                "pudieron subir; vuelva a adjuntarlos en la investigación"
+            )
     
     # Formulario de investigación
     st.markdown("### 🔍 Investigación Detallada")
@@ -647,31 +705,82 @@ def guardar_investigacion_incidente(incidente_id, investigacion_data, fotos, doc
 
 def crear_accion_correctiva_automatica(incidente_id, recomendaciones, responsable_id):
     """Crear acciones correctivas derivadas de investigación"""
+    # Parsear recomendaciones línea por línea
+    fecha_limite = (datetime.now() + timedelta(days=7)).isoformat()
+    acciones = [
+        {
+            'descripcion': accion.strip(),
+            'responsable_id': responsable_id,
+            'fecha_limite': fecha_limite
+        }
+        for accion in recomendaciones.split('\n') if accion.strip()
+    ]
+    
+    return crear_plan_acciones(incidente_id, acciones)
+
+def crear_plan_acciones(incidente_id, acciones):
+    """
+    Crear un plan de acciones correctivas en una sola inserción.
+    
+    Args:
+        incidente_id: ID del incidente investigado
+        acciones: Lista de dicts con 'descripcion', 'responsable_id' y 'fecha_limite'
+    
+    Returns:
+        Lista de IDs de las acciones creadas (vacía si no se pudo guardar)
+    """
+    registros = [
+        {
+            'incidente_id': incidente_id,
+            'descripcion': accion['descripcion'],
+            'responsable_id': accion.get('responsable_id'),
+            'fecha_limite': accion['fecha_limite'].isoformat() if hasattr(accion['fecha_limite'], 'isoformat') else accion['fecha_limite'],
+            'estado': 'abierta'
+        }
+        for accion in acciones if accion.get('descripcion', '').strip()
+    ]
+    
+    if not registros:
+        return []
+    
     supabase = get_supabase_client()
     
     try:
-        # Parsear recomendaciones línea por línea
-        acciones = recomendaciones.split('\n')
-        
-        for accion in acciones:
-            if accion.strip():
-                supabase.table('acciones_correctivas').insert({
-                    'incidente_id': incidente_id,
-                    'descripcion': accion.strip(),
-                    'responsable_id': responsable_id,
-                    'fecha_limite': (datetime.now() + timedelta(days=7)).isoformat(),
-                    'estado': 'abierta'
-                }).execute()
-        
-        # Notificar vía n8n
+        # Una sola petición para todo el plan (PostgREST inserta la lista en una transacción)
+        response = supabase.table('acciones_correctivas').insert(registros).execute()
+        acciones_creadas = response.data or []
+    except Exception as e:
+        st.warning(f"⚠️ No se pudo crear el plan de acciones: {e}")
+        return []
+    
+    ids = [a['id'] for a in acciones_creadas]
+    notificar_plan_acciones(incidente_id, acciones_creadas)
+    
+    return ids
+
+def notificar_plan_acciones(incidente_id, acciones_creadas):
+    """Notificar vía n8n el plan de acciones completo en un solo envío"""
+    try:
         webhook_url = st.secrets.get("N8N_WEBHOOK_URL", "https://santos-n8n.siu9f2.easypanel.host/webhook/incidente-reportado")
         requests.post(
             webhook_url.replace("/incidente-reportado", "/acciones-creadas"),
-            json={"incidente_id": incidente_id, "num_acciones": len(acciones)}
+            json={
+                "incidente_id": incidente_id,
+                "num_acciones": len(acciones_creadas),
+                "acciones": [
+                    {
+                        'id': a['id'],
+                        'descripcion': a.get('descripcion'),
+                        'responsable_id': a.get('responsable_id'),
+                        'fecha_limite': a.get('fecha_limite')
+                    }
+                    for a in acciones_creadas
+                ]
+            },
+            timeout=5
         )
-        
     except Exception as e:
-        st.warning(f"⚠️ No se pudieron crear todas las acciones: {e}")
+        st.warning(f"⚠️ Acciones guardadas, pero no se pudo notificar: {e}")
 
 def gestionar_acciones(usuario):
     """Gestionar acciones correctivas y preventivas"""
@@ -913,71 +1022,48 @@ def dashboard_incidentes(usuario):
         st.info("ℹ️ No hay incidentes en este período")
         return
     
-    df_incidentes = pd.DataFrame(incidentes)
+    df_incidentes = aplicar_esquema('incidentes', incidentes)
     
     # KPIs
     st.markdown("#### 📈 Indicadores Clave")
     
+    # Horas hombre registradas del período (tabla horas_hombre → indicadores_sst)
+    try:
+        totales = totales_periodo(leer_indicadores(fecha_inicio, fecha_fin), area_filtro)
+    except Exception:
+        totales = None
+    kpis = kpis_incidentes(df_incidentes, totales['horas_hombre'] if totales else None)
+    
     col_kpi1, col_kpi2, col_kpi3, col_kpi4 = st.columns(4)
     
     with col_kpi1:
-        total_incidentes = len(df_incidentes)
-        st.metric("🚨 Total Incidentes", total_incidentes)
+        st.metric("🚨 Total Incidentes", kpis['total'])
     
     with col_kpi2:
-        incidentes_cerrados = len(df_incidentes[df_incidentes['estado'] == 'cerrado'])
-        tasa_cierre = incidentes_cerrados / total_incidentes * 100
-        st.metric("✅ % Cierre", f"{tasa_cierre:.1f}%")
+        st.metric("✅ % Cierre", f"{kpis['tasa_cierre']:.1f}%")
     
     with col_kpi3:
-        # Calcular riesgo promedio desde consecuencias JSON
-        try:
-            riesgos = []
-            for _, inc in df_incidentes.iterrows():
-                if inc.get('consecuencias'):
-                    try:
-                        consecuencias = json.loads(inc['consecuencias']) if isinstance(inc['consecuencias'], str) else inc['consecuencias']
-                        riesgos.append(consecuencias.get('gravedad', 0))
-                    except:
-                        riesgos.append(0)
-                else:
-                    riesgos.append(0)
-            avg_riesgo = sum(riesgos) / len(riesgos) if riesgos else 0
-            st.metric("⚠️ Riesgo Promedio", f"{avg_riesgo:.1f}/9")
-        except:
-            st.metric("⚠️ Riesgo Promedio", "N/A")
+        # Riesgo promedio desde la gravedad en consecuencias
+        st.metric("⚠️ Riesgo Promedio", f"{kpis['riesgo_promedio']:.1f}/9")
     
     with col_kpi4:
-        # Calcular TF (Tasa de Frecuencia)
-        horas_hombre = 50000  # Simulado - debería venir de sistema de asistencia
-        acc_con_lesion = 0
-        try:
-            for _, inc in df_incidentes.iterrows():
-                if inc.get('consecuencias'):
-                    try:
-                        consecuencias = json.loads(inc['consecuencias']) if isinstance(inc['consecuencias'], str) else inc['consecuencias']
-                        if consecuencias.get('lesiones', 'No') != 'No':
-                            acc_con_lesion += 1
-                    except:
-                        pass
-        except:
-            pass
-            
-        tf = calcular_tasa_frecuencia(acc_con_lesion, horas_hombre)
-        st.metric("📊 Tasa Frecuencia", f"{tf:.2f}")
+        # TF con los accidentes con lesión
+        if kpis['tasa_frecuencia'] is not None:
+            st.metric("📊 Tasa Frecuencia", f"{kpis['tasa_frecuencia']:.2f}")
+        else:
+            st.metric("📊 Tasa Frecuencia", "N/A", delta="Sin horas hombre", delta_color="off")
     
     # Gráficos
     col_graph1, col_graph2 = st.columns(2)
     
     with col_graph1:
         # Serie temporal
-        df_incidentes['fecha'] = pd.to_datetime(df_incidentes['fecha_hora']).dt.date
-        incidentes_dia = df_incidentes.groupby('fecha').size()
+        incidentes_dia = df_incidentes.groupby('dia').size()
         
         fig = px.line(
             incidentes_dia,
             title="Incidentes por Día",
-            labels={'value': 'N° Incidentes', 'fecha': 'Fecha'}
+            labels={'value': 'N° Incidentes', 'dia': 'Fecha'}
         )
         st.plotly_chart(fig, use_container_width=True)
     
@@ -2,21 +2,38 @@ import streamlit as st
 import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
-import plotly.io as pio
 from datetime import datetime, timedelta
-from app.utils.supabase_client import get_supabase_client
+from app.utils.supabase_client import get_supabase_client, leer_paginado
 from app.auth import requerir_rol
 import io
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib import colors
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, Image
+from reportlab.platypus import Paragraph, Spacer, Image
 from reportlab.pdfbase.ttfonts import TTFont
 from reportlab.pdfbase import pdfmetrics
 import base64
 import json
 import requests
 from app.utils.storage_helper import subir_archivo_storage
+from app.utils.cola_reportes import obtener_cola_reportes
+from app.utils.graficos import renderizar_figuras
+from app.utils.pdf_tablas import tabla_paginada
+from app.utils.pdf_plantillas import (
+    obtener_estilos, crear_documento, construir_documento, tabla, ESTILO_MATRIZ,
+    seccion_kpis, seccion_indicadores_legales, seccion_requisitos
+)
+from app.utils.cache_artefactos import (
+    clave_artefacto, buscar_artefacto, listar_artefactos, eliminar_artefacto, TAMANO_MAXIMO_ARTEFACTOS
+)
+from app.utils.versiones import leer_versiones_tablas
+from app.utils.indicadores_sst import leer_indicadores
+from app.utils.resumenes import cargar_resumen_incidentes
+from app.utils.esquemas import aplicar_esquema, solo_lectura
+from app.utils.particiones import particionar_por_area
+from app.analytics import kpis_por_version, indicadores_legales, totales_periodo, tendencia_mensual
+from app.analytics import cubo_por_version, opciones, matriz_riesgo, conteo_dimension, filtrar_riesgos
+from app.utils.filtros import normalizar_filtros
+from app.utils.cache_cargas import cache_por_filtros
+from app.utils.catalogos import cargar_areas
+from app.utils.excel_streaming import crear_libro_streaming, escribir_hoja, guardar_libro, bloques_dataframe
 
 def mostrar(usuario):
     """Módulo de Reportes Legales y Estadísticos (Ley 29783 Art. 24)"""
@@ -55,12 +72,10 @@ def mostrar(usuario):
         mostrar_analisis_estadistico(data, filtros)
     
     with tab5:
-        mostrar_exportar_enviar(data, filtros)
+        mostrar_exportar_enviar(data, filtros, usuario)
 
 def crear_filtros_reportes():
     """Crear filtros avanzados para personalizar reportes"""
-    supabase = get_supabase_client()
-    
     # Rango de fechas (últimos 3 meses por defecto)
     col1, col2 = st.columns(2)
     with col1:
@@ -77,8 +92,7 @@ def crear_filtros_reportes():
         )
     
     # Áreas
-    areas_data = supabase.table('riesgos').select('area').execute().data
-    areas = sorted(list(set([a['area'] for a in areas_data]))) if areas_data else []
+    areas = cargar_areas()
     areas_seleccionadas = st.multiselect("Áreas", areas, default=areas, key="rep_areas")
     
     # Tipos de incidente
@@ -104,112 +118,131 @@ def crear_filtros_reportes():
         'solo_fechas_limite': mostrar_solo_fechas_limite
     }
 
-@st.cache_data(ttl=600)  # Cache 10 minutos
+# Filtros que usa consultar_datos_reporte (los demás no cambian los datos)
+CAMPOS_CARGA = ['fecha_inicio', 'fecha_fin', 'areas', 'tipos_incidente', 'nivel_riesgo_min']
+
+@cache_por_filtros(CAMPOS_CARGA, ttl=600, max_entradas=20)  # Cache 10 minutos, compartido y de solo lectura
 def cargar_datos_reporte(filtros):
     """Cargar todos los datos necesarios para reportes"""
     try:
-        supabase = get_supabase_client()
-        
-        # Cargar incidentes con filtros
-        query_incidentes = supabase.table('incidentes').select('*, usuarios(nombre_completo)').gte(
-            'fecha_hora', filtros['fecha_inicio']
-        ).lte('fecha_hora', filtros['fecha_fin'])
-        
-        if filtros['areas']:
-            query_incidentes = query_incidentes.in_('area', filtros['areas'])
-        if filtros['tipos_incidente']:
-            query_incidentes = query_incidentes.in_('tipo', filtros['tipos_incidente'])
-        
-        incidentes = query_incidentes.execute().data
-        
-        # Cargar riesgos
-        query_riesgos = supabase.table('riesgos').select('*, usuarios(nombre_completo)').gte(
-            'nivel_riesgo', filtros['nivel_riesgo_min']
-        )
-        if filtros['areas']:
-            query_riesgos = query_riesgos.in_('area', filtros['areas'])
-        riesgos = query_riesgos.execute().data
-        
-        # Cargar EPP - especificar relación del trabajador para evitar ambigüedad
-        epp_raw = supabase.table('epp_asignaciones').select(
-            '*, '
-            'usuarios!epp_asignaciones_trabajador_id_fkey(nombre_completo), '
-            'epp_catalogo(*)'
-        ).execute().data
-        
-        # Procesar datos de EPP para aplanar estructura (compatibilidad con código existente)
-        epp = []
-        usuarios_col = 'usuarios!epp_asignaciones_trabajador_id_fkey'
-        for item in epp_raw:
-            # Crear copia completa del item (incluye todos los campos de epp_asignaciones)
-            item_processed = dict(item)  # Usar dict() para asegurar copia completa
-            # Extraer nombre_completo de la relación de usuarios
-            if usuarios_col in item_processed and isinstance(item_processed[usuarios_col], dict):
-                item_processed['nombre_completo'] = item_processed[usuarios_col].get('nombre_completo', '')
-            # Extraer nombre del catálogo de EPP
-            if 'epp_catalogo' in item_processed and isinstance(item_processed['epp_catalogo'], dict):
-                item_processed['epp_nombre'] = item_processed['epp_catalogo'].get('nombre', '')
-            # Los campos directos de epp_asignaciones (fecha_vencimiento, fecha_entrega, etc.) 
-            # ya están en item_processed por la copia
-            epp.append(item_processed)
-        
-        # Cargar capacitaciones
-        capacitaciones = supabase.table('capacitaciones').select('*, asistentes_capacitacion(*)').execute().data
-        
-        # Cargar inspecciones y hallazgos
-        inspecciones = supabase.table('inspecciones').select('*, checklists(*)').execute().data
-        hallazgos = supabase.table('hallazgos').select('*, usuarios(nombre_completo)').execute().data
-        
-        # Cargar documentos
-        documentos = supabase.table('documentos').select('*, usuarios(nombre_completo)').execute().data
-        
-        return {
-            'incidentes': pd.DataFrame(incidentes) if incidentes else pd.DataFrame(),
-            'riesgos': pd.DataFrame(riesgos) if riesgos else pd.DataFrame(),
-            'epp': pd.DataFrame(epp) if epp else pd.DataFrame(),
-            'capacitaciones': pd.DataFrame(capacitaciones) if capacitaciones else pd.DataFrame(),
-            'inspecciones': pd.DataFrame(inspecciones) if inspecciones else pd.DataFrame(),
-            'hallazgos': pd.DataFrame(hallazgos) if hallazgos else pd.DataFrame(),
-            'documentos': pd.DataFrame(documentos) if documentos else pd.DataFrame()
-        }
+        return solo_lectura(consultar_datos_reporte(filtros))
     except Exception as e:
         st.error(f"Error al cargar datos: {e}")
         return None
 
+def consultar_datos_reporte(filtros):
+    """
+    Consultar los datos de los reportes sin depender de Streamlit.
+
+    La usan la interfaz y el generador de reportes programados
+    (scripts/generar_reportes_programados.py); lanza la excepción si falla.
+    """
+    supabase = get_supabase_client()
+    
+    # Versión de las tablas antes de consultar: identifica estos datos (clave
+    # de la caché de reportes PDF y memo de los indicadores de app/analytics)
+    versiones = leer_versiones_tablas()
+    
+    # Cargar incidentes con filtros
+    query_incidentes = supabase.table('incidentes').select('*, usuarios(nombre_completo)').gte(
+        'fecha_hora', filtros['fecha_inicio']
+    ).lte('fecha_hora', filtros['fecha_fin'])
+    
+    if filtros['areas']:
+        query_incidentes = query_incidentes.in_('area', filtros['areas'])
+    if filtros['tipos_incidente']:
+        query_incidentes = query_incidentes.in_('tipo', filtros['tipos_incidente'])
+    
+    incidentes = query_incidentes.execute().data
+    incidentes = aplicar_esquema('incidentes', incidentes)
+    
+    # Resumen diario para las tendencias
+    resumen_incidentes = cargar_resumen_incidentes(filtros, incidentes)
+    
+    # Cargar riesgos
+    query_riesgos = supabase.table('riesgos').select('*, usuarios(nombre_completo)').gte(
+        'nivel_riesgo', filtros['nivel_riesgo_min']
+    )
+    if filtros['areas']:
+        query_riesgos = query_riesgos.in_('area', filtros['areas'])
+    riesgos = query_riesgos.execute().data
+    
+    # Cargar EPP - especificar relación del trabajador para evitar ambigüedad
+    # (trabajador y catálogo se aplanan a nombre_completo, area y epp_nombre en
+    # aplicar_esquema; el área del trabajador reparte el EPP en los reportes por área)
+    epp = supabase.table('epp_asignaciones').select(
+        '*, '
+        'usuarios!epp_asignaciones_trabajador_id_fkey(nombre_completo, area), '
+        'epp_catalogo(*)'
+    ).execute().data
+    
+    # Cargar capacitaciones
+    capacitaciones = supabase.table('capacitaciones').select('*, asistentes_capacitacion(*)').execute().data
+    
+    # Cargar inspecciones y hallazgos
+    inspecciones = supabase.table('inspecciones').select('*, checklists(*)').execute().data
+    hallazgos = supabase.table('hallazgos').select('*, usuarios(nombre_completo)').execute().data
+    
+    # Cargar documentos
+    documentos = supabase.table('documentos').select('*, usuarios(nombre_completo)').execute().data
+    
+    # Indicadores legales precalculados (TF, TS, II por área y mes)
+    indicadores = cargar_indicadores_legales(filtros)
+    
+    return {
+        'incidentes': incidentes,
+        'riesgos': aplicar_esquema('riesgos', riesgos),
+        'epp': aplicar_esquema('epp_asignaciones', epp),
+        'capacitaciones': aplicar_esquema('capacitaciones', capacitaciones),
+        'inspecciones': aplicar_esquema('inspecciones', inspecciones),
+        'hallazgos': aplicar_esquema('hallazgos', hallazgos),
+        'documentos': aplicar_esquema('documentos', documentos),
+        'indicadores': indicadores,
+        'resumen_incidentes': resumen_incidentes,
+        'versiones': versiones,
+        'origen': 'reportes'
+    }
+
+def cargar_indicadores_legales(filtros):
+    """Indicadores de indicadores_sst del período (vacío si la tabla aún no existe)"""
+    try:
+        return leer_indicadores(filtros['fecha_inicio'], filtros['fecha_fin'])
+    except Exception:
+        return pd.DataFrame()
+
+def conteo_hallazgos(hallazgos):
+    """Hallazgos por categoría y estado (solo combinaciones con filas)"""
+    conteo = hallazgos.groupby(['categoria', 'estado'], observed=True).size().reset_index(name='cantidad')
+    return conteo.astype({'categoria': str, 'estado': str})
+
+def tabla_tendencia(data):
+    """Incidentes por mes (columnas mes, cantidad) desde el resumen diario"""
+    return tendencia_mensual(data.get('resumen_incidentes')).reset_index(name='cantidad')
+
 def mostrar_resumen_ejecutivo(data, filtros):
     """Generar resumen ejecutivo con KPIs"""
     st.header("📈 Resumen Ejecutivo de SST")
     
     # Métricas clave
+    kpis = kpis_por_version(data, filtros)
     col1, col2, col3, col4 = st.columns(4)
     
     with col1:
-        total_incidentes = len(data['incidentes'])
-        st.metric("🚨 Total Incidentes", total_incidentes, delta=f"vs periodo anterior")
+        st.metric("🚨 Total Incidentes", kpis['incidentes_total'], delta=f"vs periodo anterior")
     
     with col2:
-        riesgos_criticos = len(data['riesgos'][data['riesgos']['nivel_riesgo'] >= 15])
-        st.metric("⚠️ Riesgos Críticos", riesgos_criticos, delta_color="inverse")
+        st.metric("⚠️ Riesgos Críticos", kpis['riesgos_criticos'] or 0, delta_color="inverse")
     
     with col3:
-        if not data['epp'].empty and 'fecha_vencimiento' in data['epp'].columns:
-            epp_vencido = len(data['epp'][pd.to_datetime(data['epp']['fecha_vencimiento']) < datetime.now()])
-        else:
-            epp_vencido = 0
-        st.metric("🛡️ EPP Vencidos", epp_vencido, delta_color="inverse")
+        st.metric("🛡️ EPP Vencidos", kpis['epp_vencidos'] or 0, delta_color="inverse")
     
     with col4:
-        capac_realizada = len(data['capacitaciones'][data['capacitaciones']['estado'] == 'realizada'])
-        capac_total = len(data['capacitaciones'])
-        cumplimiento = (capac_realizada / capac_total * 100) if capac_total > 0 else 0
-        st.metric("🎯 % Cumplimiento", f"{cumplimiento:.1f}%")
+        st.metric("🎯 % Cumplimiento", f"{kpis['cumplimiento_capacitaciones'] or 0:.1f}%")
     
     # Gráfico de tendencia de incidentes
     st.subheader("Tendencia de Incidentes")
-    if not data['incidentes'].empty:
-        # Convertir a período mensual y luego a string para evitar problemas de serialización
-        data['incidentes']['mes'] = pd.to_datetime(data['incidentes']['fecha_hora']).dt.to_period('M').astype(str)
-        tendencia = data['incidentes'].groupby('mes').size().reset_index(name='cantidad')
+    tendencia = tabla_tendencia(data)
+    if not tendencia.empty:
         fig = px.line(tendencia, x='mes', y='cantidad', title="Incidentes por Mes", 
                      labels={'mes': 'Mes', 'cantidad': 'N° Incidentes'})
         fig.update_traces(mode='lines+markers')
@@ -223,40 +256,48 @@ def mostrar_reporte_legal_sunafil(data, filtros):
     # Cálculos de indicadores legales
     st.markdown("### 📊 Indicadores de Seguridad Obligatorios")
     
-    # Simular horas hombre (debería venir de sistema de asistencia)
-    col1, col2 = st.columns(2)
-    with col1:
-        horas_hombre = st.number_input("Horas Hombre Trabajadas (periodo)", 
-                                      min_value=1, value=50000)
-    with col2:
-        num_trabajadores = st.number_input("N° Promedio de Trabajadores", 
-                                          min_value=1, value=200)
-    
-    accidentes = len(data['incidentes'][data['incidentes']['tipo'] == 'accidente'])
-    incidentes = len(data['incidentes'][data['incidentes']['tipo'] == 'incidente'])
-    enfermedades = len(data['incidentes'][data['incidentes']['tipo'] == 'enfermedad_laboral'])
-    
-    # Cálculo de tasas (Art. 37)
-    tasa_frecuencia = (accidentes * 1_000_000) / horas_hombre if horas_hombre > 0 else 0
-    dias_perdidos = accidentes * 15  # Simulación
-    tasa_severidad = (dias_perdidos * 1_000_000) / horas_hombre if horas_hombre > 0 else 0
-    indice_incidencia = (accidentes / num_trabajadores) * 100 if num_trabajadores > 0 else 0
-    
-    # Tabla de indicadores
-    st.markdown("#### 📈 Tabla de Indicadores Legales")
-    indicadores = pd.DataFrame({
-        'Indicador': ['Tasa de Frecuencia', 'Tasa de Severidad', 'Índice de Incidencia', 
-                     'N° Accidentes', 'N° Incidentes', 'N° Enfermedades Laborales'],
-        'Valor': [f"{tasa_frecuencia:.2f}", f"{tasa_severidad:.2f}", f"{indice_incidencia:.2f}",
-                  accidentes, incidentes, enfermedades],
-        'Unidad': ['accidents/1Mh-h', 'días/1Mh-h', '%', 'eventos', 'eventos', 'eventos'],
-        'Meta Legal': ['< 5.0', '< 100', '< 1.0', '0', 'No especificado', 'No especificado'],
-        'Cumple': ['✅' if tasa_frecuencia < 5 else '❌', 
-                   '✅' if tasa_severidad < 100 else '❌',
-                   '✅' if indice_incidencia < 1 else '❌',
-                   '✅' if accidentes == 0 else '❌', '-', '-']
-    })
-    st.dataframe(indicadores, use_container_width=True)
+    # Horas hombre y días perdidos registrados (tabla horas_hombre → indicadores_sst)
+    totales = totales_periodo(data.get('indicadores'), filtros['areas'])
+    indicadores_ley = indicadores_legales(kpis_por_version(data, filtros), totales)
+    if indicadores_ley is None:
+        st.warning("⚠️ No hay horas hombre registradas para el período. Cárguelas desde el Dashboard (Reportes Legales) para calcular TF, TS e Índice de Incidencia.")
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.metric("Horas Hombre Trabajadas (periodo)", f"{totales['horas_hombre']:,.0f}")
+        with col2:
+            st.metric("N° Promedio de Trabajadores", f"{totales['trabajadores']:,.0f}")
+        
+        # Cálculo de tasas (Art. 37)
+        accidentes = indicadores_ley['accidentes']
+        incidentes = indicadores_ley['incidentes']
+        enfermedades = indicadores_ley['enfermedades']
+        tasa_frecuencia = indicadores_ley['tasa_frecuencia']
+        tasa_severidad = indicadores_ley['tasa_severidad']
+        indice_incidencia = indicadores_ley['indice_incidencia']
+        
+        # Tabla de indicadores
+        st.markdown("#### 📈 Tabla de Indicadores Legales")
+        indicadores = pd.DataFrame({
+            'Indicador': ['Tasa de Frecuencia', 'Tasa de Severidad', 'Índice de Incidencia', 
+                         'N° Accidentes', 'N° Incidentes', 'N° Enfermedades Laborales'],
+            'Valor': [f"{tasa_frecuencia:.2f}", f"{tasa_severidad:.2f}", f"{indice_incidencia:.2f}",
+                      accidentes, incidentes, enfermedades],
+            'Unidad': ['accidents/1Mh-h', 'días/1Mh-h', '%', 'eventos', 'eventos', 'eventos'],
+            'Meta Legal': ['< 5.0', '< 100', '< 1.0', '0', 'No especificado', 'No especificado'],
+            'Cumple': ['✅' if tasa_frecuencia < 5 else '❌', 
+                       '✅' if tasa_severidad < 100 else '❌',
+                       '✅' if indice_incidencia < 1 else '❌',
+                       '✅' if accidentes == 0 else '❌', '-', '-']
+        })
+        st.dataframe(indicadores, use_container_width=True)
+        
+        movil = totales_periodo(data['indicadores'], filtros['areas'], ventana='12m')
+        if movil:
+            st.caption(
+                f"Últimos 12 meses: TF {movil['tasa_frecuencia']:.2f} · "
+                f"TS {movil['tasa_severidad']:.2f} · II {movil['indice_incidencia']:.2f}"
+            )
     
     # Requisitos legales cumplidos
     st.markdown("#### ✅ Cumplimiento Normativo")
@@ -279,6 +320,9 @@ def mostrar_matriz_riesgos_interactiva(data, filtros):
         st.info("No hay datos de riesgos")
         return
     
+    # Conteos de todas las combinaciones; los filtros solo recortan el cubo
+    cubo = cubo_por_version(data, filtros)
+    
     # Filtros adicionales
     col1, col2, col3 = st.columns(3)
     with col1:
@@ -287,33 +331,18 @@ def mostrar_matriz_riesgos_interactiva(data, filtros):
                                       default=['pendiente', 'en_mitigacion'])
     with col2:
         area_seleccionada = st.multiselect("Área Específica", 
-                                          options=sorted(data['riesgos']['area'].unique()),
-                                          default=sorted(data['riesgos']['area'].unique()))
+                                          options=opciones(cubo, 'area'),
+                                          default=opciones(cubo, 'area'))
     with col3:
         tipo_peligro = st.multiselect("Tipo de Peligro",
-                                     options=sorted(data['riesgos']['tipo_peligro'].unique()),
-                                     default=sorted(data['riesgos']['tipo_peligro'].unique()))
-    
-    # Filtrar datos
-    riesgos_filtrados = data['riesgos'][
-        (data['riesgos']['estado'].isin(estado_riesgo)) &
-        (data['riesgos']['area'].isin(area_seleccionada)) &
-        (data['riesgos']['tipo_peligro'].isin(tipo_peligro))
-    ]
+                                     options=opciones(cubo, 'tipo_peligro'),
+                                     default=opciones(cubo, 'tipo_peligro'))
     
     # Matriz de riesgo (probabilidad vs severidad)
     st.subheader("📊 Mapa de Calor de Riesgo")
     
-    # Crear matriz 5x5 asegurando que tenga todas las combinaciones
-    matriz = riesgos_filtrados.groupby(['probabilidad', 'severidad']).size().unstack(fill_value=0)
-    
-    # Asegurar que la matriz tenga exactamente 5x5 (probabilidad 1-5, severidad 1-5)
-    # Reindexar para incluir todos los valores posibles
-    probabilidades = [1, 2, 3, 4, 5]
-    severidades = [1, 2, 3, 4, 5]
-    
-    # Reindexar filas (probabilidad) y columnas (severidad) para asegurar 5x5
-    matriz = matriz.reindex(index=probabilidades, columns=severidades, fill_value=0)
+    # Matriz 5x5 (probabilidad 1-5, severidad 1-5) de la selección
+    matriz = matriz_riesgo(cubo, area_seleccionada, tipo_peligro, estado_riesgo)
     
     # Etiquetas para los ejes
     labels_x = ['Baja (1)', 'Media (2)', 'Moderada (3)', 'Alta (4)', 'Muy Alta (5)']
@@ -334,6 +363,7 @@ def mostrar_matriz_riesgos_interactiva(data, filtros):
     
     # Tabla de riesgos críticos
     st.subheader("🎯 Riesgos Críticos (Nivel ≥ 15)")
+    riesgos_filtrados = filtrar_riesgos(cubo, data['riesgos'], area_seleccionada, tipo_peligro, estado_riesgo)
     criticos = riesgos_filtrados[riesgos_filtrados['nivel_riesgo'] >= 15]
     if not criticos.empty:
         st.dataframe(criticos[['codigo', 'area', 'puesto_trabajo', 'peligro', 'nivel_riesgo', 'estado']], 
@@ -367,12 +397,21 @@ def mostrar_analisis_estadistico(data, filtros):
     st.subheader("📋 Análisis de Hallazgos de Inspección")
     if not data['hallazgos'].empty:
         # Hallazgos por estado
-        fig = px.sunburst(data['hallazgos'], path=['categoria', 'estado'], 
+        fig = px.sunburst(conteo_hallazgos(data['hallazgos']), path=['categoria', 'estado'], values='cantidad',
                          title="Hallazgos por Categoría y Estado",
                          height=500)
         st.plotly_chart(fig, use_container_width=True)
 
-def mostrar_exportar_enviar(data, filtros):
+MIMES_REPORTES = {
+    "Excel": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "PDF": "application/pdf",
+    "ZIP": "application/zip"
+}
+
+# Cada cuánto se vuelve a dibujar el panel de la cola mientras hay pendientes
+SEGUNDOS_SONDEO = 3
+
+def mostrar_exportar_enviar(data, filtros, usuario):
     """Opciones de exportación y envío automático"""
     st.header("📤 Exportar y Enviar Reportes")
     
@@ -384,35 +423,63 @@ def mostrar_exportar_enviar(data, filtros):
         tipo_reporte = st.selectbox("Tipo de Reporte", 
                                    ["Completo", "Legal SUNAFIL", "Riesgos", "Incidentes"],
                                    key="tipo_reporte")
+        guardar_storage = st.checkbox("Guardar también en el repositorio (sst-documentos)", value=False)
+        por_area = st.checkbox("Un reporte por área (ZIP)", value=False,
+                               help="Usa los datos ya cargados: se dividen por área y se generan en paralelo")
         
         if st.button(f"📥 Generar {formato_export}", type="primary"):
-            try:
-                with st.spinner(f"Generando reporte {formato_export}..."):
-                    if formato_export == "Excel":
-                        archivo = generar_reporte_excel(data, tipo_reporte, filtros)
-                        st.success("✅ Reporte Excel generado correctamente")
-                        st.download_button(
-                            label="⬇️ Descargar Excel",
-                            data=archivo['data'],
-                            file_name=archivo['filename'],
-                            mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                            key="download_excel"
+            if por_area:
+                # Una sola carga de datos: se divide por área y cada parte se
+                # genera en paralelo en la cola; se entregan juntas en un ZIP
+                try:
+                    partes = particionar_por_area(data, filtros['areas'] or None)
+                    if not partes:
+                        st.warning("No hay áreas con datos para los filtros seleccionados")
+                    else:
+                        obtener_cola_reportes().encolar_lote(
+                            formato_export,
+                            {area: (data_area, {**filtros, 'areas': [area]}) for area, data_area in partes.items()},
+                            tipo_reporte,
+                            usuario_id=usuario['id'],
+                            destino='storage' if guardar_storage else 'local'
                         )
-                    else:  # PDF
-                        archivo = generar_reporte_pdf(data, tipo_reporte, filtros)
-                        st.success("✅ Reporte PDF generado correctamente")
-                        st.download_button(
-                            label="⬇️ Descargar PDF",
-                            data=archivo['data'],
-                            file_name=archivo['filename'],
-                            mime="application/pdf",
-                            key="download_pdf"
+                        st.success(f"✅ {len(partes)} reportes en cola (uno por área). El ZIP aparecerá abajo cuando estén listos.")
+                except Exception as e:
+                    st.error(f"❌ Error encolando reportes por área: {str(e)}")
+            else:
+                # Mismo tipo + filtros + versión de los datos: se sirve el archivo ya generado.
+                # El PDF se arma con `data` (cacheado por el cargador), así que la clave
+                # usa la versión que el cargador leyó antes de consultar; el Excel lee
+                # Supabase en el worker, después de esta lectura de versiones.
+                versiones = data['versiones'] if formato_export == "PDF" else leer_versiones_tablas()
+                clave_cache = clave_artefacto(formato_export, tipo_reporte, filtros, versiones)
+                artefacto = buscar_artefacto(clave_cache)
+                if artefacto:
+                    st.success(f"⚡ Sin cambios en los datos desde el {artefacto['creado'].replace('T', ' ')}: se entrega el reporte ya generado.")
+                    st.download_button(
+                        label="⬇️ Descargar",
+                        data=artefacto['data'],
+                        file_name=artefacto['filename'],
+                        mime=MIMES_REPORTES[formato_export],
+                        key=f"descargar_cache_{clave_cache}"
+                    )
+                else:
+                    # La generación corre en segundo plano: la sesión sigue libre
+                    # y el reporte no se pierde si el usuario cambia de módulo
+                    try:
+                        # El Excel se escribe leyendo Supabase por páginas dentro del
+                        # worker; no hace falta enviarle los datos ya cargados
+                        obtener_cola_reportes().encolar(
+                            formato_export, data if formato_export == "PDF" else None, tipo_reporte, filtros,
+                            usuario_id=usuario['id'],
+                            destino='storage' if guardar_storage else 'local',
+                            clave_cache=clave_cache
                         )
-            except Exception as e:
-                st.error(f"❌ Error generando reporte: {str(e)}")
-                import traceback
-                with st.expander("Detalles del error"):
-                    st.code(traceback.format_exc())
+                        st.success("✅ Reporte en cola. Puedes seguir trabajando; aparecerá abajo cuando esté listo.")
+                    except Exception as e:
+                        st.error(f"❌ Error encolando reporte: {str(e)}")
+        
+        mostrar_trabajos_reportes(usuario)
     
     with col2:
         st.markdown("### 📧 Enviar Automáticamente")
@@ -422,297 +489,451 @@ def mostrar_exportar_enviar(data, filtros):
         frecuencia_envio = st.selectbox("Frecuencia", ["Diario", "Semanal", "Mensual"])
         
         if st.button("📨 Configurar Envio Automático", type="secondary"):
-            configurar_webhook_n8n(data, filtros, email_destino, frecuencia_envio)
-            st.success("✅ Webhook configurado. El reporte se enviará automáticamente.")
+            if configurar_webhook_n8n(data, filtros, email_destino, frecuencia_envio, formato_export, tipo_reporte):
+                st.success("✅ Webhook configurado. El reporte se enviará automáticamente.")
+    
+    if usuario['rol'] == 'admin':
+        mostrar_cache_reportes()
 
-def generar_reporte_excel(data, tipo, filtros):
-    """Generar reporte Excel completo con múltiples hojas"""
-    output = io.BytesIO()
+def mostrar_trabajos_reportes(usuario):
+    """
+    Estado de los reportes del usuario, con descarga al terminar.
     
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        # Hoja 1: Resumen Ejecutivo
-        resumen = pd.DataFrame({
-            'Métrica': ['Total Incidentes', 'Riesgos Pendientes', 'EPP por Vencer', 
-                       'Hallazgos Abiertos', 'Capacitaciones Completadas'],
-            'Valor': [
-                len(data['incidentes']),
-                len(data['riesgos'][data['riesgos']['estado'] == 'pendiente']),
-                len(data['epp'][pd.to_datetime(data['epp']['fecha_vencimiento']) <= datetime.now() + timedelta(days=30)]) if not data['epp'].empty and 'fecha_vencimiento' in data['epp'].columns else 0,
-                len(data['hallazgos'][data['hallazgos']['estado'] == 'abierto']),
-                len(data['capacitaciones'][data['capacitaciones']['estado'] == 'realizada'])
-            ]
-        })
-        resumen.to_excel(writer, sheet_name='Resumen_Ejecutivo', index=False)
-        
-        # Hoja 2: Incidentes (obligatorio Art. 34)
-        if not data['incidentes'].empty:
-            incidentes_export = data['incidentes'][['codigo', 'tipo', 'fecha_hora', 'area', 'descripcion', 
-                                                   'consecuencias', 'estado', 'fecha_cierre']].copy()
-            incidentes_export.to_excel(writer, sheet_name='Incidentes', index=False)
-        
-        # Hoja 3: Riesgos (Art. 26-28)
-        if not data['riesgos'].empty:
-            riesgos_export = data['riesgos'][['codigo', 'area', 'puesto_trabajo', 'peligro', 
-                                            'tipo_peligro', 'probabilidad', 'severidad', 
-                                            'nivel_riesgo', 'estado']].copy()
-            riesgos_export.to_excel(writer, sheet_name='Riesgos', index=False)
-        
-        # Hoja 4: Hallazgos
-        if not data['hallazgos'].empty:
-            hallazgos_export = data['hallazgos'][['descripcion', 'categoria', 'estado', 'fecha_limite', 
-                                                'fecha_cierre']].copy()
-            hallazgos_export.to_excel(writer, sheet_name='Hallazgos', index=False)
+    Con fragmentos de Streamlit (1.33+) solo este panel se vuelve a dibujar
+    cada SEGUNDOS_SONDEO mientras haya reportes pendientes; en versiones
+    anteriores se actualiza con el botón, sin bloquear ni recargar la página.
+    """
+    trabajos = obtener_cola_reportes().trabajos(usuario['id'])
+    if not trabajos:
+        return
+    
+    fragmento = getattr(st, 'fragment', None) or getattr(st, 'experimental_fragment', None)
+    if fragmento is None:
+        panel_trabajos_reportes(usuario)
+        st.button("🔄 Actualizar estado", key="actualizar_trabajos_reportes")
+        return
+    
+    pendientes = any(t['estado'] in ('en_cola', 'procesando') for t in trabajos)
+    fragmento(run_every=SEGUNDOS_SONDEO if pendientes else None)(panel_trabajos_reportes)(usuario)
+
+def panel_trabajos_reportes(usuario):
+    """Lista de trabajos de la cola (la parte que se vuelve a dibujar)"""
+    cola = obtener_cola_reportes()
+    trabajos = cola.trabajos(usuario['id'])
+    
+    st.markdown("#### 🗂️ Mis Reportes")
+    
+    etiquetas = {
+        'en_cola': "⏳ En cola",
+        'procesando': "⚙️ Generando",
+        'completado': "✅ Listo",
+        'error': "❌ Error"
+    }
+    for trabajo in trabajos[:10]:
+        col_info, col_accion = st.columns([3, 1])
+        with col_info:
+            st.write(f"**{trabajo['formato']} - {trabajo['tipo']}** · {trabajo['creado'].strftime('%H:%M:%S')} · {etiquetas[trabajo['estado']]}")
+            # Un reporte simple no informa avance (basta la etiqueta de estado);
+            # un lote cuenta las áreas ya generadas
+            if trabajo['estado'] == 'procesando' and trabajo['progreso'] is not None:
+                st.progress(
+                    trabajo['progreso'] / 100,
+                    text=f"{trabajo['partes_listas']} de {trabajo['partes_total']} áreas listas"
+                )
+            if trabajo['estado'] == 'error':
+                st.caption(trabajo['error'])
+        with col_accion:
+            if trabajo['estado'] == 'completado':
+                st.download_button(
+                    label="⬇️ Descargar",
+                    data=cola.leer_artefacto(trabajo['id']),
+                    file_name=trabajo['filename'],
+                    mime=MIMES_REPORTES['ZIP' if trabajo['filename'].endswith('.zip') else trabajo['formato']],
+                    key=f"descargar_{trabajo['id']}"
+                )
+                if trabajo.get('url'):
+                    st.link_button("🔗 Storage", trabajo['url'])
+
+def mostrar_cache_reportes():
+    """Vista de administración de los reportes guardados en caché"""
+    with st.expander("🗄️ Caché de reportes generados"):
+        artefactos = listar_artefactos()
+        if not artefactos:
+            st.info("No hay reportes en caché")
+            return
         
-        # Hoja 5: EPP
-        if not data['epp'].empty:
-            # Verificar que las columnas existan antes de exportar
-            epp_cols = ['nombre_completo', 'epp_nombre', 'fecha_entrega', 'fecha_vencimiento']
-            epp_cols_disponibles = [col for col in epp_cols if col in data['epp'].columns]
-            epp_export = data['epp'][epp_cols_disponibles].copy() if epp_cols_disponibles else pd.DataFrame()
-            epp_export.to_excel(writer, sheet_name='EPP', index=False)
+        tabla = pd.DataFrame([{
+            'Formato': a['formato'],
+            'Tipo': a['tipo'],
+            'Desde': a['filtros'].get('fecha_inicio'),
+            'Hasta': a['filtros'].get('fecha_fin'),
+            'Áreas': ', '.join(a['filtros'].get('areas') or ['Todas']),
+            'Tamaño (KB)': round(a['tamano'] / 1024, 1),
+            'Generado': a['creado'],
+            'Último uso': a['ultimo_uso'],
+            'Storage': '✅' if a.get('en_storage') else ''
+        } for a in artefactos])
+        st.dataframe(tabla, use_container_width=True, hide_index=True)
+        st.caption(f"Total: {sum(a['tamano'] for a in artefactos) / 1024 / 1024:.1f} MB · "
+                   f"límite {TAMANO_MAXIMO_ARTEFACTOS / 1024 / 1024:.0f} MB (se eliminan los menos usados)")
         
-        # Hoja 6: Capacitaciones (Art. 31)
-        if not data['capacitaciones'].empty:
-            capac_export = data['capacitaciones'][['codigo', 'tema', 'area_destino', 'fecha_programada',
-                                                  'estado', 'duracion_horas']].copy()
-            capac_export.to_excel(writer, sheet_name='Capacitaciones', index=False)
-    
-    output.seek(0)
+        col1, col2 = st.columns(2)
+        with col1:
+            indice = st.selectbox(
+                "Artefacto",
+                range(len(artefactos)),
+                format_func=lambda i: f"{artefactos[i]['formato']} - {artefactos[i]['tipo']} · {artefactos[i]['creado']}",
+                key="cache_reporte_sel"
+            )
+            if st.button("🗑️ Eliminar seleccionado"):
+                eliminar_artefacto(artefactos[indice]['clave'])
+                st.rerun()
+        with col2:
+            if st.button("🧹 Vaciar caché"):
+                for artefacto in artefactos:
+                    eliminar_artefacto(artefacto['clave'])
+                st.rerun()
+
+# Columnas de cada hoja del Excel (mismo layout para datos en memoria o leídos por páginas)
+HOJAS_EXCEL = {
+    'Incidentes': ['codigo', 'tipo', 'fecha_hora', 'area', 'descripcion',
+                   'consecuencias', 'estado', 'fecha_cierre'],
+    'Riesgos': ['codigo', 'area', 'puesto_trabajo', 'peligro', 'tipo_peligro',
+                'probabilidad', 'severidad', 'nivel_riesgo', 'estado'],
+    'Hallazgos': ['descripcion', 'categoria', 'estado', 'fecha_limite', 'fecha_cierre'],
+    'EPP': ['nombre_completo', 'epp_nombre', 'fecha_entrega', 'fecha_vencimiento'],
+    'Capacitaciones': ['codigo', 'tema', 'area_destino', 'fecha_programada',
+                       'estado', 'duracion_horas']
+}
+CLAVES_HOJAS_EXCEL = {
+    'Incidentes': 'incidentes', 'Riesgos': 'riesgos', 'Hallazgos': 'hallazgos',
+    'EPP': 'epp', 'Capacitaciones': 'capacitaciones'
+}
+
+def _aplanar_epp(filas):
+    """Extrae trabajador y nombre del EPP de las relaciones anidadas"""
+    usuarios_col = 'usuarios!epp_asignaciones_trabajador_id_fkey'
+    for item in filas:
+        usuario = item.pop(usuarios_col, None) or item.pop('usuarios', None)
+        catalogo = item.pop('epp_catalogo', None)
+        item['nombre_completo'] = usuario.get('nombre_completo', '') if isinstance(usuario, dict) else ''
+        item['epp_nombre'] = catalogo.get('nombre', '') if isinstance(catalogo, dict) else ''
+    return filas
+
+def consultas_reporte_excel(filtros):
+    """Consultas (una función por hoja) con los mismos filtros que cargar_datos_reporte"""
+    supabase = get_supabase_client()
+
+    def incidentes():
+        query = supabase.table('incidentes').select('id, ' + ', '.join(HOJAS_EXCEL['Incidentes'])).gte(
+            'fecha_hora', filtros['fecha_inicio']
+        ).lte('fecha_hora', filtros['fecha_fin'])
+        if filtros['areas']:
+            query = query.in_('area', filtros['areas'])
+        if filtros['tipos_incidente']:
+            query = query.in_('tipo', filtros['tipos_incidente'])
+        return query.order('id')
+
+    def riesgos():
+        query = supabase.table('riesgos').select('id, ' + ', '.join(HOJAS_EXCEL['Riesgos'])).gte(
+            'nivel_riesgo', filtros['nivel_riesgo_min']
+        )
+        if filtros['areas']:
+            query = query.in_('area', filtros['areas'])
+        return query.order('id')
+
+    def hallazgos():
+        return supabase.table('hallazgos').select('id, ' + ', '.join(HOJAS_EXCEL['Hallazgos'])).order('id')
+
+    def epp():
+        return supabase.table('epp_asignaciones').select(
+            'id, fecha_entrega, fecha_vencimiento, '
+            'usuarios!epp_asignaciones_trabajador_id_fkey(nombre_completo), '
+            'epp_catalogo(nombre)'
+        ).order('id')
+
+    def capacitaciones():
+        return supabase.table('capacitaciones').select('id, ' + ', '.join(HOJAS_EXCEL['Capacitaciones'])).order('id')
+
     return {
-        'data': output.read(),
+        'Incidentes': incidentes, 'Riesgos': riesgos, 'Hallazgos': hallazgos,
+        'EPP': epp, 'Capacitaciones': capacitaciones
+    }
+
+def bloques_reporte_excel(filtros):
+    """Bloques de filas por hoja, leídos de Supabase página por página"""
+    consultas = consultas_reporte_excel(filtros)
+    bloques = {hoja: leer_paginado(consulta) for hoja, consulta in consultas.items()}
+    bloques['EPP'] = (_aplanar_epp(pagina) for pagina in bloques['EPP'])
+    return bloques
+
+def generar_reporte_excel(data, tipo, filtros):
+    """
+    Generar reporte Excel completo con múltiples hojas.
+
+    El libro se escribe en modo write-only, fila por fila, así la memoria no
+    crece con el tamaño del reporte. Si `data` es None las hojas se leen de
+    Supabase por páginas con los filtros; si no, se escriben por bloques
+    desde los DataFrames ya cargados.
+    """
+    if data is None:
+        bloques = bloques_reporte_excel(filtros)
+    else:
+        bloques = {
+            hoja: bloques_dataframe(data[clave])
+            for hoja, clave in CLAVES_HOJAS_EXCEL.items()
+        }
+
+    # Totales del resumen, acumulados mientras se escriben las hojas
+    totales = {'incidentes': 0, 'riesgos_pendientes': 0, 'epp_por_vencer': 0,
+               'hallazgos_abiertos': 0, 'capacitaciones_realizadas': 0}
+    limite_vencimiento = datetime.now() + timedelta(days=30)
+
+    def contar(clave, columna=None, valor=None):
+        def al_escribir(bloque):
+            if columna is None:
+                totales[clave] += len(bloque)
+            elif columna in bloque.columns:
+                totales[clave] += int((bloque[columna] == valor).sum())
+        return al_escribir
+
+    def contar_epp_por_vencer(bloque):
+        if 'fecha_vencimiento' in bloque.columns:
+            vencimientos = pd.to_datetime(bloque['fecha_vencimiento'], errors='coerce')
+            totales['epp_por_vencer'] += int((vencimientos <= limite_vencimiento).sum())
+
+    contadores = {
+        'Incidentes': contar('incidentes'),
+        'Riesgos': contar('riesgos_pendientes', 'estado', 'pendiente'),
+        'Hallazgos': contar('hallazgos_abiertos', 'estado', 'abierto'),
+        'EPP': contar_epp_por_vencer,
+        'Capacitaciones': contar('capacitaciones_realizadas', 'estado', 'realizada')
+    }
+
+    libro = crear_libro_streaming()
+    # Hoja 1: Resumen Ejecutivo (se llena al final, cuando ya se contaron las filas)
+    resumen = libro.create_sheet('Resumen_Ejecutivo')
+
+    # Hojas 2-6: Incidentes (Art. 34), Riesgos (Art. 26-28), Hallazgos, EPP, Capacitaciones (Art. 31)
+    for hoja, columnas in HOJAS_EXCEL.items():
+        escribir_hoja(libro, hoja, columnas, bloques[hoja], al_escribir=contadores[hoja])
+
+    resumen.append(['Métrica', 'Valor'])
+    resumen.append(['Total Incidentes', totales['incidentes']])
+    resumen.append(['Riesgos Pendientes', totales['riesgos_pendientes']])
+    resumen.append(['EPP por Vencer', totales['epp_por_vencer']])
+    resumen.append(['Hallazgos Abiertos', totales['hallazgos_abiertos']])
+    resumen.append(['Capacitaciones Completadas', totales['capacitaciones_realizadas']])
+
+    return {
+        'data': guardar_libro(libro),
         'filename': f"Reporte_SST_{tipo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
     }
 
-def plotly_fig_to_image(fig, width=800, height=500):
-    """Convertir gráfico Plotly a imagen para incluir en PDF"""
-    try:
-        # Configurar el gráfico para exportación
-        fig.update_layout(
-            width=width,
-            height=height,
-            margin=dict(l=50, r=50, t=50, b=50)
-        )
-        # Convertir a imagen PNG (requiere kaleido o orca instalado)
-        # Si no está disponible, intentar con formato SVG o retornar None
+def png_a_imagen_pdf(img_bytes, width, height):
+    """Crear objeto Image de ReportLab desde bytes PNG (None si no hay imagen)"""
+    if not img_bytes:
+        return None
+    img_buffer = io.BytesIO(img_bytes)
+    # Escalar para que quepa en el PDF (A4 tiene ~595 puntos de ancho)
+    scale_factor = min(500 / width, 1.0)  # Asegurar que no exceda 500 puntos
+    return Image(img_buffer, width=width*scale_factor, height=height*scale_factor)
+
+def construir_graficos_pdf(data, filtros):
+    """
+    Construir las figuras del reporte Completo antes de armar el documento.
+
+    Returns:
+        Dict {nombre: (fig, width, height)} solo con las figuras que tienen datos
+    """
+    figuras = {}
+    incidentes = data['incidentes']
+    riesgos = data['riesgos']
+    hallazgos = data['hallazgos']
+
+    tendencia = tabla_tendencia(data)
+    if not tendencia.empty:
         try:
-            img_bytes = pio.to_image(fig, format='png', width=width, height=height, engine='kaleido')
+            fig = px.line(tendencia, x='mes', y='cantidad',
+                          title="Incidentes por Mes",
+                          labels={'mes': 'Mes', 'cantidad': 'N° Incidentes'})
+            fig.update_traces(mode='lines+markers')
+            fig.update_xaxes(tickangle=45)
+            figuras['tendencia'] = (fig, 700, 400)
         except Exception:
-            # Si kaleido no está disponible, intentar sin especificar engine
-            try:
-                img_bytes = pio.to_image(fig, format='png', width=width, height=height)
-            except Exception:
-                # Si falla completamente, retornar None
-                return None
-        
-        # Crear objeto Image de ReportLab desde bytes
-        img_buffer = io.BytesIO(img_bytes)
-        # Escalar para que quepa en el PDF (A4 tiene ~595 puntos de ancho)
-        scale_factor = min(500 / width, 1.0)  # Asegurar que no exceda 500 puntos
-        return Image(img_buffer, width=width*scale_factor, height=height*scale_factor)
-    except Exception as e:
-        # Si falla la conversión, retornar None silenciosamente
-        return None
+            pass
+
+    if not riesgos.empty and 'probabilidad' in riesgos.columns and 'severidad' in riesgos.columns:
+        try:
+            fig = px.imshow(
+                matriz_riesgo(cubo_por_version(data, filtros)),
+                x=['Baja (1)', 'Media (2)', 'Moderada (3)', 'Alta (4)', 'Muy Alta (5)'],
+                y=['Casi Nula (1)', 'Remota (2)', 'Posible (3)', 'Probable (4)', 'Muy Probable (5)'],
+                title="Matriz de Riesgo: Probabilidad vs Severidad",
+                color_continuous_scale="Reds",
+                aspect="auto"
+            )
+            fig.update_xaxes(title="Severidad")
+            fig.update_yaxes(title="Probabilidad")
+            figuras['matriz'] = (fig, 700, 500)
+        except Exception:
+            pass
+
+    if not incidentes.empty and 'area' in incidentes.columns:
+        try:
+            incidentes_area = incidentes['area'].value_counts().reset_index()
+            incidentes_area.columns = ['Área', 'Cantidad']
+            fig = px.bar(incidentes_area, x='Cantidad', y='Área',
+                         orientation='h', title="Incidentes por Área")
+            figuras['area'] = (fig, 700, 400)
+        except Exception:
+            pass
+
+    if not riesgos.empty and 'tipo_peligro' in riesgos.columns:
+        try:
+            fig = px.pie(riesgos, names='tipo_peligro',
+                         title="Tipos de Peligros Identificados")
+            figuras['peligros'] = (fig, 600, 400)
+        except Exception:
+            pass
+
+    if not hallazgos.empty and 'categoria' in hallazgos.columns and 'estado' in hallazgos.columns:
+        try:
+            fig = px.sunburst(conteo_hallazgos(hallazgos), path=['categoria', 'estado'], values='cantidad',
+                              title="Hallazgos por Categoría y Estado",
+                              height=500)
+            figuras['hallazgos'] = (fig, 600, 500)
+        except Exception:
+            pass
+
+    return figuras
+
+def renderizar_graficos_pdf(data, tipo, filtros, pool=None):
+    """
+    PNG de las figuras del reporte (solo el Completo lleva gráficos).
+
+    La cola de reportes y el generador programado lo llaman antes de encolar
+    el PDF, con su pool de procesos: cada figura se renderiza en un worker y
+    el resultado se pasa a generar_reporte_pdf(..., graficos=...).
+
+    Returns:
+        Dict {nombre: (bytes PNG o None, width, height)}
+    """
+    if tipo != "Completo":
+        return {}
+    figuras = construir_graficos_pdf(data, filtros)
+    nombres = list(figuras)
+    for nombre in nombres:
+        fig, width, height = figuras[nombre]
+        fig.update_layout(width=width, height=height, margin=dict(l=50, r=50, t=50, b=50))
 
-def generar_reporte_pdf(data, tipo, filtros):
-    """Generar reporte PDF profesional con ReportLab - Incluye todos los reportes cuando es Completo"""
-    output = io.BytesIO()
-    doc = SimpleDocTemplate(output, pagesize=A4)
-    
-    # Elementos del PDF
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    # Estilos personalizados
-    # Usar estilos base disponibles o crear desde cero si no existen
-    try:
-        base_title = styles['Title']
-    except KeyError:
-        base_title = styles['Normal']
-    
-    try:
-        base_heading1 = styles['Heading1']
-    except KeyError:
-        base_heading1 = styles['Normal']
-    
     try:
-        base_heading2 = styles['Heading2']
-    except KeyError:
-        base_heading2 = styles['Normal']
-    
-    title_style = ParagraphStyle(
-        'CustomTitle',
-        parent=base_title,
-        fontSize=24,
-        alignment=1,  # Center
-        textColor=colors.HexColor('#1e3a8a'),
-        spaceAfter=30
-    )
+        pngs = renderizar_figuras([figuras[n] for n in nombres], pool=pool)
+    except Exception:
+        pngs = [None] * len(nombres)
+
+    return {
+        nombre: (png, figuras[nombre][1], figuras[nombre][2])
+        for nombre, png in zip(nombres, pngs)
+    }
+
+def generar_reporte_pdf(data, tipo, filtros, graficos=None):
+    """
+    Generar reporte PDF profesional con ReportLab - Incluye todos los reportes cuando es Completo
     
-    heading_style = ParagraphStyle(
-        'CustomHeading',
-        parent=base_heading1,
-        fontSize=16,
-        textColor=colors.HexColor('#1e3a8a'),
-        spaceAfter=12,
-        spaceBefore=20
-    )
+    `graficos` son los PNG ya renderizados (renderizar_graficos_pdf); si no
+    se entregan, las figuras se renderizan aquí, una tras otra.
+    """
+    output = io.BytesIO()
+    doc = crear_documento(output)
     
-    subheading_style = ParagraphStyle(
-        'CustomSubHeading',
-        parent=base_heading2,
-        fontSize=14,
-        textColor=colors.HexColor('#2563eb'),
-        spaceAfter=8,
-        spaceBefore=12
-    )
+    # Elementos del PDF (estilos y plantillas ya compilados en pdf_plantillas)
+    elements = []
+    estilos = obtener_estilos()
+    title_style = estilos['titulo']
+    heading_style = estilos['encabezado']
+    subheading_style = estilos['subencabezado']
+    normal_style = estilos['normal']
+    kpis = kpis_por_version(data, filtros)
     
     # Portada
     elements.append(Paragraph("REPORTE DE SEGURIDAD Y SALUD EN EL TRABAJO", title_style))
-    elements.append(Paragraph(f"Generado el: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", styles['Normal']))
-    elements.append(Paragraph(f"Ley 29783 - Período: {filtros['fecha_inicio']} al {filtros['fecha_fin']}", styles['Normal']))
+    elements.append(Paragraph(f"Generado el: {datetime.now().strftime('%d/%m/%Y %H:%M:%S')}", normal_style))
+    elements.append(Paragraph(f"Ley 29783 - Período: {filtros['fecha_inicio']} al {filtros['fecha_fin']}", normal_style))
     elements.append(Spacer(1, 40))
     
     # Si es tipo "Completo", incluir todos los reportes
     if tipo == "Completo":
+        # Todas las figuras se renderizan antes de armar las secciones; si
+        # una falla, la sección queda solo con su tabla
+        if graficos is None:
+            graficos = renderizar_graficos_pdf(data, tipo, filtros)
+        imagenes = {
+            nombre: png_a_imagen_pdf(png, width, height)
+            for nombre, (png, width, height) in graficos.items()
+        }
+
         # ========== 1. RESUMEN EJECUTIVO ==========
         elements.append(Paragraph("1. RESUMEN EJECUTIVO DE SST", heading_style))
         
         # KPIs principales
-        total_incidentes = len(data['incidentes'])
-        riesgos_criticos = len(data['riesgos'][data['riesgos']['nivel_riesgo'] >= 15]) if not data['riesgos'].empty and 'nivel_riesgo' in data['riesgos'].columns else 0
-        epp_vencido = len(data['epp'][pd.to_datetime(data['epp']['fecha_vencimiento']) < datetime.now()]) if not data['epp'].empty and 'fecha_vencimiento' in data['epp'].columns else 0
-        capac_realizada = len(data['capacitaciones'][data['capacitaciones']['estado'] == 'realizada']) if not data['capacitaciones'].empty and 'estado' in data['capacitaciones'].columns else 0
-        capac_total = len(data['capacitaciones']) if not data['capacitaciones'].empty else 0
-        cumplimiento = (capac_realizada / capac_total * 100) if capac_total > 0 else 0
-        
-        kpi_data = [
-            ['Métrica', 'Valor', 'Interpretación'],
-            ['Total Incidentes', str(total_incidentes), 'Total de eventos registrados'],
-            ['Riesgos Críticos (≥15)', str(riesgos_criticos), 'Requieren atención inmediata'],
-            ['EPP Vencidos', str(epp_vencido), 'Necesitan renovación urgente'],
-            ['% Cumplimiento Capacitaciones', f"{cumplimiento:.1f}%", f"{capac_realizada}/{capac_total} completadas"]
-        ]
-        
-        kpi_table = Table(kpi_data, colWidths=[200, 100, 200])
-        kpi_table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#1e3a8a')),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 11),
-            ('BOTTOMPADDING', (0,0), (-1,0), 12),
-            ('BACKGROUND', (0,1), (-1,-1), colors.HexColor('#f8f9fa')),
-            ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
-            ('FONTSIZE', (0,1), (-1,-1), 9)
+        elements.append(seccion_kpis([
+            ('Total Incidentes', kpis['incidentes_total'], 'Total de eventos registrados'),
+            ('Riesgos Críticos (≥15)', kpis['riesgos_criticos'] or 0, 'Requieren atención inmediata'),
+            ('EPP Vencidos', kpis['epp_vencidos'] or 0, 'Necesitan renovación urgente'),
+            ('% Cumplimiento Capacitaciones', f"{kpis['cumplimiento_capacitaciones'] or 0:.1f}%",
+             f"{kpis['capacitaciones_realizadas'] or 0}/{kpis['capacitaciones_total']} completadas")
         ]))
-        elements.append(kpi_table)
         elements.append(Spacer(1, 20))
         
         # Tendencia de incidentes (gráfico y tabla)
-        if not data['incidentes'].empty and 'fecha_hora' in data['incidentes'].columns:
+        tendencia = tabla_tendencia(data)
+        if not tendencia.empty:
             try:
                 elements.append(Paragraph("Tendencia de Incidentes por Mes", subheading_style))
-                data_incidentes_copy = data['incidentes'].copy()
-                data_incidentes_copy['mes'] = pd.to_datetime(data_incidentes_copy['fecha_hora']).dt.to_period('M').astype(str)
-                tendencia = data_incidentes_copy.groupby('mes').size().reset_index(name='cantidad')
-                
-                # Crear gráfico de línea
-                fig_tendencia = px.line(tendencia, x='mes', y='cantidad', 
-                                       title="Incidentes por Mes",
-                                       labels={'mes': 'Mes', 'cantidad': 'N° Incidentes'})
-                fig_tendencia.update_traces(mode='lines+markers')
-                fig_tendencia.update_xaxes(tickangle=45)
                 
-                # Agregar gráfico al PDF
-                img_tendencia = plotly_fig_to_image(fig_tendencia, width=700, height=400)
+                img_tendencia = imagenes.get('tendencia')
                 if img_tendencia:
                     elements.append(img_tendencia)
                     elements.append(Spacer(1, 10))
                 
                 # Agregar tabla también
                 tendencia_data = [['Mes', 'Cantidad']] + tendencia.values.tolist()
-                tendencia_table = Table(tendencia_data, colWidths=[200, 100])
-                tendencia_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#6c757d')),
-                    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                    ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
-                    ('FONTSIZE', (0,0), (-1,-1), 9)
-                ]))
+                tendencia_table = tabla(tendencia_data, [200, 100])
                 elements.append(tendencia_table)
                 elements.append(Spacer(1, 20))
             except Exception as e:
-                elements.append(Paragraph(f"No se pudo generar la tendencia: {str(e)}", styles['Normal']))
+                elements.append(Paragraph(f"No se pudo generar la tendencia: {str(e)}", normal_style))
                 elements.append(Spacer(1, 20))
         
         # ========== 2. REPORTE LEGAL SUNAFIL ==========
         elements.append(Paragraph("2. REPORTE LEGAL SUNAFIL - LEY 29783", heading_style))
         
-        # Valores por defecto para indicadores legales
-        horas_hombre = 50000
-        num_trabajadores = 200
-        accidentes = len(data['incidentes'][data['incidentes']['tipo'] == 'accidente']) if not data['incidentes'].empty and 'tipo' in data['incidentes'].columns else 0
-        incidentes = len(data['incidentes'][data['incidentes']['tipo'] == 'incidente']) if not data['incidentes'].empty and 'tipo' in data['incidentes'].columns else 0
-        enfermedades = len(data['incidentes'][data['incidentes']['tipo'] == 'enfermedad_laboral']) if not data['incidentes'].empty and 'tipo' in data['incidentes'].columns else 0
-        
-        # Cálculo de tasas
-        tasa_frecuencia = (accidentes * 1_000_000) / horas_hombre if horas_hombre > 0 else 0
-        dias_perdidos = accidentes * 15  # Simulación
-        tasa_severidad = (dias_perdidos * 1_000_000) / horas_hombre if horas_hombre > 0 else 0
-        indice_incidencia = (accidentes / num_trabajadores) * 100 if num_trabajadores > 0 else 0
-        
+        # Indicadores precalculados con las horas hombre y días perdidos registrados
         elements.append(Paragraph("Indicadores de Seguridad Obligatorios", subheading_style))
-        indicadores_data = [
-            ['Indicador', 'Valor', 'Unidad', 'Meta Legal', 'Cumple'],
-            ['Tasa de Frecuencia', f"{tasa_frecuencia:.2f}", 'accidents/1Mh-h', '< 5.0', '✅' if tasa_frecuencia < 5 else '❌'],
-            ['Tasa de Severidad', f"{tasa_severidad:.2f}", 'días/1Mh-h', '< 100', '✅' if tasa_severidad < 100 else '❌'],
-            ['Índice de Incidencia', f"{indice_incidencia:.2f}", '%', '< 1.0', '✅' if indice_incidencia < 1 else '❌'],
-            ['N° Accidentes', str(accidentes), 'eventos', '0', '✅' if accidentes == 0 else '❌'],
-            ['N° Incidentes', str(incidentes), 'eventos', 'No especificado', '-'],
-            ['N° Enfermedades Laborales', str(enfermedades), 'eventos', 'No especificado', '-']
-        ]
-        
-        indicadores_table = Table(indicadores_data, colWidths=[150, 80, 100, 100, 70])
-        indicadores_table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#1e3a8a')),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 10),
-            ('BOTTOMPADDING', (0,0), (-1,0), 10),
-            ('BACKGROUND', (0,1), (-1,-1), colors.HexColor('#f8f9fa')),
-            ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
-            ('FONTSIZE', (0,1), (-1,-1), 8),
-            ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.HexColor('#f8f9fa')])
-        ]))
-        elements.append(indicadores_table)
+        totales = totales_periodo(data.get('indicadores'), filtros['areas'])
+        indicadores_ley = indicadores_legales(kpis, totales)
+        if indicadores_ley is None:
+            elements.append(Paragraph("No hay horas hombre registradas para el período: no se pueden calcular TF, TS ni Índice de Incidencia.", normal_style))
+        else:
+            elements.append(Paragraph(
+                f"Horas hombre trabajadas: {totales['horas_hombre']:,.0f} - N° promedio de trabajadores: {totales['trabajadores']:,.0f}",
+                normal_style
+            ))
+            elements.append(Spacer(1, 6))
+            elements.append(seccion_indicadores_legales(indicadores_ley))
+            movil = totales_periodo(data['indicadores'], filtros['areas'], ventana='12m')
+            if movil:
+                elements.append(Spacer(1, 6))
+                elements.append(Paragraph(
+                    f"Últimos 12 meses: TF {movil['tasa_frecuencia']:.2f} - TS {movil['tasa_severidad']:.2f} - II {movil['indice_incidencia']:.2f}",
+                    normal_style
+                ))
         elements.append(Spacer(1, 15))
         
         # Cumplimiento normativo
         elements.append(Paragraph("Cumplimiento Normativo", subheading_style))
-        requisitos_data = [
-            ['Artículo', 'Requisito', 'Estado'],
-            ['Art. 24', 'Registros documentados', '✅ Cumplido' if len(data['documentos']) > 0 else '⚠️ Pendiente'],
-            ['Art. 26-28', 'Evaluación de riesgos', '✅ Cumplido' if len(data['riesgos']) > 0 else '⚠️ Pendiente'],
-            ['Art. 29', 'Gestión EPP', '✅ Cumplido' if len(data['epp']) > 0 else '⚠️ Pendiente'],
-            ['Art. 31', 'Capacitaciones registradas', '✅ Cumplido' if len(data['capacitaciones']) > 0 else '⚠️ Pendiente'],
-            ['Art. 33-34', 'Sistema de incidentes', '✅ Cumplido' if len(data['incidentes']) > 0 else '⚠️ Pendiente']
-        ]
-        
-        requisitos_table = Table(requisitos_data, colWidths=[100, 200, 200])
-        requisitos_table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#2563eb')),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 10),
-            ('BOTTOMPADDING', (0,0), (-1,0), 10),
-            ('BACKGROUND', (0,1), (-1,-1), colors.HexColor('#f8f9fa')),
-            ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
-            ('FONTSIZE', (0,1), (-1,-1), 9)
-        ]))
-        elements.append(requisitos_table)
+        elements.append(seccion_requisitos(data))
         elements.append(Spacer(1, 20))
         
         # ========== 3. MATRIZ DE RIESGOS ==========
@@ -727,29 +948,10 @@ def generar_reporte_pdf(data, tipo, filtros):
                 # Seleccionar columnas disponibles
                 cols_disponibles = ['codigo', 'area', 'puesto_trabajo', 'peligro', 'nivel_riesgo', 'estado']
                 cols_finales = [col for col in cols_disponibles if col in criticos.columns]
-                criticos_pdf = criticos[cols_finales].head(20)  # Limitar a 20 para el PDF
-                
-                criticos_data = [criticos_pdf.columns.tolist()] + criticos_pdf.values.tolist()
-                # Convertir todos los valores a string
-                criticos_data = [[str(cell) for cell in row] for row in criticos_data]
-                
-                ancho_col = 500 / len(cols_finales)
-                criticos_table = Table(criticos_data, colWidths=[ancho_col] * len(cols_finales))
-                criticos_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#dc2626')),
-                    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                    ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-                    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0,0), (-1,0), 9),
-                    ('BOTTOMPADDING', (0,0), (-1,0), 8),
-                    ('BACKGROUND', (0,1), (-1,-1), colors.HexColor('#f8f9fa')),
-                    ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
-                    ('FONTSIZE', (0,1), (-1,-1), 8),
-                    ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.HexColor('#f8f9fa')])
-                ]))
-                elements.append(criticos_table)
+                # Listado completo, por segmentos con encabezado repetido
+                elements.extend(tabla_paginada(criticos, cols_finales, color_encabezado='#dc2626'))
             else:
-                elements.append(Paragraph("✅ No hay riesgos críticos registrados", styles['Normal']))
+                elements.append(Paragraph("✅ No hay riesgos críticos registrados", normal_style))
             
             elements.append(Spacer(1, 15))
             
@@ -757,51 +959,29 @@ def generar_reporte_pdf(data, tipo, filtros):
             if 'probabilidad' in data['riesgos'].columns and 'severidad' in data['riesgos'].columns:
                 try:
                     elements.append(Paragraph("Mapa de Calor de Riesgo", subheading_style))
-                    # Crear matriz 5x5
-                    matriz = data['riesgos'].groupby(['probabilidad', 'severidad']).size().unstack(fill_value=0)
-                    probabilidades = [1, 2, 3, 4, 5]
-                    severidades = [1, 2, 3, 4, 5]
-                    matriz = matriz.reindex(index=probabilidades, columns=severidades, fill_value=0)
-                    
-                    # Crear gráfico de heatmap
-                    labels_x = ['Baja (1)', 'Media (2)', 'Moderada (3)', 'Alta (4)', 'Muy Alta (5)']
-                    labels_y = ['Casi Nula (1)', 'Remota (2)', 'Posible (3)', 'Probable (4)', 'Muy Probable (5)']
-                    
-                    fig_matriz = px.imshow(
-                        matriz,
-                        x=labels_x,
-                        y=labels_y,
-                        title="Matriz de Riesgo: Probabilidad vs Severidad",
-                        color_continuous_scale="Reds",
-                        aspect="auto"
-                    )
-                    fig_matriz.update_xaxes(title="Severidad")
-                    fig_matriz.update_yaxes(title="Probabilidad")
-                    
-                    img_matriz = plotly_fig_to_image(fig_matriz, width=700, height=500)
+                    img_matriz = imagenes.get('matriz')
                     if img_matriz:
                         elements.append(img_matriz)
-                        elements.append(Spacer(1, 15))
+                    else:
+                        # Sin imagen: la misma matriz 5x5 como tabla
+                        matriz = matriz_riesgo(cubo_por_version(data, filtros))
+                        matriz_data = [['P \\ S'] + [str(s) for s in matriz.columns]] + \
+                            [[str(p)] + [str(v) for v in fila] for p, fila in zip(matriz.index, matriz.values.tolist())]
+                        matriz_table = tabla(matriz_data, [80] + [80] * len(matriz.columns), ESTILO_MATRIZ)
+                        elements.append(matriz_table)
+                    elements.append(Spacer(1, 15))
                 except Exception:
-                    pass  # Si falla, continuar sin el gráfico
+                    pass  # Si falla, continuar sin la matriz
             
             # Resumen de riesgos por área
             elements.append(Paragraph("Resumen de Riesgos por Área", subheading_style))
             if 'area' in data['riesgos'].columns:
-                riesgos_area = data['riesgos'].groupby('area').size().reset_index(name='cantidad')
+                riesgos_area = conteo_dimension(cubo_por_version(data, filtros), 'area').reset_index()
                 riesgos_area_data = [['Área', 'Cantidad']] + riesgos_area.values.tolist()
-                riesgos_area_table = Table(riesgos_area_data, colWidths=[300, 200])
-                riesgos_area_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#6c757d')),
-                    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                    ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
-                    ('FONTSIZE', (0,0), (-1,-1), 9)
-                ]))
+                riesgos_area_table = tabla(riesgos_area_data, [300, 200])
                 elements.append(riesgos_area_table)
         else:
-            elements.append(Paragraph("No hay datos de riesgos disponibles", styles['Normal']))
+            elements.append(Paragraph("No hay datos de riesgos disponibles", normal_style))
         
         elements.append(Spacer(1, 20))
         
@@ -815,29 +995,18 @@ def generar_reporte_pdf(data, tipo, filtros):
                 incidentes_area = data['incidentes']['area'].value_counts().reset_index()
                 incidentes_area.columns = ['Área', 'Cantidad']
                 
-                # Crear gráfico de barras
-                fig_area = px.bar(incidentes_area, x='Cantidad', y='Área', 
-                                 orientation='h', title="Incidentes por Área")
-                img_area = plotly_fig_to_image(fig_area, width=700, height=400)
+                img_area = imagenes.get('area')
                 if img_area:
                     elements.append(img_area)
                     elements.append(Spacer(1, 10))
                 
                 # Agregar tabla también
                 incidentes_area_data = [incidentes_area.columns.tolist()] + incidentes_area.values.tolist()
-                incidentes_area_table = Table(incidentes_area_data, colWidths=[300, 200])
-                incidentes_area_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#6c757d')),
-                    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                    ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
-                    ('FONTSIZE', (0,0), (-1,-1), 9)
-                ]))
+                incidentes_area_table = tabla(incidentes_area_data, [300, 200])
                 elements.append(incidentes_area_table)
                 elements.append(Spacer(1, 15))
             except Exception:
-                elements.append(Paragraph("No se pudo generar la distribución por área", styles['Normal']))
+                elements.append(Paragraph("No se pudo generar la distribución por área", normal_style))
         
         # Distribución por tipo de peligro
         if not data['riesgos'].empty and 'tipo_peligro' in data['riesgos'].columns:
@@ -846,29 +1015,18 @@ def generar_reporte_pdf(data, tipo, filtros):
                 peligros = data['riesgos']['tipo_peligro'].value_counts().reset_index()
                 peligros.columns = ['Tipo de Peligro', 'Cantidad']
                 
-                # Crear gráfico de pastel
-                fig_peligros = px.pie(data['riesgos'], names='tipo_peligro', 
-                                     title="Tipos de Peligros Identificados")
-                img_peligros = plotly_fig_to_image(fig_peligros, width=600, height=400)
+                img_peligros = imagenes.get('peligros')
                 if img_peligros:
                     elements.append(img_peligros)
                     elements.append(Spacer(1, 10))
                 
                 # Agregar tabla también
                 peligros_data = [peligros.columns.tolist()] + peligros.values.tolist()
-                peligros_table = Table(peligros_data, colWidths=[300, 200])
-                peligros_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#6c757d')),
-                    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                    ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
-                    ('FONTSIZE', (0,0), (-1,-1), 9)
-                ]))
+                peligros_table = tabla(peligros_data, [300, 200])
                 elements.append(peligros_table)
                 elements.append(Spacer(1, 15))
             except Exception:
-                elements.append(Paragraph("No se pudo generar la distribución por tipo de peligro", styles['Normal']))
+                elements.append(Paragraph("No se pudo generar la distribución por tipo de peligro", normal_style))
                 elements.append(Spacer(1, 15))
         
         # Análisis de hallazgos
@@ -876,41 +1034,21 @@ def generar_reporte_pdf(data, tipo, filtros):
             elements.append(Paragraph("Análisis de Hallazgos de Inspección", subheading_style))
             if 'categoria' in data['hallazgos'].columns and 'estado' in data['hallazgos'].columns:
                 try:
-                    # Crear gráfico sunburst
-                    fig_hallazgos = px.sunburst(data['hallazgos'], path=['categoria', 'estado'], 
-                                               title="Hallazgos por Categoría y Estado",
-                                               height=500)
-                    img_hallazgos = plotly_fig_to_image(fig_hallazgos, width=600, height=500)
+                    img_hallazgos = imagenes.get('hallazgos')
                     if img_hallazgos:
                         elements.append(img_hallazgos)
                         elements.append(Spacer(1, 10))
                     
                     # Agregar tabla también
-                    hallazgos_resumen = data['hallazgos'].groupby(['categoria', 'estado']).size().reset_index(name='cantidad')
+                    hallazgos_resumen = conteo_hallazgos(data['hallazgos'])
                     hallazgos_data = [['Categoría', 'Estado', 'Cantidad']] + hallazgos_resumen.values.tolist()
-                    hallazgos_table = Table(hallazgos_data, colWidths=[200, 150, 150])
-                    hallazgos_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#6c757d')),
-                        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                        ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
-                        ('FONTSIZE', (0,0), (-1,-1), 9)
-                    ]))
+                    hallazgos_table = tabla(hallazgos_data, [200, 150, 150])
                     elements.append(hallazgos_table)
                 except Exception:
                     # Si falla el gráfico, solo mostrar tabla
-                    hallazgos_resumen = data['hallazgos'].groupby(['categoria', 'estado']).size().reset_index(name='cantidad')
+                    hallazgos_resumen = conteo_hallazgos(data['hallazgos'])
                     hallazgos_data = [['Categoría', 'Estado', 'Cantidad']] + hallazgos_resumen.values.tolist()
-                    hallazgos_table = Table(hallazgos_data, colWidths=[200, 150, 150])
-                    hallazgos_table.setStyle(TableStyle([
-                        ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#6c757d')),
-                        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                        ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-                        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                        ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
-                        ('FONTSIZE', (0,0), (-1,-1), 9)
-                    ]))
+                    hallazgos_table = tabla(hallazgos_data, [200, 150, 150])
                     elements.append(hallazgos_table)
         
         elements.append(Spacer(1, 20))
@@ -922,83 +1060,31 @@ def generar_reporte_pdf(data, tipo, filtros):
             cols_disponibles = ['codigo', 'tipo', 'fecha_hora', 'area', 'descripcion']
             cols_finales = [col for col in cols_disponibles if col in data['incidentes'].columns]
             if cols_finales and not data['incidentes'][cols_finales].empty:
-                incidentes_pdf = data['incidentes'][cols_finales].head(30)  # Limitar a 30 para el PDF
-                
-                incidentes_data = [incidentes_pdf.columns.tolist()] + incidentes_pdf.values.tolist()
-                # Convertir todos los valores a string y truncar descripciones largas
-                incidentes_data_clean = []
-                for row in incidentes_data:
-                    clean_row = []
-                    for cell in row:
-                        cell_str = str(cell)
-                        if len(cell_str) > 50:
-                            cell_str = cell_str[:47] + "..."
-                        clean_row.append(cell_str)
-                    incidentes_data_clean.append(clean_row)
-                
-                ancho_col = 500 / len(cols_finales)
-                incidentes_table = Table(incidentes_data_clean, colWidths=[ancho_col] * len(cols_finales))
-                incidentes_table.setStyle(TableStyle([
-                    ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#6c757d')),
-                    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                    ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-                    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0,0), (-1,0), 9),
-                    ('BOTTOMPADDING', (0,0), (-1,0), 8),
-                    ('BACKGROUND', (0,1), (-1,-1), colors.HexColor('#f8f9fa')),
-                    ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
-                    ('FONTSIZE', (0,1), (-1,-1), 8),
-                    ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.HexColor('#f8f9fa')])
-                ]))
-                elements.append(incidentes_table)
+                # Todos los incidentes del período (anexo), por segmentos con encabezado repetido
+                elements.extend(tabla_paginada(data['incidentes'], cols_finales))
             else:
-                elements.append(Paragraph("No hay columnas disponibles para mostrar incidentes", styles['Normal']))
+                elements.append(Paragraph("No hay columnas disponibles para mostrar incidentes", normal_style))
         else:
-            elements.append(Paragraph("No hay incidentes registrados en el período", styles['Normal']))
+            elements.append(Paragraph("No hay incidentes registrados en el período", normal_style))
     
     else:
         # Para otros tipos de reporte, mantener formato original simplificado
-        kpi_data = [
-            ['Métrica', 'Valor', 'Interpretación'],
-            ['Total Incidentes', str(len(data['incidentes'])), 'Ver detalle en tabla'],
-            ['Riesgos Críticos', str(len(data['riesgos'][data['riesgos']['nivel_riesgo'] >= 15]) if not data['riesgos'].empty else 0), 'Requieren atención inmediata'],
-            ['EPP por Vencer', str(len(data['epp'][pd.to_datetime(data['epp']['fecha_vencimiento']) <= datetime.now() + timedelta(days=30)]) if not data['epp'].empty and 'fecha_vencimiento' in data['epp'].columns else 0), 'Programar renovación']
-        ]
-        
-        kpi_table = Table(kpi_data, colWidths=[200, 100, 200])
-        kpi_table.setStyle(TableStyle([
-            ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#1e3a8a')),
-            ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0,0), (-1,0), 12),
-            ('BOTTOMPADDING', (0,0), (-1,0), 12),
-            ('BACKGROUND', (0,1), (-1,-1), colors.HexColor('#f8f9fa')),
-            ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6'))
+        elements.append(seccion_kpis([
+            ('Total Incidentes', kpis['incidentes_total'], 'Ver detalle en tabla'),
+            ('Riesgos Críticos', kpis['riesgos_criticos'] or 0, 'Requieren atención inmediata'),
+            ('EPP por Vencer', kpis['epp_vence_30_dias'] or 0, 'Programar renovación')
         ]))
-        
-        elements.append(kpi_table)
         elements.append(Spacer(1, 20))
         
         # Tabla de incidentes
         if not data['incidentes'].empty:
-            elements.append(Paragraph("DETALLE DE INCIDENTES", styles['Heading2']))
+            elements.append(Paragraph("DETALLE DE INCIDENTES", estilos['heading2']))
             cols_disponibles = ['codigo', 'tipo', 'area', 'descripcion']
             cols_finales = [col for col in cols_disponibles if col in data['incidentes'].columns]
-            incidentes_pdf = data['incidentes'][cols_finales].head(10)
-            incidentes_data = [incidentes_pdf.columns.tolist()] + incidentes_pdf.values.tolist()
-            incidentes_table = Table(incidentes_data, colWidths=[80, 80, 100, 250])
-            incidentes_table.setStyle(TableStyle([
-                ('BACKGROUND', (0,0), (-1,0), colors.HexColor('#6c757d')),
-                ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
-                ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-                ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-                ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6'))
-            ]))
-            elements.append(incidentes_table)
+            elements.extend(tabla_paginada(data['incidentes'].head(10), cols_finales))
     
     # Build PDF
-    doc.build(elements)
+    construir_documento(doc, elements)
     output.seek(0)
     
     return {
@@ -1006,8 +1092,13 @@ def generar_reporte_pdf(data, tipo, filtros):
         'filename': f"Reporte_SST_{tipo}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf"
     }
 
-def configurar_webhook_n8n(data, filtros, email, frecuencia):
-    """Configurar webhook para envío automático"""
+def configurar_webhook_n8n(data, filtros, email, frecuencia, formato="PDF", tipo="Completo"):
+    """
+    Configurar webhook para envío automático.
+
+    Los reportes programados los genera scripts/generar_reportes_programados.py
+    fuera de Streamlit; aquí solo se guarda la configuración.
+    """
     supabase = get_supabase_client()
     
     try:
@@ -1015,12 +1106,15 @@ def configurar_webhook_n8n(data, filtros, email, frecuencia):
         config = {
             'email_destino': email,
             'frecuencia': frecuencia,
-            'filtros': json.dumps(filtros),
+            'formato': formato,
+            'tipo': tipo,
+            'filtros': json.dumps(normalizar_filtros(filtros)),
             'activo': True,
             'ultimo_envio': None
         }
         
-        supabase.table('configuraciones_reportes').upsert(config).execute()
+        guardada = supabase.table('configuraciones_reportes').upsert(config).execute().data
+        config_id = guardada[0]['id'] if guardada else None
         
         # Disparar webhook de n8n para validación
         requests.post(
@@ -1028,11 +1122,13 @@ def configurar_webhook_n8n(data, filtros, email, frecuencia):
             json={
                 'email': email,
                 'frecuencia': frecuencia,
-                'filtros': filtros,
-                'config_id': config.get('id')
+                'formato': formato,
+                'tipo': tipo,
+                'filtros': normalizar_filtros(filtros),
+                'config_id': config_id
             }
         )
+        return True
     except Exception as e:
         st.error(f"Error configurando webhook: {e}")
-
-
+        return False
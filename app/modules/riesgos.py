@@ -3,6 +3,32 @@ import pandas as pd
 from app.utils.supabase_client import get_supabase_client
 from app.auth import requerir_rol
 import plotly.express as px
+import numpy as np
+from app.utils.importacion_helper import (
+    leer_archivo_en_bloques, renombrar_columnas, normalizar_serie, insertar_en_lotes
+)
+from app.utils.catalogos import indice_usuarios_por_nombre
+from app.utils.codigos import generar_codigo, generar_codigos
+
+AREAS = ["Producción", "Almacén", "Oficinas", "Mantenimiento"]
+TIPOS_PELIGRO = ["Físico", "Químico", "Biológico", "Ergonómico", "Psicosocial", "Mecánico"]
+
+EVALUACION_ALTO = "🚨 RIESGO ALTO - Requiere control inmediato"
+EVALUACION_MEDIO = "⚠️ RIESGO MEDIO - Requiere control a corto plazo"
+EVALUACION_BAJO = "✅ RIESGO BAJO - Control estándar"
+
+# Encabezados aceptados en las matrices IPERC importadas
+ALIAS_COLUMNAS_IPERC = {
+    'area': ['área'],
+    'puesto_trabajo': ['puesto', 'puesto de trabajo'],
+    'actividad': ['tarea'],
+    'peligro': ['peligro identificado'],
+    'tipo_peligro': ['tipo', 'tipo de peligro'],
+    'probabilidad': ['p', 'prob'],
+    'severidad': ['s', 'sev'],
+    'controles_actuales': ['controles', 'controles actuales'],
+    'responsable': ['responsable_nombre']
+}
 
 def mostrar(usuario):
     """Módulo de Gestión de Riesgos (Ley 29783 Art. 26-28)"""
@@ -10,10 +36,11 @@ def mostrar(usuario):
     
     st.title("⚠️ Gestión de Riesgos Laborales")
     
-    tab1, tab2, tab3 = st.tabs([
+    tab1, tab2, tab3, tab4 = st.tabs([
         "📝 Registrar Riesgo",
         "📋 Listar Riesgos",
-        "📊 Dashboard"
+        "📊 Dashboard",
+        "📥 Importar Matriz IPERC"
     ])
     
     with tab1:
@@ -24,6 +51,9 @@ def mostrar(usuario):
     
     with tab3:
         dashboard_riesgos()
+    
+    with tab4:
+        importar_matriz_iperc(usuario)
 
 def registrar_riesgo(usuario):
     
@@ -45,16 +75,13 @@ def registrar_riesgo(usuario):
         col1, col2 = st.columns(2)
         
         with col1:
-            area = st.selectbox("Área", ["Producción", "Almacén", "Oficinas", "Mantenimiento"])
+            area = st.selectbox("Área", AREAS)
             puesto = st.text_input("Puesto de Trabajo")
             actividad = st.text_area("Actividad")
         
         with col2:
             peligro = st.text_area("Peligro Identificado")
-            tipo_peligro = st.selectbox(
-                "Tipo de Peligro",
-                ["Físico", "Químico", "Biológico", "Ergonómico", "Psicosocial", "Mecánico"]
-            )
+            tipo_peligro = st.selectbox("Tipo de Peligro", TIPOS_PELIGRO)
         
         st.markdown("### Matriz de Riesgo")
         col3, col4 = st.columns(2)
@@ -73,13 +100,7 @@ def registrar_riesgo(usuario):
 
         # CALCULO REACTIVO AQUÍ, SIN SACARLO DEL BLOQUE
         nivel_riesgo = probabilidad * severidad
-
-        if nivel_riesgo >= 15:
-            evaluacion_riesgo = "🚨 RIESGO ALTO - Requiere control inmediato"
-        elif nivel_riesgo >= 8:
-            evaluacion_riesgo = "⚠️ RIESGO MEDIO - Requiere control a corto plazo"
-        else:
-            evaluacion_riesgo = "✅ RIESGO BAJO - Control estándar"
+        evaluacion_riesgo = evaluar_nivel_riesgo(nivel_riesgo)
 
         with col4:
             controles = st.text_area("Controles Actuales")
@@ -133,15 +154,22 @@ def registrar_riesgo(usuario):
                 if resultado:
                     mostrar_resumen_riesgo(resultado, responsable_nombre if responsable_nombre else "No asignado")
 
+def evaluar_nivel_riesgo(nivel_riesgo):
+    """Texto de evaluación según el nivel de riesgo (P × S)"""
+    if nivel_riesgo >= 15:
+        return EVALUACION_ALTO
+    elif nivel_riesgo >= 8:
+        return EVALUACION_MEDIO
+    return EVALUACION_BAJO
+
 def guardar_riesgo(data):
     """Guarda en Supabase y dispara webhook de n8n"""
     supabase = get_supabase_client()
     
-    # Generar código único
-    codigo = f"R-{pd.Timestamp.now().strftime('%Y%m%d')}-{hash(data['peligro'])%1000:03d}"
-    data['codigo'] = codigo
-    
     try:
+        # Generar código único (contador en BD, reservado por bloques)
+        data['codigo'] = generar_codigo('R')
+        
         # Insertar en BD
         response = supabase.table('riesgos').insert(data).execute()
         
@@ -190,8 +218,7 @@ def listar_riesgos(usuario):
     # Filtros
     col1, col2 = st.columns([3, 1])
     with col1:
-        filtro_area = st.multiselect("Filtrar por Área", 
-            ["Producción", "Almacén", "Oficinas", "Mantenimiento"])
+        filtro_area = st.multiselect("Filtrar por Área", AREAS)
     with col2:
         filtro_estado = st.selectbox("Estado", ["todos", "pendiente", "en_mitigacion", "controlado"])
     
@@ -282,3 +309,142 @@ def dashboard_riesgos():
         title="Distribución de Nivel de Riesgo"
     )
     st.plotly_chart(fig2, use_container_width=True)
+
+
+def importar_matriz_iperc(usuario):
+    """Importación masiva de una matriz IPERC desde Excel o CSV"""
+    st.subheader("📥 Importar Matriz IPERC")
+    
+    if usuario['rol'] not in ['admin', 'sst']:
+        st.info("ℹ️ Solo los roles admin y sst pueden importar matrices IPERC")
+        return
+
+    st.caption(
+        "Columnas esperadas: área, puesto de trabajo, actividad, peligro, tipo de peligro, "
+        "probabilidad (1-5), severidad (1-5), controles actuales, responsable"
+    )
+    
+    plantilla = pd.DataFrame(columns=list(ALIAS_COLUMNAS_IPERC.keys()))
+    st.download_button(
+        "📄 Descargar plantilla CSV",
+        plantilla.to_csv(index=False).encode('utf-8'),
+        "plantilla_iperc.csv",
+        "text/csv"
+    )
+    
+    archivo = st.file_uploader("Matriz IPERC", type=['xlsx', 'csv'], key="archivo_iperc")
+    
+    if not archivo or not st.button("🚀 Validar e Importar", type="primary"):
+        return
+    
+    indice_responsables = indice_usuarios_por_nombre()
+    total_filas = 0
+    total_insertados = 0
+    reporte_errores = []
+    progreso = st.progress(0.0, text="Procesando matriz...")
+    
+    for bloque in leer_archivo_en_bloques(archivo):
+        validos, errores = validar_bloque_iperc(bloque, indice_responsables)
+        total_filas += len(bloque)
+        reporte_errores.append(errores)
+        
+        if not validos.empty:
+            insertados, errores_bd = insertar_en_lotes('riesgos', preparar_registros_iperc(validos))
+            total_insertados += len(insertados)
+            if errores_bd:
+                reporte_errores.append(pd.DataFrame(errores_bd))
+        
+        progreso.progress(min(0.95, total_filas / (total_filas + 2000)), text=f"{total_filas} filas procesadas")
+    
+    progreso.progress(1.0, text="Importación finalizada")
+    
+    errores_df = pd.concat(reporte_errores, ignore_index=True) if reporte_errores else pd.DataFrame(columns=['fila', 'error'])
+    
+    col1, col2, col3 = st.columns(3)
+    col1.metric("📄 Filas leídas", total_filas)
+    col2.metric("✅ Riesgos importados", total_insertados)
+    col3.metric("❌ Filas con error", len(errores_df))
+    
+    if not errores_df.empty:
+        st.markdown("#### ❌ Reporte de Errores")
+        errores_df = errores_df.sort_values('fila')
+        st.dataframe(errores_df, use_container_width=True)
+        st.download_button(
+            "📥 Descargar reporte de errores",
+            errores_df.to_csv(index=False).encode('utf-8'),
+            f"errores_iperc_{pd.Timestamp.now().strftime('%Y%m%d_%H%M%S')}.csv",
+            "text/csv"
+        )
+
+def validar_bloque_iperc(bloque, indice_responsables):
+    """
+    Validar y normalizar un bloque de la matriz IPERC con operaciones vectorizadas.
+    
+    Args:
+        bloque: DataFrame leído del archivo (índice = número de fila)
+        indice_responsables: Dict {nombre normalizado: id de usuario}
+    
+    Returns:
+        Tupla (validos, errores): DataFrame normalizado con las filas válidas y
+        DataFrame con columnas 'fila' y 'error'
+    """
+    df = renombrar_columnas(bloque, ALIAS_COLUMNAS_IPERC)
+    for columna in ALIAS_COLUMNAS_IPERC:
+        if columna not in df.columns:
+            df[columna] = ''
+    
+    mensajes = pd.DataFrame(index=df.index)
+    
+    # Campos de texto obligatorios
+    for columna in ['puesto_trabajo', 'actividad', 'peligro']:
+        df[columna] = df[columna].fillna('').astype(str).str.strip()
+        mensajes[columna] = np.where(df[columna] == '', f"'{columna}' es obligatorio", '')
+    df['controles_actuales'] = df['controles_actuales'].fillna('').astype(str).str.strip()
+    
+    # Enumerados: se comparan sin tildes ni mayúsculas y se guardan con el valor canónico
+    for columna, opciones in [('area', AREAS), ('tipo_peligro', TIPOS_PELIGRO)]:
+        canonicos = dict(zip(normalizar_serie(pd.Series(opciones)), opciones))
+        df[columna] = normalizar_serie(df[columna]).map(canonicos)
+        mensajes[columna] = np.where(df[columna].isna(), f"'{columna}' no válido", '')
+    
+    # Probabilidad y severidad: enteros entre 1 y 5
+    for columna in ['probabilidad', 'severidad']:
+        valores = pd.to_numeric(df[columna], errors='coerce')
+        fuera_de_rango = valores.isna() | (valores % 1 != 0) | ~valores.between(1, 5)
+        df[columna] = valores.where(~fuera_de_rango).astype('Int64')
+        mensajes[columna] = np.where(fuera_de_rango, f"'{columna}' debe ser un entero de 1 a 5", '')
+    
+    # Responsable: nombre → id mediante el índice de usuarios
+    df['responsable_id'] = normalizar_serie(df['responsable']).map(pd.Series(indice_responsables, dtype=object))
+    mensajes['responsable'] = np.where(df['responsable_id'].isna(), "responsable no encontrado", '')
+    
+    # Nivel y evaluación calculados por columna
+    df['nivel_riesgo'] = df['probabilidad'] * df['severidad']
+    nivel = df['nivel_riesgo'].fillna(0).astype(int).to_numpy()
+    df['evaluacion_riesgo'] = np.select(
+        [nivel >= 15, nivel >= 8],
+        [EVALUACION_ALTO, EVALUACION_MEDIO],
+        default=EVALUACION_BAJO
+    )
+    
+    error = pd.Series('', index=df.index, dtype=object)
+    for columna in mensajes.columns:
+        error = error + np.where(mensajes[columna] != '', mensajes[columna] + '; ', '')
+    error = error.str.rstrip('; ')
+    con_error = error != ''
+    
+    errores = pd.DataFrame({'fila': df.index[con_error], 'error': error[con_error].values})
+    return df[~con_error], errores
+
+def preparar_registros_iperc(validos):
+    """Convertir las filas válidas al formato de inserción de la tabla riesgos"""
+    registros = validos[[
+        'area', 'puesto_trabajo', 'actividad', 'peligro', 'tipo_peligro',
+        'probabilidad', 'severidad', 'evaluacion_riesgo', 'controles_actuales', 'responsable_id'
+    ]].copy()
+    # nivel_riesgo no se envía: igual que en el formulario, lo calcula la BD (P × S)
+    registros['probabilidad'] = registros['probabilidad'].astype(int)
+    registros['severidad'] = registros['severidad'].astype(int)
+    registros['codigo'] = generar_codigos('R', len(registros))
+    registros['_fila'] = registros.index
+    return registros.to_dict('records')
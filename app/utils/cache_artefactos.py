@@ -0,0 +1,165 @@
+import os
+import json
+import hashlib
+import tempfile
+from datetime import date, datetime
+from app.utils.filtros import normalizar_filtros
+
+DIRECTORIO_ARTEFACTOS = os.path.join(tempfile.gettempdir(), 'sst_artefactos')
+TAMANO_MAXIMO_ARTEFACTOS = 500 * 1024 * 1024  # 500 MB
+BUCKET_ARTEFACTOS = 'sst-documentos'
+CARPETA_STORAGE = 'reportes/cache'
+
+def clave_artefacto(formato, tipo, filtros, versiones, hoy=None):
+    """
+    Clave de un reporte generado: formato + tipo + filtros normalizados +
+    versión de las tablas + día de generación. El día entra porque los
+    reportes dependen de la fecha (EPP por vencer, días de atraso) aunque
+    los datos no cambien, como en clave_version de app/analytics/memo.py.
+    None si no hay versiones (no se cachea).
+    """
+    if versiones is None:
+        return None
+    contenido = json.dumps({
+        'formato': formato,
+        'tipo': tipo,
+        'filtros': normalizar_filtros(filtros),
+        'versiones': versiones,
+        'hoy': (hoy or date.today()).isoformat()
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(contenido.encode('utf-8')).hexdigest()
+
+def _ruta_datos(clave):
+    return os.path.join(DIRECTORIO_ARTEFACTOS, f"{clave}.bin")
+
+def _ruta_meta(clave):
+    return os.path.join(DIRECTORIO_ARTEFACTOS, f"{clave}.json")
+
+def _escribir_atomico(ruta, datos):
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(datos)
+    os.replace(temporal, ruta)
+
+def _escribir_local(clave, meta, datos):
+    os.makedirs(DIRECTORIO_ARTEFACTOS, exist_ok=True)
+    _escribir_atomico(_ruta_datos(clave), datos)
+    _escribir_atomico(_ruta_meta(clave), json.dumps(meta, ensure_ascii=False).encode('utf-8'))
+
+def _leer_local(clave):
+    try:
+        with open(_ruta_meta(clave), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        with open(_ruta_datos(clave), 'rb') as f:
+            datos = f.read()
+    except (OSError, ValueError):
+        return None
+    os.utime(_ruta_datos(clave))  # Marca de uso para el desalojo LRU
+    return meta, datos
+
+def _leer_storage(clave):
+    """Buscar el artefacto en Storage (generado por otra instancia o desalojado localmente)"""
+    try:
+        from app.utils.supabase_client import get_supabase_client
+        bucket = get_supabase_client().storage.from_(BUCKET_ARTEFACTOS)
+        meta = json.loads(bucket.download(f"{CARPETA_STORAGE}/{clave}.json"))
+        datos = bucket.download(f"{CARPETA_STORAGE}/{clave}.bin")
+    except Exception:
+        return None
+    _escribir_local(clave, meta, datos)
+    return meta, datos
+
+def buscar_artefacto(clave):
+    """
+    Reporte ya generado para la clave.
+
+    Returns:
+        Dict con los metadatos y 'data' (bytes), o None si no está en caché
+    """
+    if not clave:
+        return None
+    encontrado = _leer_local(clave) or _leer_storage(clave)
+    if not encontrado:
+        return None
+    meta, datos = encontrado
+    return {**meta, 'data': datos}
+
+def guardar_artefacto(clave, formato, tipo, filtros, archivo, en_storage=False, url=None):
+    """
+    Guardar un reporte generado ({'data', 'filename'}) en la caché local y,
+    si se indica, también en el bucket sst-documentos. `url` es la URL
+    pública con la que ya se entregó el archivo (se reutiliza en los envíos).
+    """
+    if not clave:
+        return
+    meta = {
+        'clave': clave,
+        'formato': formato,
+        'tipo': tipo,
+        'filtros': normalizar_filtros(filtros),
+        'filename': archivo['filename'],
+        'tamano': len(archivo['data']),
+        'creado': datetime.now().isoformat(timespec='seconds'),
+        'en_storage': en_storage,
+        'url': url
+    }
+    _escribir_local(clave, meta, archivo['data'])
+
+    if en_storage:
+        from app.utils.storage_helper import subir_bytes_storage
+        subir_bytes_storage(BUCKET_ARTEFACTOS, f"{CARPETA_STORAGE}/{clave}.bin", archivo['data'], 'application/octet-stream')
+        subir_bytes_storage(BUCKET_ARTEFACTOS, f"{CARPETA_STORAGE}/{clave}.json",
+                            json.dumps(meta, ensure_ascii=False).encode('utf-8'), 'application/json')
+
+    desalojar_artefactos()
+
+def listar_artefactos():
+    """Metadatos de los artefactos en la caché local, del uso más reciente al más antiguo"""
+    artefactos = []
+    try:
+        entradas = [e for e in os.scandir(DIRECTORIO_ARTEFACTOS) if e.name.endswith('.json')]
+    except OSError:
+        return artefactos
+    for entrada in entradas:
+        clave = entrada.name[:-len('.json')]
+        try:
+            with open(entrada.path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            meta['ultimo_uso'] = datetime.fromtimestamp(os.stat(_ruta_datos(clave)).st_mtime).isoformat(timespec='seconds')
+        except (OSError, ValueError):
+            continue
+        artefactos.append(meta)
+    return sorted(artefactos, key=lambda a: a['ultimo_uso'], reverse=True)
+
+def eliminar_artefacto(clave):
+    """Eliminar un artefacto de la caché local y de Storage"""
+    for ruta in (_ruta_datos(clave), _ruta_meta(clave)):
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
+    try:
+        from app.utils.supabase_client import get_supabase_client
+        get_supabase_client().storage.from_(BUCKET_ARTEFACTOS).remove([
+            f"{CARPETA_STORAGE}/{clave}.bin", f"{CARPETA_STORAGE}/{clave}.json"
+        ])
+    except Exception:
+        pass
+
+def desalojar_artefactos(tamano_maximo=TAMANO_MAXIMO_ARTEFACTOS):
+    """Eliminar de la caché local los artefactos menos usados hasta quedar bajo el límite"""
+    try:
+        entradas = [e for e in os.scandir(DIRECTORIO_ARTEFACTOS) if e.name.endswith('.bin')]
+    except OSError:
+        return
+    entradas = sorted((e.stat().st_mtime, e.stat().st_size, e.name[:-len('.bin')]) for e in entradas)
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, clave in entradas:
+        if total <= tamano_maximo:
+            break
+        for ruta in (_ruta_datos(clave), _ruta_meta(clave)):
+            try:
+                os.remove(ruta)
+            except OSError:
+                pass
+        total -= tamano
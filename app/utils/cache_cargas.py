@@ -0,0 +1,65 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from app.utils.filtros import filtros_de_carga, clave_filtros
+from app.utils.catalogos import cargar_areas
+
+def cache_por_filtros(campos, ttl, max_entradas):
+    """
+    Caché compartida (entre sesiones) de un cargador de datos por filtros.
+
+    La clave son los filtros canónicos (filtros_de_carga): el orden de las
+    áreas, la hora de las fechas, los filtros que el cargador no usa y
+    "todas las áreas" no generan entradas distintas. El cargador recibe esos
+    filtros canónicos. LRU con vencimiento por entrada; un resultado None
+    (error al cargar) no se guarda.
+
+    Agrega al cargador .clear() y .estadisticas() (aciertos, fallos,
+    expulsiones y entradas).
+    """
+    def decorador(cargar):
+        lock = threading.Lock()
+        entradas = OrderedDict()
+        contadores = {'aciertos': 0, 'fallos': 0, 'expulsiones': 0}
+
+        @functools.wraps(cargar)
+        def cargar_con_cache(filtros):
+            try:
+                areas = cargar_areas()
+            except Exception:
+                areas = None
+            canonicos = filtros_de_carga(filtros, campos, areas)
+            clave = clave_filtros(canonicos)
+            ahora = time.monotonic()
+            with lock:
+                entrada = entradas.get(clave)
+                if entrada is not None and entrada[0] > ahora:
+                    entradas.move_to_end(clave)
+                    contadores['aciertos'] += 1
+                    return entrada[1]
+                contadores['fallos'] += 1
+
+            resultado = cargar(canonicos)
+            if resultado is None:
+                return resultado
+            with lock:
+                entradas[clave] = (time.monotonic() + ttl, resultado)
+                entradas.move_to_end(clave)
+                while len(entradas) > max_entradas:
+                    entradas.popitem(last=False)
+                    contadores['expulsiones'] += 1
+            return resultado
+
+        def clear():
+            with lock:
+                entradas.clear()
+
+        def estadisticas():
+            with lock:
+                return dict(contadores, entradas=len(entradas))
+
+        cargar_con_cache.clear = clear
+        cargar_con_cache.estadisticas = estadisticas
+        return cargar_con_cache
+    return decorador
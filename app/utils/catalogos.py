@@ -0,0 +1,36 @@
+import streamlit as st
+from app.utils.supabase_client import get_supabase_client
+from app.utils.importacion_helper import normalizar_texto
+
+@st.cache_data(ttl=300)
+def cargar_usuarios():
+    """Cargar usuarios (id, nombre, rol, área) con caching de 5 min"""
+    supabase = get_supabase_client()
+    return supabase.table('usuarios').select('id, nombre_completo, rol, area, activo').execute().data or []
+
+def indice_usuarios_por_nombre():
+    """Índice {nombre normalizado: id} para resolver responsables y trabajadores por nombre"""
+    return {
+        normalizar_texto(u['nombre_completo']): u['id']
+        for u in cargar_usuarios() if u.get('nombre_completo')
+    }
+
+@st.cache_data(ttl=300)
+def cargar_catalogo_epp():
+    """Cargar catálogo de EPP activo con caching de 5 min"""
+    supabase = get_supabase_client()
+    return supabase.table('epp_catalogo').select('*').eq('activo', True).execute().data or []
+
+def indice_epp_por_nombre():
+    """Índice {nombre normalizado: id} del catálogo de EPP activo"""
+    return {
+        normalizar_texto(e['nombre']): e['id']
+        for e in cargar_catalogo_epp() if e.get('nombre')
+    }
+
+@st.cache_data(ttl=300)
+def cargar_areas():
+    """Áreas con riesgos registrados (opciones de los filtros) con caching de 5 min"""
+    supabase = get_supabase_client()
+    filas = supabase.table('riesgos').select('area').execute().data or []
+    return sorted({f['area'] for f in filas if f.get('area')})
@@ -0,0 +1,69 @@
+import threading
+from datetime import datetime
+from app.utils.supabase_client import get_supabase_client
+
+# Cantidad mínima de números que se reservan por viaje a la BD
+TAMANO_BLOQUE = 50
+
+class AsignadorCodigos:
+    """
+    Asigna códigos únicos y ordenados reservando bloques de números por proceso.
+
+    Los números salen de la función `reservar_codigos` (ver
+    scripts/sql/contadores_codigos.sql). Cada proceso reserva un bloque y lo
+    consume localmente, de modo que solo hay un viaje a la BD cada
+    TAMANO_BLOQUE códigos (o uno por inserción masiva).
+    """
+
+    def __init__(self, tamano_bloque=TAMANO_BLOQUE):
+        self.tamano_bloque = tamano_bloque
+        self._bloques = {}  # prefijo -> [siguiente, ultimo]
+        self._lock = threading.Lock()
+
+    def _reservar(self, prefijo, cantidad):
+        """Reservar `cantidad` números en la BD y devolver (primero, ultimo)"""
+        supabase = get_supabase_client()
+        response = supabase.rpc('reservar_codigos', {
+            'p_prefijo': prefijo,
+            'p_cantidad': cantidad
+        }).execute()
+        ultimo = response.data[0] if isinstance(response.data, list) else response.data
+        ultimo = int(ultimo)
+        return ultimo - cantidad + 1, ultimo
+
+    def siguientes(self, prefijo, cantidad=1):
+        """Devolver la lista de los próximos `cantidad` números del prefijo"""
+        with self._lock:
+            siguiente, ultimo = self._bloques.get(prefijo, (1, 0))
+            numeros = list(range(siguiente, min(ultimo, siguiente + cantidad - 1) + 1))
+
+            faltantes = cantidad - len(numeros)
+            if faltantes > 0:
+                primero, ultimo = self._reservar(prefijo, max(faltantes, self.tamano_bloque))
+                numeros.extend(range(primero, primero + faltantes))
+                siguiente = primero + faltantes
+            else:
+                siguiente += cantidad
+
+            self._bloques[prefijo] = (siguiente, ultimo)
+            return numeros
+
+_asignador = AsignadorCodigos()
+
+def generar_codigos(prefijo, cantidad):
+    """
+    Generar `cantidad` códigos con formato PREFIJO-YYYYMMDD-NNNNNN.
+
+    Args:
+        prefijo: Prefijo del código (ej: 'R', 'INC', 'CAP')
+        cantidad: Número de códigos a generar
+
+    Returns:
+        Lista de códigos únicos en orden creciente
+    """
+    fecha = datetime.now().strftime('%Y%m%d')
+    return [f"{prefijo}-{fecha}-{n:06d}" for n in _asignador.siguientes(prefijo, cantidad)]
+
+def generar_codigo(prefijo):
+    """Generar un único código con formato PREFIJO-YYYYMMDD-NNNNNN"""
+    return generar_codigos(prefijo, 1)[0]
@@ -0,0 +1,266 @@
+import os
+import re
+import uuid
+import shutil
+import logging
+import zipfile
+import tempfile
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import streamlit as st
+from app.utils.graficos import calentar_kaleido
+
+DIRECTORIO_REPORTES = os.path.join(tempfile.gettempdir(), 'sst_reportes')
+BUCKET_REPORTES = 'sst-documentos'
+HORAS_RETENCION = 24
+
+logger = logging.getLogger(__name__)
+
+def generar_y_guardar_reporte(job_id, formato, data, tipo, filtros, destino, clave_cache=None, graficos=None):
+    """
+    Genera el reporte y guarda el artefacto (disco y, con destino='storage',
+    el bucket sst-documentos). Se ejecuta en un proceso del pool; `graficos`
+    son los PNG del PDF ya renderizados (reportes.renderizar_graficos_pdf).
+    """
+    # Import diferido: el proceso hijo solo carga reportes cuando lo necesita
+    from app.modules import reportes
+
+    if formato == "Excel":
+        archivo = reportes.generar_reporte_excel(data, tipo, filtros)
+    else:
+        archivo = reportes.generar_reporte_pdf(data, tipo, filtros, graficos=graficos)
+
+    carpeta = os.path.join(DIRECTORIO_REPORTES, job_id)
+    os.makedirs(carpeta, exist_ok=True)
+    ruta = os.path.join(carpeta, archivo['filename'])
+    with open(ruta, 'wb') as f:
+        f.write(archivo['data'])
+
+    url = None
+    if destino == 'storage':
+        from app.utils.storage_helper import subir_bytes_storage, url_publica_storage
+        ruta_storage = f"reportes/{job_id}/{archivo['filename']}"
+        content_type = 'application/pdf' if formato == "PDF" else \
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        subir_bytes_storage(BUCKET_REPORTES, ruta_storage, archivo['data'], content_type)
+        url = url_publica_storage(BUCKET_REPORTES, ruta_storage)
+
+    if clave_cache:
+        # La caché es una optimización: si falla, el reporte igual se entrega
+        try:
+            from app.utils.cache_artefactos import guardar_artefacto
+            guardar_artefacto(clave_cache, formato, tipo, filtros, archivo, en_storage=destino == 'storage', url=url)
+        except Exception:
+            logger.warning("No se pudo guardar el reporte %s en caché", job_id, exc_info=True)
+
+    return {'ruta': ruta, 'filename': archivo['filename'], 'url': url}
+
+def _futures_trabajo(trabajo):
+    """Futures de un trabajo simple o de todas las partes (y el ZIP) de un lote"""
+    if 'partes' not in trabajo:
+        return [trabajo['future']]
+    return list(trabajo['partes'].values()) + ([trabajo['empaquetado']] if trabajo['empaquetado'] else [])
+
+def _nombre_parte(nombre):
+    """Nombre de archivo seguro para una parte del lote (p. ej. el área)"""
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', str(nombre)).strip('_') or 'sin_nombre'
+
+class ColaReportes:
+    """
+    Cola de generación de reportes en un pool de procesos.
+
+    Los PDF pasan por un hilo coordinador: primero reparte las figuras del
+    reporte entre los workers del pool (render en paralelo) y después encola
+    la generación del documento con los PNG ya listos.
+
+    Cada trabajo pasa por los estados en_cola → procesando → completado/error.
+    Un reporte simple no informa avance (progreso None); un lote lo mide en
+    partes terminadas.
+    Los artefactos se guardan en disco (y opcionalmente en Storage) y se
+    conservan HORAS_RETENCION horas.
+    """
+
+    def __init__(self, max_workers=2):
+        # 'spawn' evita heredar los hilos del servidor de Streamlit en el hijo;
+        # cada worker arranca kaleido al iniciar para no pagarlo en el primer PDF
+        self._pool = ProcessPoolExecutor(
+            max_workers=max_workers,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=calentar_kaleido
+        )
+        self._coordinador = ThreadPoolExecutor(max_workers=max_workers)
+        self._trabajos = {}
+        self._lock = threading.Lock()
+
+    def _enviar(self, job_id, formato, data, tipo, filtros, destino, clave_cache=None):
+        """Future con el resultado de generar_y_guardar_reporte"""
+        if formato != "PDF":
+            return self._pool.submit(generar_y_guardar_reporte, job_id, formato, data, tipo, filtros, destino, clave_cache)
+        return self._coordinador.submit(self._generar_pdf, job_id, data, tipo, filtros, destino, clave_cache)
+
+    def _generar_pdf(self, job_id, data, tipo, filtros, destino, clave_cache):
+        """Renderizar las figuras en el pool y luego generar el PDF en un worker"""
+        from app.modules import reportes
+
+        graficos = reportes.renderizar_graficos_pdf(data, tipo, filtros, pool=self._pool)
+        return self._pool.submit(
+            generar_y_guardar_reporte, job_id, "PDF", data, tipo, filtros, destino, clave_cache, graficos
+        ).result()
+
+    def encolar(self, formato, data, tipo, filtros, usuario_id=None, destino='local', clave_cache=None):
+        """Encolar un reporte y devolver el id del trabajo"""
+        self._limpiar_antiguos()
+        job_id = uuid.uuid4().hex
+        future = self._enviar(job_id, formato, data, tipo, filtros, destino, clave_cache)
+
+        with self._lock:
+            self._trabajos[job_id] = {
+                'id': job_id,
+                'formato': formato,
+                'tipo': tipo,
+                'usuario_id': usuario_id,
+                'creado': datetime.now(),
+                'future': future
+            }
+        return job_id
+
+    def encolar_lote(self, formato, partes, tipo, usuario_id=None, destino='local'):
+        """
+        Encolar un reporte por cada parte y entregarlos juntos en un ZIP.
+
+        Args:
+            partes: Dict {nombre: (data, filtros)}, p. ej. una entrada por área
+
+        Las partes se generan en paralelo en el pool; el ZIP se arma cuando
+        terminan todas.
+        """
+        self._limpiar_antiguos()
+        job_id = uuid.uuid4().hex
+        futures = {
+            nombre: self._enviar(
+                os.path.join(job_id, _nombre_parte(nombre)), formato, data, tipo, filtros, 'local'
+            )
+            for nombre, (data, filtros) in partes.items()
+        }
+
+        with self._lock:
+            self._trabajos[job_id] = {
+                'id': job_id,
+                'formato': formato,
+                'tipo': tipo,
+                'usuario_id': usuario_id,
+                'creado': datetime.now(),
+                'partes': futures,
+                'destino': destino,
+                'empaquetado': None
+            }
+        return job_id
+
+    def estado(self, job_id):
+        """Estado actual de un trabajo (dict) o None si no existe"""
+        with self._lock:
+            trabajo = self._trabajos.get(job_id)
+        if not trabajo:
+            return None
+        if 'partes' in trabajo:
+            return self._estado_lote(trabajo)
+
+        future = trabajo['future']
+        estado = {k: v for k, v in trabajo.items() if k != 'future'}
+
+        if future.done():
+            error = future.exception()
+            if error:
+                estado.update(estado='error', progreso=None, error=str(error))
+            else:
+                estado.update(estado='completado', progreso=None, **future.result())
+        elif future.running():
+            estado.update(estado='procesando', progreso=None)
+        else:
+            estado.update(estado='en_cola', progreso=None)
+        return estado
+
+    def _estado_lote(self, trabajo):
+        """Estado de un lote: progreso por partes terminadas y ZIP al completar"""
+        futures = trabajo['partes']
+        estado = {k: v for k, v in trabajo.items() if k not in ('partes', 'empaquetado')}
+        terminadas = [f for f in futures.values() if f.done()]
+        errores = [f"{nombre}: {f.exception()}" for nombre, f in futures.items() if f.done() and f.exception()]
+        estado.update(partes_listas=len(terminadas), partes_total=len(futures))
+
+        if errores:
+            estado.update(estado='error', progreso=100, error='; '.join(errores))
+        elif len(terminadas) == len(futures):
+            # El ZIP se arma y se sube en un hilo coordinador: ni el lock ni el
+            # rerun que consulta el estado esperan la escritura o la subida
+            with self._lock:
+                if trabajo['empaquetado'] is None:
+                    trabajo['empaquetado'] = self._coordinador.submit(self._empaquetar_lote, trabajo)
+            empaquetado = trabajo['empaquetado']
+            if not empaquetado.done():
+                estado.update(estado='procesando', progreso=100)
+            elif empaquetado.exception():
+                estado.update(estado='error', progreso=100, error=f"No se pudo armar el ZIP: {empaquetado.exception()}")
+            else:
+                estado.update(estado='completado', progreso=100, **empaquetado.result())
+        elif terminadas or any(f.running() for f in futures.values()):
+            estado.update(estado='procesando', progreso=int(len(terminadas) / len(futures) * 100))
+        else:
+            estado.update(estado='en_cola', progreso=0)
+        return estado
+
+    def _empaquetar_lote(self, trabajo):
+        """Unir los archivos de las partes en un ZIP (y subirlo si el destino es Storage)"""
+        filename = f"Reportes_SST_{trabajo['tipo']}_por_area_{trabajo['creado'].strftime('%Y%m%d_%H%M%S')}.zip"
+        ruta = os.path.join(DIRECTORIO_REPORTES, trabajo['id'], filename)
+        with zipfile.ZipFile(ruta, 'w', compression=zipfile.ZIP_DEFLATED) as zf:
+            for nombre, future in trabajo['partes'].items():
+                resultado = future.result()
+                zf.write(resultado['ruta'], arcname=f"{_nombre_parte(nombre)}_{resultado['filename']}")
+
+        url = None
+        if trabajo['destino'] == 'storage':
+            from app.utils.storage_helper import subir_bytes_storage, url_publica_storage
+            ruta_storage = f"reportes/{trabajo['id']}/{filename}"
+            with open(ruta, 'rb') as f:
+                subir_bytes_storage(BUCKET_REPORTES, ruta_storage, f.read(), 'application/zip')
+            url = url_publica_storage(BUCKET_REPORTES, ruta_storage)
+
+        return {'ruta': ruta, 'filename': filename, 'url': url}
+
+    def trabajos(self, usuario_id=None):
+        """Estados de los trabajos (del usuario si se indica), del más reciente al más antiguo"""
+        with self._lock:
+            ids = [
+                job_id for job_id, t in self._trabajos.items()
+                if usuario_id is None or t['usuario_id'] == usuario_id
+            ]
+        estados = [self.estado(job_id) for job_id in ids]
+        return sorted([e for e in estados if e], key=lambda e: e['creado'], reverse=True)
+
+    def leer_artefacto(self, job_id):
+        """Bytes del archivo generado (solo trabajos completados)"""
+        estado = self.estado(job_id)
+        if not estado or estado['estado'] != 'completado':
+            return None
+        with open(estado['ruta'], 'rb') as f:
+            return f.read()
+
+    def _limpiar_antiguos(self):
+        limite = datetime.now() - timedelta(hours=HORAS_RETENCION)
+        with self._lock:
+            antiguos = [
+                job_id for job_id, t in self._trabajos.items()
+                if t['creado'] < limite and all(f.done() for f in _futures_trabajo(t))
+            ]
+            for job_id in antiguos:
+                del self._trabajos[job_id]
+        for job_id in antiguos:
+            shutil.rmtree(os.path.join(DIRECTORIO_REPORTES, job_id), ignore_errors=True)
+
+@st.cache_resource
+def obtener_cola_reportes():
+    """Cola única por proceso de Streamlit, compartida entre sesiones"""
+    return ColaReportes()
@@ -0,0 +1,237 @@
+import os
+import json
+from collections.abc import Mapping
+import pandas as pd
+from app.analytics.indicadores import hora_local
+
+# orjson (opcional) decodifica las columnas JSON varias veces más rápido
+try:
+    import orjson
+    _leer_json = orjson.loads
+except ImportError:
+    _leer_json = json.loads
+
+# Texto en columnas pyarrow (SST_BACKEND_ARROW=1): menos memoria y st.dataframe
+# las serializa sin pasar por objetos Python. Requiere pyarrow.
+BACKEND_ARROW = os.getenv('SST_BACKEND_ARROW', '').strip().lower() in ('1', 'true', 'si', 'sí')
+
+# Tipos de las tablas que se cargan en memoria para dashboards y reportes.
+#   categorias: columnas de valores repetidos (área, tipo, estado...) -> category
+#   numeros: enteros o decimales -> el tipo numérico más chico que los contiene
+#   marcas: timestamptz -> datetime64 en hora de Lima, sin zona
+#   fechas: date -> datetime64 (sin conversión de zona)
+#   relaciones: {columna anidada: {campo: columna plana}}; la anidada se descarta
+#   json: {columna JSON (texto o dict): {campo: columna plana}}; la original se conserva
+#   derivadas: {marca: columnas} calculadas una vez al cargar (dia, mes, hora)
+ESQUEMAS = {
+    'incidentes': {
+        'categorias': ['tipo', 'area', 'estado', 'lesiones', 'danos'],
+        'numeros': ['gravedad'],
+        'marcas': ['fecha_hora', 'fecha_cierre', 'created_at', 'updated_at'],
+        'relaciones': {'usuarios': {'nombre_completo': 'reportante'}},
+        'json': {'consecuencias': {'lesiones': 'lesiones', 'danos': 'danos', 'gravedad': 'gravedad'}},
+        'derivadas': {'fecha_hora': ['dia', 'mes', 'hora']}
+    },
+    'riesgos': {
+        'categorias': ['area', 'tipo_peligro', 'estado'],
+        'numeros': ['probabilidad', 'severidad', 'nivel_riesgo'],
+        'marcas': ['created_at', 'updated_at'],
+        'relaciones': {'usuarios': {'nombre_completo': 'responsable'}}
+    },
+    'epp_asignaciones': {
+        'categorias': ['estado', 'condicion'],
+        'fechas': ['fecha_entrega', 'fecha_vencimiento'],
+        'marcas': ['created_at'],
+        # PostgREST devuelve el trabajador como 'usuarios' o con el nombre de la FK
+        'relaciones': {
+            'usuarios!epp_asignaciones_trabajador_id_fkey': {'nombre_completo': 'nombre_completo', 'area': 'area'},
+            'usuarios': {'nombre_completo': 'nombre_completo', 'area': 'area'},
+            'epp_catalogo': {'nombre': 'epp_nombre', 'categoria': 'epp_categoria'}
+        }
+    },
+    'capacitaciones': {
+        'categorias': ['estado', 'area_destino', 'tipo'],
+        'numeros': ['duracion_horas'],
+        'fechas': ['fecha_programada'],
+        'marcas': ['created_at']
+    },
+    'inspecciones': {
+        'categorias': ['area', 'estado', 'tipo'],
+        'fechas': ['fecha_programada', 'fecha_realizada'],
+        'marcas': ['created_at']
+    },
+    'hallazgos': {
+        'categorias': ['categoria', 'estado', 'prioridad'],
+        'fechas': ['fecha_limite'],
+        'marcas': ['fecha_cierre', 'created_at'],
+        'relaciones': {'usuarios': {'nombre_completo': 'responsable'}}
+    },
+    'documentos': {
+        'categorias': ['tipo', 'area', 'estado'],
+        'fechas': ['fecha_vigencia'],
+        'marcas': ['created_at'],
+        'relaciones': {'usuarios': {'nombre_completo': 'responsable'}}
+    }
+}
+
+def _aplanar(df, relaciones):
+    for columna, campos in relaciones.items():
+        if columna not in df.columns:
+            continue
+        anidada = df.pop(columna)
+        registros = [v if isinstance(v, dict) else {} for v in anidada]
+        planos = pd.DataFrame.from_records(registros, index=df.index, columns=list(campos))
+        for campo, destino in campos.items():
+            if destino not in df.columns:
+                df[destino] = planos[campo]
+    return df
+
+def _decodificar(serie):
+    """
+    Valores de una columna JSON como lista de dicts ({} si no es un objeto).
+    Los textos se decodifican en una sola llamada (como un arreglo JSON); si
+    alguno es inválido se decodifican uno por uno.
+    """
+    valores = serie.tolist()
+    textos = [v for v in valores if isinstance(v, str)]
+    if textos:
+        try:
+            decodificados = _leer_json('[' + ','.join(textos) + ']')
+            if len(decodificados) != len(textos):
+                raise ValueError("Cantidad de valores distinta")
+            decodificados = iter(decodificados)
+            valores = [next(decodificados) if isinstance(v, str) else v for v in valores]
+        except ValueError:
+            valores = [_decodificar_uno(v) for v in valores]
+    return [v if isinstance(v, dict) else {} for v in valores]
+
+def _decodificar_uno(valor):
+    if not isinstance(valor, str):
+        return valor
+    try:
+        return _leer_json(valor)
+    except ValueError:
+        return {}
+
+def _expandir_json(df, columnas):
+    for columna, campos in columnas.items():
+        if columna not in df.columns:
+            continue
+        planos = pd.DataFrame.from_records(_decodificar(df[columna]), index=df.index, columns=list(campos))
+        for campo, destino in campos.items():
+            if destino not in df.columns:
+                df[destino] = planos[campo]
+    return df
+
+def _derivar(fechas, nombre):
+    if nombre == 'dia':
+        return fechas.dt.normalize()
+    if nombre == 'mes':
+        return fechas.dt.to_period('M').astype(str).where(fechas.notna()).astype('category')
+    if nombre == 'hora':
+        return fechas.dt.hour.astype('Int8')
+    raise ValueError(f"Columna derivada desconocida: {nombre}")
+
+def _presentes(df, esquema, clave):
+    return [c for c in esquema.get(clave, []) if c in df.columns]
+
+def aplicar_esquema(tabla, filas):
+    """
+    DataFrame tipado de una tabla, convertido una sola vez al cargarla.
+
+    Args:
+        tabla: Nombre de la tabla en ESQUEMAS
+        filas: Lista de dicts de Supabase (o DataFrame)
+
+    Returns:
+        DataFrame con relaciones y JSON aplanados, categorías, números reducidos,
+        fechas datetime64 y columnas derivadas; DataFrame vacío si no hay filas
+    """
+    if filas is None or len(filas) == 0:
+        return pd.DataFrame()
+    df = filas.copy() if isinstance(filas, pd.DataFrame) else pd.DataFrame(filas)
+    esquema = ESQUEMAS[tabla]
+    df = _aplanar(df, esquema.get('relaciones', {}))
+    df = _expandir_json(df, esquema.get('json', {}))
+
+    for columna in _presentes(df, esquema, 'marcas'):
+        df[columna] = hora_local(df[columna])
+    for columna in _presentes(df, esquema, 'fechas'):
+        df[columna] = pd.to_datetime(df[columna], errors='coerce', format='ISO8601')
+    for columna in _presentes(df, esquema, 'numeros'):
+        df[columna] = pd.to_numeric(df[columna], errors='coerce', downcast='integer')
+    for columna in _presentes(df, esquema, 'categorias'):
+        df[columna] = df[columna].astype('category')
+    for marca, nombres in esquema.get('derivadas', {}).items():
+        if marca in df.columns:
+            for nombre in nombres:
+                df[nombre] = _derivar(df[marca], nombre)
+    return texto_arrow(df) if BACKEND_ARROW else df
+
+def texto_arrow(df):
+    """
+    Columnas de texto (object con solo str) a string[pyarrow]. Categorías,
+    fechas y números no cambian: los cálculos de app/analytics trabajan con
+    esos tipos. Las columnas con dicts o listas quedan como object.
+    """
+    import pyarrow as pa
+    texto = [
+        columna for columna in df.columns[df.dtypes == object]
+        if pd.api.types.infer_dtype(df[columna], skipna=True) in ('string', 'empty')
+    ]
+    if not texto:
+        return df
+    return df.astype({columna: pd.ArrowDtype(pa.string()) for columna in texto})
+
+class DatosSoloLectura(Mapping):
+    """
+    Dict de solo lectura con un conjunto cargado, compartido desde la caché
+    de los cargadores. Cada acceso entrega una copia de los DataFrames: con
+    copy-on-write (app/main.py) la copia es superficial y no duplica memoria,
+    y cambiarla (df.loc[...] = ..., df['x'] = ...) no toca el original; sin
+    copy-on-write la copia es completa. Se puede serializar con pickle
+    (MappingProxyType no se puede) para pasarlo a los procesos de
+    ColaReportes; allí el conjunto ya es propio del proceso y no se copia.
+    """
+    __slots__ = ('_datos', '_compartido')
+
+    def __init__(self, datos, compartido=True):
+        self._datos = dict(datos)
+        self._compartido = compartido
+
+    def __getitem__(self, clave):
+        valor = self._datos[clave]
+        if not self._compartido:
+            return valor
+        if isinstance(valor, (pd.DataFrame, pd.Series)):
+            return valor.copy(deep=pd.options.mode.copy_on_write is not True)
+        if isinstance(valor, dict):
+            return dict(valor)
+        return valor
+
+    def __iter__(self):
+        return iter(self._datos)
+
+    def __len__(self):
+        return len(self._datos)
+
+    def __repr__(self):
+        return f"DatosSoloLectura({self._datos!r})"
+
+    def __reduce__(self):
+        return (DatosSoloLectura, (self._datos, False))
+
+def solo_lectura(data):
+    """
+    Conjunto cargado (dict de DataFrames) de solo lectura, para compartirlo
+    desde la caché de los cargadores entre reruns y sesiones: ni el dict ni
+    sus DataFrames cambian aunque una vista modifique lo que recibe.
+    """
+    return DatosSoloLectura(data) if data is not None else None
+
+def sin_categorias_vacias(df):
+    """Quita de las columnas category los valores sin filas (p. ej. tras filtrar por área)"""
+    categoricas = df.select_dtypes('category').columns
+    if len(categoricas) == 0:
+        return df
+    return df.assign(**{c: df[c].cat.remove_unused_categories() for c in categoricas})
@@ -0,0 +1,75 @@
+import io
+import json
+from datetime import datetime, date
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+FILAS_POR_BLOQUE = 5000
+
+def valor_celda(valor):
+    """Convierte un valor de pandas/Supabase a algo que openpyxl puede escribir"""
+    if valor is None:
+        return None
+    if isinstance(valor, (dict, list)):
+        return json.dumps(valor, ensure_ascii=False, default=str)
+    if isinstance(valor, float) and np.isnan(valor):
+        return None
+    if isinstance(valor, np.generic):
+        valor = valor.item()
+    if valor is pd.NaT or valor is pd.NA:
+        return None
+    if isinstance(valor, datetime):
+        # Excel no admite zonas horarias
+        return valor.replace(tzinfo=None) if valor.tzinfo else valor
+    if isinstance(valor, (str, int, float, bool, date)):
+        return valor
+    return str(valor)
+
+def bloques_dataframe(df, filas_por_bloque=FILAS_POR_BLOQUE):
+    """Divide un DataFrame ya cargado en bloques para escribirlo en streaming"""
+    for inicio in range(0, len(df), filas_por_bloque):
+        yield df.iloc[inicio:inicio + filas_por_bloque]
+
+def crear_libro_streaming():
+    """Libro de openpyxl en modo write-only (las filas se vuelcan a disco al escribirse)"""
+    return Workbook(write_only=True)
+
+def escribir_hoja(libro, nombre, columnas, bloques, al_escribir=None):
+    """
+    Escribe una hoja fila por fila a partir de bloques de datos.
+
+    Args:
+        libro: Libro creado con crear_libro_streaming()
+        nombre: Nombre de la hoja
+        columnas: Columnas a escribir (en orden); las que falten quedan vacías
+        bloques: Iterable de DataFrames o de listas de dicts
+        al_escribir: Función opcional llamada con cada bloque (DataFrame),
+            útil para acumular totales mientras se escribe
+
+    Returns:
+        Número de filas escritas
+    """
+    hoja = libro.create_sheet(nombre)
+    hoja.append(list(columnas))
+    total = 0
+
+    for bloque in bloques:
+        if not isinstance(bloque, pd.DataFrame):
+            bloque = pd.DataFrame(bloque)
+        if bloque.empty:
+            continue
+        if al_escribir:
+            al_escribir(bloque)
+        bloque = bloque.reindex(columns=list(columnas))
+        for fila in bloque.itertuples(index=False, name=None):
+            hoja.append([valor_celda(v) for v in fila])
+        total += len(bloque)
+
+    return total
+
+def guardar_libro(libro):
+    """Cierra el libro y devuelve el .xlsx en bytes"""
+    output = io.BytesIO()
+    libro.save(output)
+    return output.getvalue()
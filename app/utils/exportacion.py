@@ -0,0 +1,235 @@
+import os
+import json
+import gzip
+import pandas as pd
+from app.utils.supabase_client import get_supabase_client, leer_paginado
+
+# Tablas exportables: columna de fecha para particionar (None = sin particiones)
+# y relaciones a aplanar como columnas <alias>_<campo>
+TABLAS_EXPORTACION = {
+    'incidentes': {
+        'fecha': 'fecha_hora',
+        'relaciones': {'reportante': ('usuarios', ['nombre_completo'])}
+    },
+    'riesgos': {
+        'fecha': 'created_at',
+        'relaciones': {'responsable': ('usuarios', ['nombre_completo'])}
+    },
+    'epp_asignaciones': {
+        'fecha': 'fecha_entrega',
+        'relaciones': {
+            'trabajador': ('usuarios!epp_asignaciones_trabajador_id_fkey', ['nombre_completo', 'area']),
+            'epp': ('epp_catalogo', ['nombre'])
+        }
+    },
+    'capacitaciones': {'fecha': 'fecha_programada', 'relaciones': {}},
+    'asistentes_capacitacion': {
+        'fecha': None,
+        'relaciones': {
+            'usuario': ('usuarios', ['nombre_completo', 'area']),
+            'capacitacion': ('capacitaciones', ['codigo', 'tema'])
+        }
+    },
+    'inspecciones': {'fecha': 'fecha_programada', 'relaciones': {}},
+    'hallazgos': {
+        'fecha': 'created_at',
+        'relaciones': {
+            'inspeccion': ('inspecciones', ['area', 'fecha_programada']),
+            'responsable': ('usuarios', ['nombre_completo'])
+        }
+    },
+    'acciones_correctivas': {'fecha': 'created_at', 'relaciones': {}},
+    'documentos': {
+        'fecha': 'created_at',
+        'relaciones': {'autor': ('usuarios', ['nombre_completo'])}
+    }
+}
+
+FORMATOS_EXPORTACION = ('parquet', 'csv')
+SIN_FECHA = 'sin_fecha'
+
+def _consulta_tabla(tabla, desde=None, hasta=None):
+    """Función que arma la consulta paginable de una tabla (orden estable por fecha e id)"""
+    config = TABLAS_EXPORTACION[tabla]
+    relaciones = ', '.join(
+        f"{alias}:{relacion}({', '.join(campos)})"
+        for alias, (relacion, campos) in config['relaciones'].items()
+    )
+    select = '*' + (f", {relaciones}" if relaciones else '')
+    fecha = config['fecha']
+
+    def construir():
+        query = get_supabase_client().table(tabla).select(select)
+        if fecha and desde:
+            query = query.gte(fecha, desde.isoformat())
+        if fecha and hasta:
+            query = query.lte(fecha, hasta.isoformat())
+        if fecha:
+            query = query.order(fecha)
+        return query.order('id')
+
+    return construir
+
+def aplanar_pagina(tabla, filas):
+    """
+    Convierte una página de Supabase en un DataFrame plano.
+
+    Las relaciones pasan a columnas <alias>_<campo> (siempre las mismas,
+    aunque en la página vengan vacías), las fechas a timestamps UTC y los
+    JSON restantes a texto.
+    """
+    df = pd.DataFrame(filas)
+    for alias, (_, campos) in TABLAS_EXPORTACION[tabla]['relaciones'].items():
+        valores = df.pop(alias) if alias in df.columns else pd.Series([None] * len(df), index=df.index)
+        relacion = pd.DataFrame(
+            [v if isinstance(v, dict) else {} for v in valores],
+            index=df.index
+        ).reindex(columns=campos)
+        df = df.join(relacion.add_prefix(f"{alias}_"))
+
+    for columna in df.columns:
+        if columna.startswith('fecha') or columna.endswith('_at'):
+            df[columna] = pd.to_datetime(df[columna], errors='coerce', utc=True)
+
+    for columna in df.columns[df.dtypes == object]:
+        if df[columna].map(lambda v: isinstance(v, (dict, list))).any():
+            df[columna] = df[columna].map(
+                lambda v: json.dumps(v, ensure_ascii=False, default=str) if isinstance(v, (dict, list)) else v
+            )
+    return df
+
+def _particiones(df, columna_fecha):
+    """Divide una página por mes de la columna de fecha: {'2024-01': df, ...}"""
+    if not columna_fecha or columna_fecha not in df.columns:
+        return {SIN_FECHA: df}
+    fechas = pd.to_datetime(df[columna_fecha], errors='coerce', utc=True)
+    meses = fechas.dt.strftime('%Y-%m').fillna(SIN_FECHA)
+    return dict(tuple(df.groupby(meses, sort=False)))
+
+class _EscritorParquet:
+    """Un archivo Parquet por partición; el esquema se fija con la primera página"""
+
+    def __init__(self, compresion):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._pa = pa
+        self._pq = pq
+        self.compresion = compresion or 'zstd'
+        self.esquema = None
+        self.extension = 'parquet'
+
+    def _fijar_esquema(self, df):
+        tabla = self._pa.Table.from_pandas(df, preserve_index=False)
+        # Columnas vacías en la primera página: se tratan como texto
+        campos = [
+            self._pa.field(c.name, self._pa.string()) if self._pa.types.is_null(c.type) else c
+            for c in tabla.schema
+        ]
+        self.esquema = self._pa.schema(campos)
+
+    def _a_tabla(self, df):
+        df = df.reindex(columns=self.esquema.names)
+        for campo in self.esquema:
+            if self._pa.types.is_string(campo.type):
+                serie = df[campo.name]
+                df[campo.name] = serie.where(serie.isna(), serie.astype(str))
+        return self._pa.Table.from_pandas(df, schema=self.esquema, preserve_index=False, safe=False)
+
+    def abrir(self, ruta):
+        return {'ruta': ruta, 'writer': None}
+
+    def escribir(self, archivo, df):
+        if self.esquema is None:
+            self._fijar_esquema(df)
+        tabla = self._a_tabla(df)
+        if archivo['writer'] is None:
+            archivo['writer'] = self._pq.ParquetWriter(archivo['ruta'], self.esquema, compression=self.compresion)
+        archivo['writer'].write_table(tabla)
+
+    def cerrar(self, archivo):
+        if archivo['writer'] is not None:
+            archivo['writer'].close()
+
+class _EscritorCSV:
+    """Un CSV por partición (gzip por defecto), escrito por bloques"""
+
+    def __init__(self, compresion):
+        self.compresion = None if compresion in (None, 'none') else compresion
+        self.columnas = None
+        self.extension = 'csv.gz' if self.compresion == 'gzip' else 'csv'
+
+    def abrir(self, ruta):
+        if self.compresion == 'gzip':
+            manejador = gzip.open(ruta, 'wt', encoding='utf-8', newline='')
+        else:
+            manejador = open(ruta, 'w', encoding='utf-8', newline='')
+        return {'ruta': ruta, 'manejador': manejador, 'encabezado': True}
+
+    def escribir(self, archivo, df):
+        if self.columnas is None:
+            self.columnas = list(df.columns)
+        df.reindex(columns=self.columnas).to_csv(archivo['manejador'], header=archivo['encabezado'], index=False)
+        archivo['encabezado'] = False
+
+    def cerrar(self, archivo):
+        archivo['manejador'].close()
+
+def exportar_tabla(tabla, directorio, formato='parquet', compresion=None, desde=None, hasta=None,
+                   particionar=True, tamano_pagina=1000):
+    """
+    Exporta una tabla completa página por página, sin cargarla en memoria.
+
+    Estructura de salida (particionado estilo Hive por mes):
+        <directorio>/<tabla>/mes=2024-01/part-00000.parquet
+
+    Args:
+        tabla: Nombre de la tabla (clave de TABLAS_EXPORTACION)
+        directorio: Carpeta de salida
+        formato: 'parquet' o 'csv'
+        compresion: Parquet: 'zstd' (defecto), 'snappy', 'gzip'...; CSV: 'gzip' (defecto) o 'none'
+        desde, hasta: Rango opcional sobre la columna de fecha de la tabla
+        particionar: Un archivo por mes de la columna de fecha
+        tamano_pagina: Filas por petición a Supabase
+
+    Returns:
+        Dict {'tabla', 'filas', 'archivos'}
+    """
+    if formato not in FORMATOS_EXPORTACION:
+        raise ValueError(f"Formato no soportado: {formato}")
+    if formato == 'parquet':
+        escritor = _EscritorParquet(compresion)
+    else:
+        escritor = _EscritorCSV(compresion or 'gzip')
+
+    columna_fecha = TABLAS_EXPORTACION[tabla]['fecha'] if particionar else None
+    abiertos = {}
+    archivos = 0
+    filas = 0
+
+    try:
+        for pagina in leer_paginado(_consulta_tabla(tabla, desde, hasta), tamano_pagina):
+            df = aplanar_pagina(tabla, pagina)
+            for particion, bloque in _particiones(df, columna_fecha).items():
+                if abiertos.get(particion) is None:
+                    carpeta = os.path.join(directorio, tabla, f"mes={particion}") if columna_fecha else os.path.join(directorio, tabla)
+                    os.makedirs(carpeta, exist_ok=True)
+                    abiertos[particion] = escritor.abrir(
+                        os.path.join(carpeta, f"part-{archivos:05d}.{escritor.extension}")
+                    )
+                    archivos += 1
+                escritor.escribir(abiertos[particion], bloque)
+            filas += len(df)
+
+            # Las páginas vienen ordenadas por fecha: los meses anteriores ya no
+            # reciben filas y se cierran para no acumular archivos abiertos
+            if columna_fecha:
+                actuales = set(_particiones(df.tail(1), columna_fecha)) | {SIN_FECHA}
+                for particion in [p for p, a in abiertos.items() if a is not None and p not in actuales]:
+                    escritor.cerrar(abiertos[particion])
+                    abiertos[particion] = None
+    finally:
+        for archivo in abiertos.values():
+            if archivo is not None:
+                escritor.cerrar(archivo)
+
+    return {'tabla': tabla, 'filas': filas, 'archivos': archivos}
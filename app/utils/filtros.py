@@ -0,0 +1,50 @@
+import json
+from datetime import date, datetime
+
+def normalizar_filtros(filtros):
+    """
+    Forma canónica de un dict de filtros, para usarla como clave de caché.
+
+    Las listas se ordenan (el orden de selección en un multiselect no cambia
+    el resultado), las fechas pasan a ISO y las listas vacías a None.
+    """
+    normalizados = {}
+    for clave, valor in sorted((filtros or {}).items()):
+        if isinstance(valor, (list, tuple, set)):
+            valor = sorted(str(v) for v in valor) or None
+        elif isinstance(valor, (datetime, date)):
+            valor = valor.isoformat()
+        normalizados[clave] = valor
+    return normalizados
+
+def clave_filtros(filtros):
+    """Texto estable (JSON ordenado) de los filtros normalizados"""
+    return json.dumps(normalizar_filtros(filtros), sort_keys=True, ensure_ascii=False, default=str)
+
+def filtros_de_carga(filtros, campos, areas_disponibles=None):
+    """
+    Filtros canónicos de un cargador cacheado: dos selecciones que traen los
+    mismos datos dan el mismo dict (y la misma clave con clave_filtros).
+
+    Args:
+        filtros: Filtros tal como salen de la barra lateral
+        campos: Filtros que usa el cargador (los demás no entran en la clave)
+        areas_disponibles: Todas las áreas; si se eligieron todas, 'areas'
+            pasa a [] (sin filtro, igual que no elegir ninguna)
+
+    Returns:
+        Dict con las fechas como date (sin hora), las listas ordenadas y sin
+        repetidos, y los campos que faltan como None
+    """
+    canonicos = {}
+    for campo in campos:
+        valor = (filtros or {}).get(campo)
+        if isinstance(valor, datetime):
+            valor = valor.date()
+        elif isinstance(valor, (list, tuple, set)):
+            valor = sorted(set(valor), key=str)
+        canonicos[campo] = valor
+    areas = canonicos.get('areas')
+    if areas and areas_disponibles and set(areas) >= set(areas_disponibles):
+        canonicos['areas'] = []
+    return canonicos
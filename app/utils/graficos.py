@@ -0,0 +1,154 @@
+import os
+import hashlib
+import tempfile
+import threading
+import plotly.io as pio
+import plotly.graph_objects as go
+
+DIRECTORIO_CACHE = os.path.join(tempfile.gettempdir(), 'sst_graficos')
+TAMANO_MAXIMO_CACHE = 200 * 1024 * 1024  # 200 MB
+
+_lock_kaleido = threading.Lock()
+_kaleido_caliente = False
+
+def calentar_kaleido():
+    """
+    Arrancar el proceso de kaleido del proceso actual.
+
+    Kaleido mantiene un subproceso de Chromium vivo entre llamadas; el costo
+    está en el primer render, así que se paga una sola vez (al iniciar el
+    worker de reportes) y no dentro de la generación del PDF.
+    """
+    global _kaleido_caliente
+    with _lock_kaleido:
+        if _kaleido_caliente:
+            return
+        try:
+            pio.to_image(go.Figure(), format='png', width=10, height=10, engine='kaleido')
+            _kaleido_caliente = True
+        except Exception:
+            pass
+
+def _clave_figura(fig, width, height):
+    """Hash del contenido de la figura (datos + layout) y del tamaño de salida"""
+    contenido = fig.to_json() if hasattr(fig, 'to_json') else pio.to_json(fig)
+    return hashlib.sha256(f"{width}x{height}|{contenido}".encode('utf-8')).hexdigest()
+
+def _ruta_cache(clave):
+    return os.path.join(DIRECTORIO_CACHE, f"{clave}.png")
+
+def _leer_cache(clave):
+    ruta = _ruta_cache(clave)
+    try:
+        with open(ruta, 'rb') as f:
+            datos = f.read()
+        os.utime(ruta)  # Marca de uso para la política LRU
+        return datos
+    except OSError:
+        return None
+
+def _escribir_cache(clave, datos):
+    os.makedirs(DIRECTORIO_CACHE, exist_ok=True)
+    ruta = _ruta_cache(clave)
+    temporal = f"{ruta}.{os.getpid()}.tmp"
+    with open(temporal, 'wb') as f:
+        f.write(datos)
+    os.replace(temporal, ruta)  # Escritura atómica: seguro entre procesos
+
+def _desalojar_cache():
+    """Eliminar los PNG menos usados hasta quedar bajo TAMANO_MAXIMO_CACHE"""
+    try:
+        entradas = [e for e in os.scandir(DIRECTORIO_CACHE) if e.name.endswith('.png')]
+    except OSError:
+        return
+    entradas = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entradas))
+    total = sum(tamano for _, tamano, _ in entradas)
+    for _, tamano, ruta in entradas:
+        if total <= TAMANO_MAXIMO_CACHE:
+            break
+        try:
+            os.remove(ruta)
+            total -= tamano
+        except OSError:
+            pass
+
+def _renderizar_png(fig, width, height):
+    """Render con kaleido; None si no hay motor disponible"""
+    calentar_kaleido()
+    try:
+        return pio.to_image(fig, format='png', width=width, height=height, engine='kaleido')
+    except Exception:
+        # Si kaleido no está disponible, intentar sin especificar engine
+        try:
+            return pio.to_image(fig, format='png', width=width, height=height)
+        except Exception:
+            return None
+
+def _renderizar_en_proceso(fig_dict, width, height):
+    """Render de una figura serializada dentro de un proceso del pool"""
+    return _renderizar_png(fig_dict, width, height)
+
+def _renderizar_lote(pendientes, pool=None):
+    """
+    Renderizar {clave: (fig, width, height)}. Con `pool` (un pool de procesos
+    con kaleido caliente, p. ej. el de ColaReportes) cada figura se renderiza
+    en un worker distinto; sin pool, una tras otra en el proceso actual.
+    """
+    if pool is not None and len(pendientes) > 1:
+        try:
+            futures = {
+                clave: pool.submit(_renderizar_en_proceso, fig.to_dict() if hasattr(fig, 'to_dict') else fig, width, height)
+                for clave, (fig, width, height) in pendientes.items()
+            }
+            resultados = {}
+            for clave, future in futures.items():
+                try:
+                    resultados[clave] = future.result(timeout=120)
+                except Exception:
+                    resultados[clave] = None
+            return resultados
+        except Exception:
+            pass  # Pool cerrado o roto: render secuencial
+
+    return {
+        clave: _renderizar_png(fig, width, height)
+        for clave, (fig, width, height) in pendientes.items()
+    }
+
+def renderizar_figuras(figuras, pool=None):
+    """
+    Renderizar en una sola llamada todas las figuras que necesita un reporte.
+
+    Las figuras con el mismo contenido y tamaño se sirven desde la caché en
+    disco (clave = hash del JSON de la figura) y se renderizan una sola vez
+    aunque aparezcan repetidas en el lote.
+
+    Args:
+        figuras: Lista de tuplas (fig, width, height)
+        pool: Pool de procesos donde renderizar en paralelo las figuras que
+            no están en caché; None = una tras otra en este proceso
+
+    Returns:
+        Lista de bytes PNG (o None si la figura no se pudo renderizar), en el
+        mismo orden que `figuras`
+    """
+    claves = [_clave_figura(fig, width, height) for fig, width, height in figuras]
+    resultados = {}
+    pendientes = {}
+
+    for clave, figura in zip(claves, figuras):
+        if clave in resultados or clave in pendientes:
+            continue
+        datos = _leer_cache(clave)
+        if datos is None:
+            pendientes[clave] = figura
+        else:
+            resultados[clave] = datos
+
+    for clave, datos in _renderizar_lote(pendientes, pool).items():
+        if datos is not None:
+            _escribir_cache(clave, datos)
+        resultados[clave] = datos
+
+    _desalojar_cache()
+    return [resultados[clave] for clave in claves]
@@ -0,0 +1,149 @@
+import unicodedata
+import pandas as pd
+from openpyxl import load_workbook
+
+def normalizar_texto(valor):
+    """Normaliza un texto para comparaciones (sin tildes, minúsculas, espacios simples)"""
+    if valor is None:
+        return ''
+    texto = unicodedata.normalize('NFKD', str(valor))
+    texto = texto.encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(texto.casefold().split())
+
+def normalizar_serie(serie):
+    """Versión vectorizada de normalizar_texto para una columna de pandas"""
+    return (
+        serie.fillna('').astype(str)
+        .str.normalize('NFKD')
+        .str.encode('ascii', 'ignore').str.decode('ascii')
+        .str.casefold()
+        .str.split().str.join(' ')
+    )
+
+def leer_archivo_en_bloques(archivo, tamano_bloque=2000):
+    """
+    Lee un archivo Excel o CSV por bloques sin cargarlo completo en memoria.
+
+    Los Excel se abren con openpyxl en modo read-only (lectura en streaming)
+    y los CSV con el lector por chunks de pandas. Todas las columnas se leen
+    como texto; la conversión de tipos la hace cada importador.
+
+    Args:
+        archivo: Archivo de Streamlit (st.file_uploader) o ruta en disco
+        tamano_bloque: Número de filas por bloque
+
+    Yields:
+        DataFrame por bloque, con el índice igual al número de fila del archivo
+    """
+    nombre = getattr(archivo, 'name', str(archivo)).lower()
+
+    if nombre.endswith('.csv'):
+        fila_inicial = 2  # La fila 1 es el encabezado
+        for bloque in pd.read_csv(archivo, chunksize=tamano_bloque, dtype=str, keep_default_na=False):
+            bloque.index = range(fila_inicial, fila_inicial + len(bloque))
+            fila_inicial += len(bloque)
+            yield bloque
+        return
+
+    libro = load_workbook(archivo, read_only=True, data_only=True)
+    try:
+        hoja = libro.active
+        filas = hoja.iter_rows(values_only=True)
+        encabezado = next(filas, None)
+        if not encabezado:
+            return
+        # Las celdas vacías al final del encabezado no son columnas de la matriz
+        encabezado = list(encabezado)
+        while encabezado and (encabezado[-1] is None or str(encabezado[-1]).strip() == ''):
+            encabezado.pop()
+        if not encabezado:
+            return
+        columnas = [str(c).strip() if c is not None else f'col_{i}' for i, c in enumerate(encabezado)]
+
+        buffer, numeros = [], []
+        for numero, fila in enumerate(filas, start=2):
+            # Saltar filas completamente vacías (comunes al final de las matrices)
+            if all(celda is None or str(celda).strip() == '' for celda in fila):
+                continue
+            # Filas cortas o irregulares: completar o recortar al ancho del encabezado
+            valores = ['' if celda is None else str(celda) for celda in fila][:len(columnas)]
+            buffer.append(valores + [''] * (len(columnas) - len(valores)))
+            numeros.append(numero)
+            if len(buffer) >= tamano_bloque:
+                yield pd.DataFrame(buffer, columns=columnas, index=numeros)
+                buffer, numeros = [], []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=columnas, index=numeros)
+    finally:
+        libro.close()
+
+def renombrar_columnas(df, alias):
+    """
+    Renombra las columnas de un archivo importado a los nombres de la BD.
+
+    Args:
+        df: DataFrame leído del archivo
+        alias: Dict {columna_bd: [encabezados aceptados]}
+
+    Returns:
+        DataFrame con las columnas reconocidas renombradas
+    """
+    mapa = {}
+    for columna_bd, opciones in alias.items():
+        aceptados = {normalizar_texto(o) for o in [columna_bd, *opciones]}
+        for columna in df.columns:
+            if normalizar_texto(columna) in aceptados and columna not in mapa:
+                mapa[columna] = columna_bd
+                break
+    return df.rename(columns=mapa)
+
+def insertar_en_lotes(tabla, registros, tamano_lote=500, on_conflict=None):
+    """
+    Inserta registros en lotes, con reporte de errores a nivel de fila.
+
+    Cada lote se envía en una sola petición. Si un lote falla, se reintenta
+    fila por fila para identificar exactamente qué registros son inválidos.
+
+    Args:
+        tabla: Nombre de la tabla en Supabase
+        registros: Lista de dicts; la clave opcional '_fila' identifica la fila de origen
+        tamano_lote: Cantidad de registros por petición
+        on_conflict: Columnas de la restricción única para hacer upsert
+            (p. ej. 'periodo,area'); None = insert
+
+    Returns:
+        Tupla (insertados, errores): filas devueltas por la BD y lista de
+        dicts {'fila', 'error'}
+    """
+    from app.utils.supabase_client import get_supabase_client
+
+    supabase = get_supabase_client()
+    insertados = []
+
+    def enviar(datos):
+        if on_conflict:
+            return supabase.table(tabla).upsert(datos, on_conflict=on_conflict).execute()
+        return supabase.table(tabla).insert(datos).execute()
+    errores = []
+
+    for inicio in range(0, len(registros), tamano_lote):
+        lote = registros[inicio:inicio + tamano_lote]
+        filas = [r.get('_fila') for r in lote]
+        payload = [{k: v for k, v in r.items() if k != '_fila'} for r in lote]
+
+        try:
+            response = enviar(payload)
+            insertados.extend(response.data or [])
+            continue
+        except Exception:
+            pass
+
+        # El lote falló completo: aislar las filas con error
+        for fila, registro in zip(filas, payload):
+            try:
+                response = enviar(registro)
+                insertados.extend(response.data or [])
+            except Exception as e:
+                errores.append({'fila': fila, 'error': str(e)})
+
+    return insertados, errores
@@ -0,0 +1,71 @@
+from datetime import date
+import pandas as pd
+from app.utils.supabase_client import get_supabase_client, leer_paginado
+from app.utils.importacion_helper import insertar_en_lotes
+from app.analytics.indicadores import accidentes_mensuales, calcular_indicadores, COLUMNAS_INDICADORES
+
+def leer_horas_hombre():
+    """Todas las filas de horas_hombre (una por área y mes)"""
+    supabase = get_supabase_client()
+    filas = [
+        fila
+        for pagina in leer_paginado(lambda: supabase.table('horas_hombre').select(
+            'id, periodo, area, trabajadores, horas_trabajadas, dias_perdidos'
+        ).order('id'))
+        for fila in pagina
+    ]
+    return pd.DataFrame(filas)
+
+def leer_accidentes():
+    """Fecha y área de todos los accidentes registrados"""
+    supabase = get_supabase_client()
+    filas = [
+        fila
+        for pagina in leer_paginado(lambda: supabase.table('incidentes').select(
+            'id, fecha_hora, area, tipo'
+        ).eq('tipo', 'accidente').order('id'))
+        for fila in pagina
+    ]
+    return pd.DataFrame(filas)
+
+def recalcular_indicadores():
+    """
+    Recalcula y guarda en indicadores_sst los indicadores mensuales y de 12
+    meses de todas las áreas. Se ejecuta al importar horas hombre y a diario
+    con scripts/recalcular_indicadores.py (los accidentes cambian a diario).
+
+    Returns:
+        Tupla (filas guardadas, errores)
+    """
+    indicadores = calcular_indicadores(leer_horas_hombre(), accidentes_mensuales(leer_accidentes()))
+    if indicadores.empty:
+        return 0, []
+    indicadores['periodo'] = indicadores['periodo'].dt.strftime('%Y-%m-%d')
+    indicadores = indicadores.round(4).astype(object).where(indicadores.notna(), None)
+    guardados, errores = insertar_en_lotes(
+        'indicadores_sst', indicadores.to_dict('records'), on_conflict='periodo,area,ventana'
+    )
+    return len(guardados), errores
+
+def leer_indicadores(fecha_inicio, fecha_fin):
+    """
+    Indicadores precalculados (todas las áreas y ventanas) de los meses que
+    tocan el período.
+
+    Returns:
+        DataFrame con COLUMNAS_INDICADORES (vacío si no hay datos)
+    """
+    supabase = get_supabase_client()
+    desde = date(fecha_inicio.year, fecha_inicio.month, 1).isoformat()
+    filas = [
+        fila
+        for pagina in leer_paginado(lambda: supabase.table('indicadores_sst').select(
+            ', '.join(COLUMNAS_INDICADORES)
+        ).gte('periodo', desde).lte('periodo', str(fecha_fin)).order('periodo').order('area').order('ventana'))
+        for fila in pagina
+    ]
+    if not filas:
+        return pd.DataFrame(columns=COLUMNAS_INDICADORES)
+    df = pd.DataFrame(filas)
+    df['periodo'] = pd.to_datetime(df['periodo'])
+    return df
@@ -0,0 +1,93 @@
+import json
+import pandas as pd
+from app.utils.esquemas import sin_categorias_vacias
+
+# Columna de área de cada tabla; las tablas sin área se comparten entre todas las partes
+#   epp: área del trabajador (relación usuarios, aplanada por aplicar_esquema)
+#   capacitaciones: area_destino es una lista JSON; la capacitación va a cada área
+COLUMNAS_AREA = {
+    'incidentes': 'area',
+    'resumen_incidentes': 'area',
+    'riesgos': 'area',
+    'inspecciones': 'area',
+    'epp': 'area',
+    'capacitaciones': 'area_destino'
+}
+
+# Filas sin área (nulo o texto vacío) en cualquier tabla
+SIN_AREA = 'Sin área'
+
+def areas_destino(valor):
+    """Lista de áreas de una capacitación: lista JSON, lista o un área suelta"""
+    if isinstance(valor, (list, tuple)):
+        return [str(a) for a in valor if a]
+    if valor is None or (isinstance(valor, float) and pd.isna(valor)):
+        return []
+    texto = str(valor).strip()
+    try:
+        decodificado = json.loads(texto)
+    except ValueError:
+        return [texto] if texto else []
+    if isinstance(decodificado, list):
+        return [str(a) for a in decodificado if a]
+    return [str(decodificado)] if decodificado else []
+
+def _claves_area(df, columna):
+    """
+    DataFrame y área de cada fila (SIN_AREA si no tiene); las capacitaciones
+    se repiten una vez por área destino.
+    """
+    if columna == 'area_destino':
+        listas = df[columna].astype(object).map(areas_destino)
+        listas = listas.map(lambda areas: areas or [SIN_AREA])
+        df = df.assign(_area=listas).explode('_area')
+        return df.drop(columns='_area'), df['_area'].to_numpy(dtype=object)
+
+    valores = df[columna].astype(object)
+    vacios = valores.isna() | (valores.astype(str).str.strip() == '')
+    return df, valores.where(~vacios, SIN_AREA).to_numpy(dtype=object)
+
+def particionar_por_area(data, areas=None):
+    """
+    Dividir los datos ya cargados en un conjunto por área (un solo groupby por tabla).
+
+    Los hallazgos se asignan al área de su inspección y las asignaciones de
+    EPP al área del trabajador. Las filas sin área van a la parte SIN_AREA,
+    así ninguna queda fuera del lote. Las tablas sin columna de área
+    (documentos, indicadores) se incluyen completas en cada parte.
+
+    Args:
+        data: Dict de DataFrames de consultar_datos_reporte
+        areas: Áreas a generar; por defecto todas las que aparecen en los datos
+
+    Returns:
+        Dict {area: data de esa área}
+    """
+    grupos = {}
+    for tabla, columna in COLUMNAS_AREA.items():
+        df = data.get(tabla)
+        if df is not None and not df.empty and columna in df.columns:
+            df, claves = _claves_area(df, columna)
+            grupos[tabla] = dict(tuple(df.groupby(claves, sort=False)))
+
+    hallazgos = data.get('hallazgos')
+    if hallazgos is not None and not hallazgos.empty and 'inspeccion_id' in hallazgos.columns:
+        area_inspeccion = pd.Series(dtype=object)
+        inspecciones = data.get('inspecciones')
+        if inspecciones is not None and not inspecciones.empty and {'id', 'area'} <= set(inspecciones.columns):
+            inspecciones, claves = _claves_area(inspecciones, 'area')
+            area_inspeccion = pd.Series(claves, index=inspecciones['id'].to_numpy())
+            area_inspeccion = area_inspeccion[~area_inspeccion.index.duplicated()]
+        claves = hallazgos['inspeccion_id'].map(area_inspeccion).fillna(SIN_AREA).to_numpy(dtype=object)
+        grupos['hallazgos'] = dict(tuple(hallazgos.groupby(claves, sort=False)))
+
+    if areas is None:
+        areas = sorted(set().union(*[g.keys() for g in grupos.values()])) if grupos else []
+
+    return {
+        area: {
+            tabla: sin_categorias_vacias(grupos[tabla].get(area, df.iloc[0:0])) if tabla in grupos else df
+            for tabla, df in data.items()
+        }
+        for area in areas
+    }
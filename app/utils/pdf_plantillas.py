@@ -0,0 +1,183 @@
+"""
+Plantillas de los reportes PDF: estilos, estilos de tabla, encabezado/pie de
+página y constructores de secciones fijas.
+
+Todo lo que no depende de los datos se crea una sola vez por proceso; cada
+reporte solo arma las filas con sus valores.
+"""
+from datetime import datetime
+from functools import lru_cache
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle
+
+AZUL_OSCURO = colors.HexColor('#1e3a8a')
+AZUL = colors.HexColor('#2563eb')
+GRIS = colors.HexColor('#6c757d')
+GRIS_CLARO = colors.HexColor('#f8f9fa')
+BORDE = colors.HexColor('#dee2e6')
+
+@lru_cache(maxsize=1)
+def obtener_estilos():
+    """Estilos de párrafo del reporte (normal, titulo, encabezado, subencabezado, pie)"""
+    base = getSampleStyleSheet()
+    normal = base['Normal']
+    return {
+        'normal': normal,
+        'heading2': base['Heading2'],
+        'titulo': ParagraphStyle(
+            'CustomTitle',
+            parent=base['Title'],
+            fontSize=24,
+            alignment=1,  # Center
+            textColor=AZUL_OSCURO,
+            spaceAfter=30
+        ),
+        'encabezado': ParagraphStyle(
+            'CustomHeading',
+            parent=base['Heading1'],
+            fontSize=16,
+            textColor=AZUL_OSCURO,
+            spaceAfter=12,
+            spaceBefore=20
+        ),
+        'subencabezado': ParagraphStyle(
+            'CustomSubHeading',
+            parent=base['Heading2'],
+            fontSize=14,
+            textColor=AZUL,
+            spaceAfter=8,
+            spaceBefore=12
+        )
+    }
+
+# Estilos de tabla compartidos (TableStyle es de solo lectura para Table.setStyle)
+ESTILO_KPI = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), AZUL_OSCURO),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0,0), (-1,0), 11),
+    ('BOTTOMPADDING', (0,0), (-1,0), 12),
+    ('BACKGROUND', (0,1), (-1,-1), GRIS_CLARO),
+    ('GRID', (0,0), (-1,-1), 1, BORDE),
+    ('FONTSIZE', (0,1), (-1,-1), 9)
+])
+
+ESTILO_RESUMEN = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), GRIS),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('GRID', (0,0), (-1,-1), 1, BORDE),
+    ('FONTSIZE', (0,0), (-1,-1), 9)
+])
+
+ESTILO_MATRIZ = TableStyle(ESTILO_RESUMEN.getCommands() + [
+    ('BACKGROUND', (0,0), (0,-1), GRIS),
+    ('TEXTCOLOR', (0,0), (0,-1), colors.whitesmoke)
+])
+
+ESTILO_INDICADORES = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), AZUL_OSCURO),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+    ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0,0), (-1,0), 10),
+    ('BOTTOMPADDING', (0,0), (-1,0), 10),
+    ('BACKGROUND', (0,1), (-1,-1), GRIS_CLARO),
+    ('GRID', (0,0), (-1,-1), 1, BORDE),
+    ('FONTSIZE', (0,1), (-1,-1), 8),
+    ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, GRIS_CLARO])
+])
+
+ESTILO_REQUISITOS = TableStyle([
+    ('BACKGROUND', (0,0), (-1,0), AZUL),
+    ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+    ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+    ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+    ('FONTSIZE', (0,0), (-1,0), 10),
+    ('BOTTOMPADDING', (0,0), (-1,0), 10),
+    ('BACKGROUND', (0,1), (-1,-1), GRIS_CLARO),
+    ('GRID', (0,0), (-1,-1), 1, BORDE),
+    ('FONTSIZE', (0,1), (-1,-1), 9)
+])
+
+ANCHOS_KPI = [200, 100, 200]
+ANCHOS_INDICADORES = [150, 80, 100, 100, 70]
+ANCHOS_REQUISITOS = [100, 200, 200]
+
+# Requisitos de la Ley 29783 verificados en el reporte: (artículo, requisito, tabla de datos)
+REQUISITOS_LEY = [
+    ('Art. 24', 'Registros documentados', 'documentos'),
+    ('Art. 26-28', 'Evaluación de riesgos', 'riesgos'),
+    ('Art. 29', 'Gestión EPP', 'epp'),
+    ('Art. 31', 'Capacitaciones registradas', 'capacitaciones'),
+    ('Art. 33-34', 'Sistema de incidentes', 'incidentes')
+]
+
+def _dibujar_encabezado_pie(canvas, doc):
+    """Encabezado y pie de cada página: sistema, fecha de generación y número de página"""
+    ancho, alto = doc.pagesize
+    canvas.saveState()
+    canvas.setFont('Helvetica', 8)
+    canvas.setFillColor(GRIS)
+    canvas.drawString(doc.leftMargin, alto - 30, "Sistema de Gestión SST - Ley 29783")
+    canvas.drawRightString(ancho - doc.rightMargin, alto - 30, doc.generado_el)
+    canvas.setStrokeColor(BORDE)
+    canvas.line(doc.leftMargin, 40, ancho - doc.rightMargin, 40)
+    canvas.drawCentredString(ancho / 2, 28, f"Página {doc.page}")
+    canvas.restoreState()
+
+def crear_documento(output):
+    """Documento A4 con la plantilla de página del sistema"""
+    doc = SimpleDocTemplate(output, pagesize=A4)
+    doc.generado_el = datetime.now().strftime('%d/%m/%Y %H:%M')
+    return doc
+
+def construir_documento(doc, elementos):
+    """Generar el PDF aplicando encabezado y pie en todas las páginas"""
+    doc.build(elementos, onFirstPage=_dibujar_encabezado_pie, onLaterPages=_dibujar_encabezado_pie)
+
+def tabla(filas, anchos, estilo=ESTILO_RESUMEN):
+    """Tabla con un estilo ya compilado"""
+    t = Table(filas, colWidths=anchos)
+    t.setStyle(estilo)
+    return t
+
+def seccion_kpis(kpis):
+    """Tabla de KPIs: lista de (métrica, valor, interpretación)"""
+    filas = [['Métrica', 'Valor', 'Interpretación']] + [[m, str(v), i] for m, v, i in kpis]
+    return tabla(filas, ANCHOS_KPI, ESTILO_KPI)
+
+def seccion_indicadores_legales(indicadores):
+    """
+    Tabla de indicadores obligatorios con su meta legal.
+
+    Args:
+        indicadores: Dict con tasa_frecuencia, tasa_severidad, indice_incidencia,
+            accidentes, incidentes y enfermedades
+    """
+    tf = indicadores['tasa_frecuencia']
+    ts = indicadores['tasa_severidad']
+    ii = indicadores['indice_incidencia']
+    accidentes = indicadores['accidentes']
+    filas = [
+        ['Indicador', 'Valor', 'Unidad', 'Meta Legal', 'Cumple'],
+        ['Tasa de Frecuencia', f"{tf:.2f}", 'accidents/1Mh-h', '< 5.0', '✅' if tf < 5 else '❌'],
+        ['Tasa de Severidad', f"{ts:.2f}", 'días/1Mh-h', '< 100', '✅' if ts < 100 else '❌'],
+        ['Índice de Incidencia', f"{ii:.2f}", '%', '< 1.0', '✅' if ii < 1 else '❌'],
+        ['N° Accidentes', str(accidentes), 'eventos', '0', '✅' if accidentes == 0 else '❌'],
+        ['N° Incidentes', str(indicadores['incidentes']), 'eventos', 'No especificado', '-'],
+        ['N° Enfermedades Laborales', str(indicadores['enfermedades']), 'eventos', 'No especificado', '-']
+    ]
+    return tabla(filas, ANCHOS_INDICADORES, ESTILO_INDICADORES)
+
+def seccion_requisitos(data):
+    """Tabla de cumplimiento de los artículos de la Ley 29783 según haya registros"""
+    filas = [['Artículo', 'Requisito', 'Estado']] + [
+        [articulo, requisito, '✅ Cumplido' if len(data[clave]) > 0 else '⚠️ Pendiente']
+        for articulo, requisito, clave in REQUISITOS_LEY
+    ]
+    return tabla(filas, ANCHOS_REQUISITOS, ESTILO_REQUISITOS)
@@ -0,0 +1,103 @@
+from functools import lru_cache
+import pandas as pd
+from reportlab.lib import colors
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.platypus import LongTable, TableStyle, Paragraph
+
+FILAS_POR_SEGMENTO = 500
+# Tope de filas de un listado en el PDF: los segmentos viven en memoria hasta
+# doc.build, así que el costo crece con las filas incluidas. El listado
+# completo va en el Excel.
+MAXIMO_FILAS_PDF = 5000
+LARGO_MAXIMO_CELDA = 50
+ANCHO_UTIL = 500  # Puntos disponibles en A4 con los márgenes por defecto
+
+@lru_cache(maxsize=None)
+def estilo_tabla_datos(color_encabezado='#6c757d'):
+    """Estilo común de las tablas de listados (encabezado oscuro y filas alternadas), uno por color"""
+    return TableStyle([
+        ('BACKGROUND', (0,0), (-1,0), colors.HexColor(color_encabezado)),
+        ('TEXTCOLOR', (0,0), (-1,0), colors.whitesmoke),
+        ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,0), (-1,0), 9),
+        ('BOTTOMPADDING', (0,0), (-1,0), 8),
+        ('GRID', (0,0), (-1,-1), 1, colors.HexColor('#dee2e6')),
+        ('FONTSIZE', (0,1), (-1,-1), 8),
+        ('ROWBACKGROUNDS', (0,1), (-1,-1), [colors.white, colors.HexColor('#f8f9fa')])
+    ])
+
+def calcular_anchos_columnas(df, columnas, ancho_total=ANCHO_UTIL, largo_maximo=LARGO_MAXIMO_CELDA, muestra=200):
+    """
+    Anchos de columna proporcionales al largo típico del texto.
+
+    Se calculan una sola vez sobre una muestra de filas, para que todos los
+    segmentos de la tabla compartan el mismo layout.
+    """
+    muestra_df = df[columnas].head(muestra)
+    pesos = []
+    for columna in columnas:
+        largo = muestra_df[columna].astype(str).str.len().clip(upper=largo_maximo).mean() if len(muestra_df) else 0
+        pesos.append(max(len(str(columna)), largo, 4))
+    total = sum(pesos)
+    return [ancho_total * peso / total for peso in pesos]
+
+def _texto_celdas(bloque, largo_maximo):
+    """Convierte un bloque a listas de texto, truncando celdas largas (vectorizado por columna)"""
+    columnas = []
+    for columna in bloque.columns:
+        serie = bloque[columna]
+        if isinstance(serie.dtype, pd.ArrowDtype):
+            # Columnas pyarrow (SST_BACKEND_ARROW): vacíos como en las de object
+            serie = serie.astype(object).where(serie.notna(), None)
+        serie = serie.astype(str)
+        largas = serie.str.len() > largo_maximo
+        if largas.any():
+            serie = serie.where(~largas, serie.str[:largo_maximo - 3] + "...")
+        columnas.append(serie.tolist())
+    return [list(fila) for fila in zip(*columnas)]
+
+def tabla_paginada(df, columnas, color_encabezado='#6c757d', ancho_total=ANCHO_UTIL,
+                   filas_por_segmento=FILAS_POR_SEGMENTO, largo_maximo=LARGO_MAXIMO_CELDA,
+                   maximo_filas=MAXIMO_FILAS_PDF):
+    """
+    Genera un listado largo como segmentos LongTable con encabezado repetido.
+
+    Las filas se convierten a texto por bloques de `filas_por_segmento`, de
+    modo que ReportLab parte tablas de tamaño acotado en lugar de una sola
+    tabla gigante. Los segmentos que se agregan al documento quedan en
+    memoria hasta doc.build: la memoria crece con las filas incluidas, por eso
+    el listado se corta en `maximo_filas` y se agrega una nota que remite al
+    Excel.
+
+    Args:
+        df: DataFrame con los datos
+        columnas: Columnas a incluir (en orden)
+        color_encabezado: Color hexadecimal de la fila de encabezado
+        ancho_total: Ancho total de la tabla en puntos
+        filas_por_segmento: Filas de datos por cada LongTable
+        largo_maximo: Caracteres máximos por celda
+        maximo_filas: Filas máximas del listado (None = sin tope)
+
+    Yields:
+        Flowables LongTable (y la nota de corte, si corresponde) listos para
+        agregar al documento
+    """
+    anchos = calcular_anchos_columnas(df, columnas, ancho_total, largo_maximo)
+    estilo = estilo_tabla_datos(color_encabezado)
+    encabezado = [str(c) for c in columnas]
+
+    total = len(df)
+    incluidas = total if maximo_filas is None else min(total, maximo_filas)
+
+    for inicio in range(0, incluidas, filas_por_segmento):
+        bloque = df[columnas].iloc[inicio:min(inicio + filas_por_segmento, incluidas)]
+        tabla = LongTable([encabezado] + _texto_celdas(bloque, largo_maximo), colWidths=anchos, repeatRows=1)
+        tabla.setStyle(estilo)
+        yield tabla
+
+    if incluidas < total:
+        yield Paragraph(
+            f"Se muestran {incluidas:,} de {total:,} filas. El listado completo está en el reporte Excel.",
+            getSampleStyleSheet()['Italic']
+        )
@@ -0,0 +1,58 @@
+import pandas as pd
+from app.utils.supabase_client import get_supabase_client, leer_paginado
+from app.analytics.tendencias import resumir_incidentes
+
+# Tablas de resumen diario (scripts/sql/resumenes_diarios.sql) y su clave primaria
+TABLAS_RESUMEN = {
+    'incidentes': ('resumen_incidentes_diario', ['dia', 'area', 'tipo', 'hora']),
+    'hallazgos': ('resumen_hallazgos_diario', ['dia', 'categoria', 'estado']),
+    'epp': ('resumen_epp_diario', ['dia', 'area', 'estado'])
+}
+
+def leer_resumen(nombre, fecha_inicio=None, fecha_fin=None, **filtros):
+    """
+    Filas de un resumen diario.
+
+    Args:
+        nombre: 'incidentes', 'hallazgos' o 'epp'
+        fecha_inicio, fecha_fin: Rango de días (inclusive)
+        **filtros: Columna=lista de valores permitidos (listas vacías se ignoran)
+
+    Returns:
+        DataFrame con 'dia' como datetime; lanza la excepción si la tabla no existe
+    """
+    tabla, clave = TABLAS_RESUMEN[nombre]
+    supabase = get_supabase_client()
+
+    def construir():
+        query = supabase.table(tabla).select('*').gt('cantidad', 0)
+        if fecha_inicio:
+            query = query.gte('dia', str(fecha_inicio))
+        if fecha_fin:
+            query = query.lte('dia', str(fecha_fin))
+        for columna, valores in filtros.items():
+            if valores:
+                query = query.in_(columna, list(valores))
+        for columna in clave:
+            query = query.order(columna)
+        return query
+
+    filas = [fila for pagina in leer_paginado(construir) for fila in pagina]
+    if not filas:
+        return pd.DataFrame(columns=clave + ['cantidad']).astype({'dia': 'datetime64[ns]', 'cantidad': int})
+    df = pd.DataFrame(filas)
+    df['dia'] = pd.to_datetime(df['dia'])
+    return df
+
+def cargar_resumen_incidentes(filtros, incidentes):
+    """
+    Resumen diario de incidentes del período; si la tabla de resumen no está
+    disponible se calcula con los incidentes ya cargados.
+    """
+    try:
+        return leer_resumen(
+            'incidentes', filtros['fecha_inicio'], filtros['fecha_fin'],
+            area=filtros.get('areas'), tipo=filtros.get('tipos_incidente')
+        )
+    except Exception:
+        return resumir_incidentes(incidentes)
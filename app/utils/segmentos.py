@@ -0,0 +1,93 @@
+import time
+import pandas as pd
+import streamlit as st
+from pandas.api.types import union_categoricals
+from app.utils.supabase_client import get_supabase_client, leer_paginado
+from app.utils.esquemas import aplicar_esquema, sin_categorias_vacias
+from app.analytics.indicadores import ZONA_HORARIA
+
+# Tablas que el dashboard carga por meses y su columna de fecha.
+#   marca: timestamptz -> el mes se corta en hora de Lima; si no, es date
+SEGMENTOS = {
+    'incidentes': {'columna': 'fecha_hora', 'marca': True},
+    'inspecciones': {'columna': 'fecha_programada', 'marca': False}
+}
+
+# Sin tabla de versiones los segmentos se renuevan cada 5 minutos, como antes
+SEGUNDOS_SIN_VERSION = 300
+
+def _limite(tabla, mes):
+    """Inicio de un mes como valor para filtrar la columna de fecha de la tabla"""
+    inicio = mes.start_time
+    if SEGMENTOS[tabla]['marca']:
+        return inicio.tz_localize(ZONA_HORARIA).isoformat()
+    return inicio.strftime('%Y-%m-%d')
+
+@st.cache_resource(ttl=3600, max_entries=240)
+def _leer_segmento(tabla, mes, version, posteriores=False):
+    """
+    Filas tipadas de un mes de la tabla (o, con posteriores, desde ese mes en
+    adelante). `version` solo forma parte de la clave: al cambiar la tabla se
+    lee de nuevo. Compartido y de solo lectura, como los conjuntos cargados.
+    """
+    supabase = get_supabase_client()
+    columna = SEGMENTOS[tabla]['columna']
+    mes = pd.Period(mes, freq='M')
+
+    def construir():
+        query = supabase.table(tabla).select('*').gte(columna, _limite(tabla, mes))
+        if not posteriores:
+            query = query.lt(columna, _limite(tabla, mes + 1))
+        return query.order('id')
+
+    filas = [fila for pagina in leer_paginado(construir) for fila in pagina]
+    return aplicar_esquema(tabla, filas)
+
+def _concatenar(partes):
+    """Une segmentos sin perder las categorías (cada mes trae las suyas)"""
+    for columna in partes[0].select_dtypes('category').columns:
+        con_columna = [p[columna] for p in partes if columna in p.columns]
+        if not all(isinstance(s.dtype, pd.CategoricalDtype) for s in con_columna):
+            continue
+        categorias = union_categoricals(con_columna).categories
+        partes = [
+            p.assign(**{columna: p[columna].cat.set_categories(categorias)}) if columna in p.columns else p
+            for p in partes
+        ]
+    return pd.concat(partes, ignore_index=True)
+
+def cargar_rango(tabla, fecha_inicio, fecha_fin, version=None, posteriores=False, **filtros):
+    """
+    Filas de una tabla de SEGMENTOS en un rango de días, armadas con los meses
+    en caché: al mover o ampliar el rango solo se consultan los meses nuevos.
+
+    Args:
+        tabla: 'incidentes' o 'inspecciones'
+        fecha_inicio, fecha_fin: Rango de días (inclusive, en hora de Lima)
+        version: Versión de la tabla (leer_versiones_tablas); None = sin versión
+        posteriores: Incluir también las filas después de fecha_fin
+        **filtros: Columna=lista de valores permitidos (listas vacías se ignoran)
+
+    Returns:
+        DataFrame tipado (aplicar_esquema); vacío si no hay filas
+    """
+    if version is None:
+        version = f"t{int(time.time() // SEGUNDOS_SIN_VERSION)}"
+    inicio, fin = pd.Timestamp(fecha_inicio), pd.Timestamp(fecha_fin)
+    if fin < inicio:
+        return pd.DataFrame()
+    meses = pd.period_range(inicio, fin, freq='M')
+    partes = [_leer_segmento(tabla, str(mes), version) for mes in meses]
+    if posteriores:
+        partes.append(_leer_segmento(tabla, str(meses[-1] + 1), version, posteriores=True))
+    partes = [p for p in partes if not p.empty]
+    if not partes:
+        return pd.DataFrame()
+
+    df = _concatenar(partes) if len(partes) > 1 else partes[0]
+    fechas = df[SEGMENTOS[tabla]['columna']].dt.normalize()
+    mascara = (fechas >= inicio) if posteriores else fechas.between(inicio, fin)
+    for columna, valores in filtros.items():
+        if valores and columna in df.columns:
+            mascara &= df[columna].isin(list(valores))
+    return sin_categorias_vacias(df[mascara].reset_index(drop=True))
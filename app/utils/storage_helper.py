@@ -69,6 +69,54 @@ def _verificar_o_crear_bucket(supabase, bucket_name, public=True):
         # Si no podemos listar buckets, asumimos que no tenemos permisos suficientes
         return False
 
+def preparar_archivo_storage(archivo, carpeta, nombre=None):
+    """
+    Leer un archivo de Streamlit y asignarle una ruta en Storage.
+    
+    Debe llamarse en el hilo de la sesión (los UploadedFile no sobreviven al rerun);
+    el resultado puede subirse después con subir_bytes_storage, incluso en segundo plano.
+    
+    Args:
+        archivo: UploadedFile / camera_input
+        carpeta: Prefijo de la ruta (terminado en '/')
+        nombre: Nombre fijo sin extensión; None = nombre único al azar.
+            Con un nombre fijo, reintentar la misma subida produce la misma ruta
+    
+    Returns:
+        Dict con 'ruta', 'bytes' y 'content_type'
+    """
+    extension = archivo.name.split('.')[-1] if hasattr(archivo, 'name') else 'jpg'
+    if nombre is None:
+        nombre = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4()}"
+    return {
+        'ruta': f"{carpeta}{nombre}.{extension}",
+        'bytes': archivo.read() if hasattr(archivo, 'read') else archivo.getvalue(),
+        'content_type': archivo.type if hasattr(archivo, 'type') else 'image/jpeg'
+    }
+
+def url_publica_storage(bucket, ruta):
+    """URL pública de una ruta en Storage (no requiere que el archivo exista aún)"""
+    url, service_key = _get_supabase_credentials()
+    return create_client(url, service_key).storage.from_(bucket).get_public_url(ruta)
+
+def subir_bytes_storage(bucket, ruta, file_bytes, content_type, upsert=False):
+    """
+    Subir bytes a una ruta fija de Storage, sin mensajes en la interfaz.
+    
+    Pensada para tareas en segundo plano: lanza la excepción si falla.
+    Con upsert=True reemplaza el archivo si ya existe (reintentos).
+    """
+    url, service_key = _get_supabase_credentials()
+    supabase = create_client(url, service_key)
+    opciones = {"content-type": content_type}
+    if upsert:
+        opciones["upsert"] = "true"
+    supabase.storage.from_(bucket).upload(
+        file=file_bytes,
+        path=ruta,
+        file_options=opciones
+    )
+
 def subir_archivo_storage(archivo, bucket, carpeta):
     """
     Función genérica para subir archivos a Supabase Storage
@@ -91,23 +139,17 @@ def subir_archivo_storage(archivo, bucket, carpeta):
         # Verificar si el bucket existe, intentar crearlo si no existe
         _verificar_o_crear_bucket(supabase, bucket)
         
-        # Generar nombre único
-        extension = archivo.name.split('.')[-1] if hasattr(archivo, 'name') else 'jpg'
-        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-        nombre_archivo = f"{carpeta}{timestamp}_{uuid.uuid4()}.{extension}"
-        
-        # Subir archivo
-        file_bytes = archivo.read() if hasattr(archivo, 'read') else archivo.getvalue()
-        content_type = archivo.type if hasattr(archivo, 'type') else 'image/jpeg'
+        # Generar nombre único y subir archivo
+        preparado = preparar_archivo_storage(archivo, carpeta)
         
         supabase.storage.from_(bucket).upload(
-            file=file_bytes,
-            path=nombre_archivo,
-            file_options={"content-type": content_type}
+            file=preparado['bytes'],
+            path=preparado['ruta'],
+            file_options={"content-type": preparado['content_type']}
         )
         
         # Obtener URL pública
-        url_publica = supabase.storage.from_(bucket).get_public_url(nombre_archivo)
+        url_publica = supabase.storage.from_(bucket).get_public_url(preparado['ruta'])
         
         return url_publica
         
@@ -19,3 +19,21 @@ def get_supabase_client():
 
 	return create_client(url, key)
 
+
+def leer_paginado(construir_consulta, tamano_pagina=1000):
+	"""Lee una consulta por páginas con `.range()` sin cargar todo el resultado.
+
+	`construir_consulta` debe devolver una consulta nueva en cada llamada
+	(select + filtros + un orden estable, p. ej. por `id`), porque el
+	builder de PostgREST acumula los parámetros de rango.
+
+	Genera una lista de filas (dicts) por página.
+	"""
+	inicio = 0
+	while True:
+		filas = construir_consulta().range(inicio, inicio + tamano_pagina - 1).execute().data or []
+		if filas:
+			yield filas
+		if len(filas) < tamano_pagina:
+			return
+		inicio += tamano_pagina
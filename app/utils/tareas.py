@@ -0,0 +1,46 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# Pool compartido por todas las sesiones del proceso de Streamlit
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='sst-tareas')
+
+def _registrar_error(nombre, al_fallar=None):
+    def callback(future):
+        error = future.exception()
+        if error is None:
+            return
+        logger.error("Tarea en segundo plano '%s' falló: %s", nombre, error, exc_info=error)
+        if al_fallar:
+            try:
+                al_fallar(error)
+            except Exception:
+                logger.exception("No se pudo registrar la falla de la tarea '%s'", nombre)
+    return callback
+
+def ejecutar_en_segundo_plano(funcion, *args, reintentos=3, al_fallar=None, **kwargs):
+    """
+    Ejecutar una función fuera del rerun de Streamlit.
+
+    Las tareas no deben usar st.* (no tienen contexto de sesión). Si la
+    función lanza una excepción se reintenta con espera exponencial; si
+    falla en todos los intentos se registra en el log y se llama
+    al_fallar(error).
+
+    Returns:
+        Future de la tarea
+    """
+    def tarea():
+        for intento in range(reintentos):
+            try:
+                return funcion(*args, **kwargs)
+            except Exception:
+                if intento == reintentos - 1:
+                    raise
+                time.sleep(2 ** intento)
+
+    future = _executor.submit(tarea)
+    future.add_done_callback(_registrar_error(getattr(funcion, '__name__', 'tarea'), al_fallar))
+    return future
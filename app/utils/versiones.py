@@ -0,0 +1,24 @@
+from app.utils.supabase_client import get_supabase_client
+
+# Tablas que alimentan los reportes
+TABLAS_REPORTES = [
+    'incidentes', 'riesgos', 'epp_asignaciones', 'epp_catalogo', 'capacitaciones',
+    'asistentes_capacitacion', 'inspecciones', 'hallazgos', 'documentos', 'usuarios',
+    'indicadores_sst'
+]
+
+def leer_versiones_tablas(tablas=TABLAS_REPORTES):
+    """
+    Versión actual de cada tabla (ver scripts/sql/versiones_tablas.sql).
+
+    Returns:
+        Dict {tabla: version}, o None si la tabla de versiones no está
+        disponible (en ese caso no se debe cachear nada)
+    """
+    try:
+        supabase = get_supabase_client()
+        filas = supabase.table('versiones_tablas').select('tabla, version').in_('tabla', list(tablas)).execute().data or []
+    except Exception:
+        return None
+    versiones = {f['tabla']: f['version'] for f in filas}
+    return {tabla: versiones.get(tabla, 0) for tabla in tablas}
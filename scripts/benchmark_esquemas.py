@@ -0,0 +1,92 @@
+"""
+Benchmark de las tablas tipadas (app/utils/esquemas.py).
+
+Compara un DataFrame de incidentes armado directo desde el JSON de Supabase
+(texto y dicts anidados) contra el mismo DataFrame con aplicar_esquema:
+memoria y tiempo de las operaciones que repiten las vistas (conteos por
+área y tipo, tendencia mensual, filtro por fecha), también con el texto en
+columnas pyarrow (SST_BACKEND_ARROW) y la conversión a Arrow que hace
+st.dataframe. Usa datos sintéticos; no necesita Supabase ni Streamlit.
+
+Uso:
+    python scripts/benchmark_esquemas.py [filas]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+from app.utils.esquemas import aplicar_esquema, texto_arrow
+from app.analytics import hora_local
+
+AREAS = ['Producción', 'Mantenimiento', 'Almacén', 'Logística', 'Administración', 'Calidad']
+TIPOS = ['accidente', 'incidente', 'enfermedad_laboral', 'casi_accidente']
+ESTADOS = ['reportado', 'en_investigacion', 'analizado', 'cerrado']
+
+def generar_filas(filas):
+    """Filas como las devuelve Supabase: fechas ISO y la relación de usuarios anidada"""
+    rng = np.random.default_rng(0)
+    inicio = pd.Timestamp('2023-01-01', tz='UTC')
+    fechas = (inicio + pd.to_timedelta(rng.integers(0, 730 * 24 * 60, filas), unit='min')).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+    areas = np.array(AREAS)[rng.integers(0, len(AREAS), filas)]
+    tipos = np.array(TIPOS)[rng.integers(0, len(TIPOS), filas)]
+    estados = np.array(ESTADOS)[rng.integers(0, len(ESTADOS), filas)]
+    return [
+        {
+            'id': i,
+            'codigo': f"INC-{i:06d}",
+            'tipo': tipos[i],
+            'area': areas[i],
+            'estado': estados[i],
+            'fecha_hora': fechas[i],
+            'created_at': fechas[i],
+            'descripcion': 'Descripción del incidente',
+            'usuarios': {'nombre_completo': f"Trabajador {i % 500}"}
+        }
+        for i in range(filas)
+    ]
+
+def operaciones(df, fechas):
+    """Lo que hacen las vistas con la tabla cargada; fechas() devuelve fecha_hora como datetime"""
+    df['area'].value_counts()
+    df['tipo'].value_counts()
+    df.groupby([fechas().dt.to_period('M'), 'tipo'], observed=True).size()
+    df[fechas() >= pd.Timestamp('2024-06-01')].shape
+
+def medir(nombre, funcion, repeticiones=5):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    ms = (time.perf_counter() - inicio) / repeticiones * 1000
+    print(f"{nombre:<36} {ms:10.2f} ms")
+    return ms
+
+def megabytes(df):
+    return df.memory_usage(deep=True).sum() / 1024 / 1024
+
+if __name__ == '__main__':
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    registros = generar_filas(filas)
+    print(f"{filas} incidentes")
+
+    crudo = pd.DataFrame(registros)
+    tipado = aplicar_esquema('incidentes', registros)
+    print(f"{'memoria sin esquema':<36} {megabytes(crudo):10.2f} MB")
+    print(f"{'memoria con esquema':<36} {megabytes(tipado):10.2f} MB")
+    arrow = texto_arrow(tipado)
+    print(f"{'memoria con esquema + Arrow':<36} {megabytes(arrow):10.2f} MB")
+
+    medir("carga sin esquema", lambda: pd.DataFrame(registros))
+    medir("carga con aplicar_esquema", lambda: aplicar_esquema('incidentes', registros))
+    # Sin esquema cada vista vuelve a leer el texto de las fechas
+    medir("vistas sin esquema", lambda: operaciones(crudo, lambda: hora_local(crudo['fecha_hora'])))
+    medir("vistas con esquema", lambda: operaciones(tipado, lambda: tipado['fecha_hora']))
+    medir("vistas con esquema + Arrow", lambda: operaciones(arrow, lambda: arrow['fecha_hora']))
+    # Lo que hace st.dataframe antes de enviar la tabla al navegador
+    medir("a Arrow (st.dataframe) sin esquema", lambda: pa.Table.from_pandas(crudo.drop(columns='usuarios')))
+    medir("a Arrow (st.dataframe) con esquema", lambda: pa.Table.from_pandas(tipado))
+    medir("a Arrow (st.dataframe) + Arrow", lambda: pa.Table.from_pandas(arrow))
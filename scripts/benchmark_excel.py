@@ -0,0 +1,71 @@
+"""
+Benchmark de memoria de la exportación a Excel.
+
+Compara el pico de memoria (RSS) de pd.ExcelWriter (openpyxl normal) contra
+el escritor en streaming de app/utils/excel_streaming.py con datos sintéticos
+de incidentes. Cada modo corre en un proceso aparte para medir su pico real.
+
+Uso:
+    python scripts/benchmark_excel.py [filas]
+"""
+import io
+import os
+import sys
+import time
+import resource
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+COLUMNAS = ['codigo', 'tipo', 'fecha_hora', 'area', 'descripcion', 'consecuencias', 'estado', 'fecha_cierre']
+
+def generar_bloque(inicio, cantidad):
+    """Bloque de incidentes sintéticos, como lo devolvería una página de Supabase"""
+    import pandas as pd
+    import numpy as np
+    indices = np.arange(inicio, inicio + cantidad)
+    return pd.DataFrame({
+        'codigo': [f"INC-20240101-{i:06d}" for i in indices],
+        'tipo': np.array(['accidente', 'incidente', 'casi_accidente'])[indices % 3],
+        'fecha_hora': pd.Timestamp('2024-01-01', tz='UTC') + pd.to_timedelta(indices, unit='min'),
+        'area': np.array(['Producción', 'Almacén', 'Mantenimiento', 'Oficinas'])[indices % 4],
+        'descripcion': ['Descripción del evento ocurrido en la línea de trabajo ' * 3] * cantidad,
+        'consecuencias': [{'lesiones': 'leve', 'dias_perdidos': int(i % 5)} for i in indices],
+        'estado': np.array(['reportado', 'cerrado'])[indices % 2],
+        'fecha_cierre': None
+    })
+
+def bloques(filas, tamano=5000):
+    for inicio in range(0, filas, tamano):
+        yield generar_bloque(inicio, min(tamano, filas - inicio))
+
+def modo_pandas(filas):
+    import pandas as pd
+    df = pd.concat(list(bloques(filas)), ignore_index=True)
+    df['fecha_hora'] = df['fecha_hora'].dt.tz_localize(None)
+    df['consecuencias'] = df['consecuencias'].astype(str)
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        df.to_excel(writer, sheet_name='Incidentes', index=False)
+    return len(output.getvalue())
+
+def modo_streaming(filas):
+    from app.utils.excel_streaming import crear_libro_streaming, escribir_hoja, guardar_libro
+    libro = crear_libro_streaming()
+    escribir_hoja(libro, 'Incidentes', COLUMNAS, bloques(filas))
+    return len(guardar_libro(libro))
+
+def ejecutar(modo, filas):
+    inicio = time.perf_counter()
+    tamano = {'pandas': modo_pandas, 'streaming': modo_streaming}[modo](filas)
+    segundos = time.perf_counter() - inicio
+    pico_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB en Linux
+    print(f"{modo:<10} {filas:>8} filas  {segundos:7.2f} s  pico RSS {pico_mb:8.1f} MB  archivo {tamano / 1024 / 1024:6.1f} MB")
+
+if __name__ == '__main__':
+    if len(sys.argv) == 3:
+        ejecutar(sys.argv[1], int(sys.argv[2]))
+    else:
+        filas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+        for modo in ('pandas', 'streaming'):
+            subprocess.run([sys.executable, __file__, modo, str(filas)], check=True)
@@ -0,0 +1,80 @@
+"""
+Benchmark del motor de indicadores (app/analytics).
+
+Compara el cálculo anterior (un filtro booleano y len() por indicador, repetido
+en cada vista) contra calcular_kpis en una pasada, y la lectura memorizada por
+versión de los datos. Usa datos sintéticos; no necesita Supabase ni Streamlit.
+
+Uso:
+    python scripts/benchmark_kpis.py [filas]
+"""
+import os
+import sys
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from app.analytics import calcular_kpis, kpis_por_version, limpiar_memo
+
+VISTAS = 4  # dashboard, resumen ejecutivo, reporte legal y PDF calculan los mismos indicadores
+
+def generar_datos(filas):
+    indices = np.arange(filas)
+    hoy = pd.Timestamp.today().normalize()
+    return {
+        'incidentes': pd.DataFrame({
+            'tipo': np.array(['accidente', 'incidente', 'enfermedad_laboral'])[indices % 3],
+            'estado': np.array(['reportado', 'cerrado'])[indices % 2],
+            'fecha_hora': (hoy - pd.to_timedelta(indices % 365, unit='D')).strftime('%Y-%m-%dT%H:%M:%S')
+        }),
+        'riesgos': pd.DataFrame({
+            'estado': np.array(['pendiente', 'controlado'])[indices % 2],
+            'nivel_riesgo': (indices % 25) + 1
+        }),
+        'epp': pd.DataFrame({
+            'fecha_vencimiento': (hoy + pd.to_timedelta(indices % 120 - 60, unit='D')).strftime('%Y-%m-%d')
+        }),
+        'hallazgos': pd.DataFrame({'estado': np.array(['abierto', 'cerrado', 'en_proceso'])[indices % 3]}),
+        'capacitaciones': pd.DataFrame({'estado': np.array(['realizada', 'programada'])[indices % 2]}),
+        'versiones': {'incidentes': 1, 'riesgos': 1}
+    }
+
+def kpis_anterior(data):
+    """Cálculo como estaba en los módulos: un filtro por indicador"""
+    fecha_limite = datetime.now() + timedelta(days=30)
+    return {
+        'riesgos_pendientes': len(data['riesgos'][data['riesgos']['estado'] == 'pendiente']),
+        'riesgos_criticos': len(data['riesgos'][data['riesgos']['nivel_riesgo'] >= 15]),
+        'accidentes': len(data['incidentes'][data['incidentes']['tipo'] == 'accidente']),
+        'incidentes': len(data['incidentes'][data['incidentes']['tipo'] == 'incidente']),
+        'enfermedades': len(data['incidentes'][data['incidentes']['tipo'] == 'enfermedad_laboral']),
+        'epp_vencidos': len(data['epp'][pd.to_datetime(data['epp']['fecha_vencimiento']) < datetime.now()]),
+        'epp_vence_30_dias': len(data['epp'][pd.to_datetime(data['epp']['fecha_vencimiento']) <= fecha_limite]),
+        'hallazgos_abiertos': len(data['hallazgos'][data['hallazgos']['estado'] == 'abierto']),
+        'capacitaciones_realizadas': len(data['capacitaciones'][data['capacitaciones']['estado'] == 'realizada'])
+    }
+
+def medir(nombre, funcion, repeticiones=5):
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    ms = (time.perf_counter() - inicio) / repeticiones * 1000
+    print(f"{nombre:<32} {ms:10.2f} ms")
+    return ms
+
+if __name__ == '__main__':
+    filas = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    data = generar_datos(filas)
+    filtros = {'areas': [], 'fecha_inicio': '2024-01-01'}
+    print(f"{filas} filas por tabla, {VISTAS} vistas por carga")
+
+    medir("anterior (por vista)", lambda: [kpis_anterior(data) for _ in range(VISTAS)])
+    medir("calcular_kpis (por vista)", lambda: [calcular_kpis(data) for _ in range(VISTAS)])
+
+    def memorizado():
+        limpiar_memo()
+        return [kpis_por_version(data, filtros) for _ in range(VISTAS)]
+    medir("kpis_por_version (1 cálculo)", memorizado)
@@ -0,0 +1,85 @@
+"""
+Microbenchmark de armado de reportes PDF: estilos recreados en cada reporte
+(como antes) contra el registro de plantillas de app/utils/pdf_plantillas.py.
+
+Arma N veces las secciones fijas de un reporte (KPIs, indicadores legales,
+requisitos y tablas de resumen) y genera el PDF en memoria.
+
+Uso:
+    python scripts/benchmark_pdf_plantillas.py [repeticiones]
+"""
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from app.utils import pdf_plantillas as plantillas
+
+KPIS = [
+    ('Total Incidentes', 120, 'Total de eventos registrados'),
+    ('Riesgos Críticos (≥15)', 8, 'Requieren atención inmediata'),
+    ('EPP Vencidos', 14, 'Necesitan renovación urgente'),
+    ('% Cumplimiento Capacitaciones', '82.5%', '33/40 completadas')
+]
+INDICADORES = {'tasa_frecuencia': 4.2, 'tasa_severidad': 63.0, 'indice_incidencia': 0.8,
+               'accidentes': 3, 'incidentes': 110, 'enfermedades': 7}
+DATA = {'documentos': [1], 'riesgos': [1], 'epp': [], 'capacitaciones': [1], 'incidentes': [1]}
+RESUMEN = [['Área', 'Cantidad']] + [[f"Área {i}", i * 3] for i in range(12)]
+
+def reporte_sin_registro():
+    """Como antes: hoja de estilos, ParagraphStyle y TableStyle creados en cada reporte"""
+    output = io.BytesIO()
+    doc = SimpleDocTemplate(output, pagesize=A4)
+    styles = getSampleStyleSheet()
+    heading = ParagraphStyle('CustomHeading', parent=styles['Heading1'], fontSize=16,
+                             textColor=colors.HexColor('#1e3a8a'), spaceAfter=12, spaceBefore=20)
+    elements = [Paragraph("REPORTE", heading)]
+
+    kpi = Table([['Métrica', 'Valor', 'Interpretación']] + [[m, str(v), i] for m, v, i in KPIS], colWidths=[200, 100, 200])
+    kpi.setStyle(TableStyle(plantillas.ESTILO_KPI.getCommands()))
+    indicadores = plantillas.seccion_indicadores_legales(INDICADORES)
+    indicadores.setStyle(TableStyle(plantillas.ESTILO_INDICADORES.getCommands()))
+    requisitos = plantillas.seccion_requisitos(DATA)
+    requisitos.setStyle(TableStyle(plantillas.ESTILO_REQUISITOS.getCommands()))
+    elements += [kpi, Spacer(1, 20), indicadores, Spacer(1, 15), requisitos]
+    for _ in range(5):
+        resumen = Table(RESUMEN, colWidths=[300, 200])
+        resumen.setStyle(TableStyle(plantillas.ESTILO_RESUMEN.getCommands()))
+        elements.append(resumen)
+    doc.build(elements)
+    return output.getvalue()
+
+def reporte_con_registro():
+    """Con el registro: estilos y plantillas compilados una vez por proceso"""
+    output = io.BytesIO()
+    doc = plantillas.crear_documento(output)
+    estilos = plantillas.obtener_estilos()
+    elements = [
+        Paragraph("REPORTE", estilos['encabezado']),
+        plantillas.seccion_kpis(KPIS), Spacer(1, 20),
+        plantillas.seccion_indicadores_legales(INDICADORES), Spacer(1, 15),
+        plantillas.seccion_requisitos(DATA)
+    ]
+    elements += [plantillas.tabla(RESUMEN, [300, 200]) for _ in range(5)]
+    plantillas.construir_documento(doc, elements)
+    return output.getvalue()
+
+def medir(funcion, repeticiones):
+    funcion()  # Calentamiento (fuentes, registro)
+    inicio = time.perf_counter()
+    for _ in range(repeticiones):
+        funcion()
+    return (time.perf_counter() - inicio) / repeticiones * 1000
+
+if __name__ == '__main__':
+    repeticiones = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    sin = medir(reporte_sin_registro, repeticiones)
+    con = medir(reporte_con_registro, repeticiones)
+    print(f"Sin registro: {sin:7.2f} ms por reporte")
+    print(f"Con registro: {con:7.2f} ms por reporte ({(1 - con / sin) * 100:.0f}% menos)")
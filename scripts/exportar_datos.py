@@ -0,0 +1,49 @@
+"""
+Extracción masiva de las tablas SST para BI (Parquet o CSV por bloques).
+
+Lee cada tabla página por página, aplana las relaciones y escribe un archivo
+por mes (particiones estilo Hive: <tabla>/mes=2024-01/part-00000.parquet),
+así funciona con millones de filas sin cargarlas en memoria.
+
+Uso:
+    python scripts/exportar_datos.py --destino ./extracciones
+    python scripts/exportar_datos.py --formato csv --tablas incidentes riesgos --desde 2024-01-01
+"""
+import os
+import sys
+import argparse
+from datetime import date
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.exportacion import TABLAS_EXPORTACION, FORMATOS_EXPORTACION, exportar_tabla
+
+def main():
+    parser = argparse.ArgumentParser(description="Exportar tablas SST a Parquet/CSV particionado por mes")
+    parser.add_argument('--destino', default='extracciones', help="Carpeta de salida")
+    parser.add_argument('--formato', choices=FORMATOS_EXPORTACION, default='parquet')
+    parser.add_argument('--compresion', default=None,
+                        help="Parquet: zstd (defecto), snappy, gzip; CSV: gzip (defecto) o none")
+    parser.add_argument('--tablas', nargs='+', choices=sorted(TABLAS_EXPORTACION), default=list(TABLAS_EXPORTACION))
+    parser.add_argument('--desde', type=date.fromisoformat, default=None, help="Fecha inicial (AAAA-MM-DD)")
+    parser.add_argument('--hasta', type=date.fromisoformat, default=None, help="Fecha final (AAAA-MM-DD)")
+    parser.add_argument('--sin-particiones', action='store_true', help="Un solo archivo por tabla")
+    parser.add_argument('--tamano-pagina', type=int, default=1000, help="Filas por petición a Supabase")
+    args = parser.parse_args()
+
+    errores = 0
+    for tabla in args.tablas:
+        try:
+            resultado = exportar_tabla(
+                tabla, args.destino, formato=args.formato, compresion=args.compresion,
+                desde=args.desde, hasta=args.hasta, particionar=not args.sin_particiones,
+                tamano_pagina=args.tamano_pagina
+            )
+            print(f"✅ {tabla}: {resultado['filas']} filas en {resultado['archivos']} archivos")
+        except Exception as e:
+            errores += 1
+            print(f"❌ {tabla}: {e}")
+    return 1 if errores else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
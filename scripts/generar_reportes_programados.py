@@ -0,0 +1,230 @@
+"""
+Generación de los reportes programados fuera de Streamlit.
+
+Lee las configuraciones activas de `configuraciones_reportes` y, para las que
+les toca envío según su frecuencia:
+- carga los datos una sola vez por cada conjunto de filtros distinto,
+- reutiliza los reportes ya generados con los mismos filtros y versión de
+  los datos (cache_artefactos) y genera en paralelo solo los que faltan,
+- los sube a sst-documentos y avisa a n8n para que envíe el email.
+
+Programar con cron, por ejemplo todos los días a las 06:00:
+    0 6 * * * cd /ruta/del/proyecto && python scripts/generar_reportes_programados.py
+
+Uso:
+    python scripts/generar_reportes_programados.py [--todos] [--workers N]
+"""
+import os
+import sys
+import json
+import uuid
+import argparse
+import multiprocessing
+from datetime import datetime, date, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import requests
+from dotenv import load_dotenv
+from app.utils.supabase_client import get_supabase_client
+from app.utils.filtros import clave_filtros
+from app.utils.graficos import calentar_kaleido
+from app.utils.versiones import leer_versiones_tablas
+from app.utils.cache_artefactos import clave_artefacto, buscar_artefacto
+from app.utils.cola_reportes import generar_y_guardar_reporte, BUCKET_REPORTES
+from app.utils.indicadores_sst import recalcular_indicadores
+
+load_dotenv()
+
+DIAS_FRECUENCIA = {'Diario': 1, 'Semanal': 7, 'Mensual': 30}
+VENTANA_POR_DEFECTO = 90  # Días, igual que los filtros de la interfaz
+
+def cargar_configuraciones():
+    """Configuraciones de reportes activas"""
+    supabase = get_supabase_client()
+    return supabase.table('configuraciones_reportes').select('*').eq('activo', True).execute().data or []
+
+def toca_envio(config, ahora):
+    """True si pasó el intervalo de la frecuencia desde el último envío"""
+    if not config.get('ultimo_envio'):
+        return True
+    ultimo = datetime.fromisoformat(str(config['ultimo_envio']).replace('Z', '+00:00'))
+    dias = DIAS_FRECUENCIA.get(config.get('frecuencia'), 1)
+    # Margen de una hora para que el cron diario no salte un día por segundos
+    return ahora - ultimo.replace(tzinfo=None) >= timedelta(days=dias) - timedelta(hours=1)
+
+def resolver_filtros(config, hoy):
+    """
+    Filtros de la configuración con el período desplazado a hoy.
+
+    Se conserva el largo del período guardado (p. ej. los últimos 90 días)
+    y se hace terminar en la fecha de ejecución.
+    """
+    filtros = config.get('filtros') or {}
+    if isinstance(filtros, str):
+        filtros = json.loads(filtros)
+
+    try:
+        ventana = (date.fromisoformat(filtros['fecha_fin'][:10]) - date.fromisoformat(filtros['fecha_inicio'][:10])).days
+    except (KeyError, TypeError, ValueError):
+        ventana = VENTANA_POR_DEFECTO
+
+    return {
+        'fecha_inicio': hoy - timedelta(days=ventana),
+        'fecha_fin': hoy,
+        'areas': filtros.get('areas') or [],
+        'tipos_incidente': filtros.get('tipos_incidente') or [],
+        'nivel_riesgo_min': filtros.get('nivel_riesgo_min') or 1,
+        'solo_fechas_limite': bool(filtros.get('solo_fechas_limite'))
+    }
+
+def notificar_n8n(config, resultado):
+    """Pedir a n8n que envíe el reporte generado por email"""
+    base_url = os.getenv("N8N_WEBHOOK_URL")
+    if not base_url:
+        return
+    requests.post(
+        base_url + "/enviar-reporte-programado",
+        json={
+            'config_id': config.get('id'),
+            'email': config['email_destino'],
+            'frecuencia': config.get('frecuencia'),
+            'formato': config.get('formato') or 'PDF',
+            'tipo': config.get('tipo') or 'Completo',
+            'filename': resultado['filename'],
+            'url': resultado['url']
+        },
+        timeout=10
+    )
+
+def reutilizar_artefacto(artefacto, formato):
+    """
+    Resultado de envío ({'filename', 'url'}) de un reporte en caché. Si se
+    generó sin subirlo (descarga local desde la interfaz) se sube el archivo
+    guardado, sin volver a generarlo.
+    """
+    url = artefacto.get('url')
+    if not url:
+        from app.utils.storage_helper import subir_bytes_storage, url_publica_storage
+        ruta_storage = f"reportes/{uuid.uuid4().hex}/{artefacto['filename']}"
+        content_type = 'application/pdf' if formato == 'PDF' else \
+            'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        subir_bytes_storage(BUCKET_REPORTES, ruta_storage, artefacto['data'], content_type)
+        url = url_publica_storage(BUCKET_REPORTES, ruta_storage)
+    return {'filename': artefacto['filename'], 'url': url}
+
+def enviar(configs, resultado, ahora):
+    """Notificar y marcar como enviadas las configuraciones de un reporte; devuelve los errores"""
+    errores = 0
+    for config in configs:
+        try:
+            notificar_n8n(config, resultado)
+            marcar_enviado(config, ahora)
+        except Exception as e:
+            errores += 1
+            print(f"❌ Configuración {config.get('id')} ({config['email_destino']}): {e}")
+    return errores
+
+def marcar_enviado(config, ahora):
+    supabase = get_supabase_client()
+    supabase.table('configuraciones_reportes').update(
+        {'ultimo_envio': ahora.isoformat()}
+    ).eq('id', config['id']).execute()
+
+def ejecutar(todos=False, workers=None):
+    # Import diferido: reportes carga ReportLab/Plotly, solo se necesita si hay trabajo
+    from app.modules.reportes import consultar_datos_reporte, renderizar_graficos_pdf
+
+    ahora = datetime.now()
+    configuraciones = [c for c in cargar_configuraciones() if todos or toca_envio(c, ahora)]
+    if not configuraciones:
+        print("No hay reportes programados pendientes")
+        return 0
+
+    # Agrupar por filtros: los datos se consultan una sola vez por grupo, y
+    # cada (formato, tipo) del grupo se genera una sola vez aunque lo pidan
+    # varias configuraciones
+    grupos = {}
+    for config in configuraciones:
+        filtros = resolver_filtros(config, ahora.date())
+        grupo = grupos.setdefault(clave_filtros(filtros), {'filtros': filtros, 'reportes': {}})
+        reporte = (config.get('formato') or 'PDF', config.get('tipo') or 'Completo')
+        grupo['reportes'].setdefault(reporte, []).append(config)
+
+    # Indicadores legales al día antes de leer las versiones (son parte de la clave de caché)
+    try:
+        recalcular_indicadores()
+    except Exception as e:
+        print(f"⚠️ No se pudieron recalcular los indicadores legales: {e}")
+
+    versiones = leer_versiones_tablas()
+    errores = 0
+
+    with ProcessPoolExecutor(
+        max_workers=workers or os.cpu_count() or 2,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=calentar_kaleido
+    ) as pool:
+        futures = {}
+        for grupo in grupos.values():
+            filtros = grupo['filtros']
+
+            # Reportes sin cambios en los datos desde la última generación: se
+            # reenvía el archivo guardado en lugar de generarlo y subirlo de nuevo
+            pendientes = {}
+            for (formato, tipo), configs in grupo['reportes'].items():
+                clave = clave_artefacto(formato, tipo, filtros, versiones, hoy=ahora.date())
+                artefacto = buscar_artefacto(clave)
+                if artefacto is None:
+                    pendientes[(formato, tipo)] = (configs, clave)
+                    continue
+                try:
+                    resultado = reutilizar_artefacto(artefacto, formato)
+                except Exception as e:
+                    print(f"⚠️ {formato} {tipo}: no se pudo reutilizar el reporte en caché ({e}); se genera de nuevo")
+                    pendientes[(formato, tipo)] = (configs, clave)
+                    continue
+                print(f"♻️ {formato} {tipo} sin cambios: {resultado['url']}")
+                errores += enviar(configs, resultado, ahora)
+
+            if not pendientes:
+                continue
+            formatos = {formato for formato, _ in pendientes}
+            # El Excel lee Supabase por páginas en el worker; solo el PDF usa los datos cargados
+            try:
+                data = consultar_datos_reporte(filtros) if 'PDF' in formatos else None
+            except Exception as e:
+                errores += 1
+                print(f"❌ Error cargando datos ({clave_filtros(filtros)}): {e}")
+                continue
+            for (formato, tipo), (configs, clave) in pendientes.items():
+                # Las figuras del PDF se reparten entre los workers antes de
+                # encolar el documento, que las recibe ya renderizadas
+                graficos = renderizar_graficos_pdf(data, tipo, filtros, pool=pool) if formato == 'PDF' else None
+                future = pool.submit(
+                    generar_y_guardar_reporte, uuid.uuid4().hex, formato,
+                    data if formato == 'PDF' else None, tipo, filtros, 'storage', clave, graficos
+                )
+                futures[future] = (formato, tipo, configs)
+            del data
+
+        for future in as_completed(futures):
+            formato, tipo, configs = futures[future]
+            try:
+                resultado = future.result()
+            except Exception as e:
+                errores += 1
+                print(f"❌ {formato} {tipo}: {e}")
+                continue
+            print(f"✅ {formato} {tipo}: {resultado['url']}")
+            errores += enviar(configs, resultado, ahora)
+
+    return 1 if errores else 0
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generar los reportes SST programados")
+    parser.add_argument('--todos', action='store_true', help="Generar todas las configuraciones activas, aunque no les toque envío")
+    parser.add_argument('--workers', type=int, default=None, help="Procesos en paralelo (por defecto, uno por núcleo)")
+    args = parser.parse_args()
+    sys.exit(ejecutar(todos=args.todos, workers=args.workers))
@@ -0,0 +1,24 @@
+"""
+Recalcula los indicadores legales (TF, TS e Índice de Incidencia mensuales y de
+12 meses móviles por área) y los guarda en indicadores_sst.
+
+La interfaz los recalcula al importar horas hombre; como los accidentes se
+registran a diario, programar también con cron, por ejemplo:
+    30 5 * * * cd /ruta/del/proyecto && python scripts/recalcular_indicadores.py
+
+Uso:
+    python scripts/recalcular_indicadores.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.indicadores_sst import recalcular_indicadores
+
+if __name__ == '__main__':
+    guardados, errores = recalcular_indicadores()
+    print(f"✅ {guardados} filas de indicadores guardadas")
+    for error in errores:
+        print(f"❌ {error['error']}")
+    sys.exit(1 if errores else 0)
@@ -0,0 +1,16 @@
+-- Configuraciones de reportes programados (ver scripts/generar_reportes_programados.py).
+-- Ejecutar una vez en el SQL Editor de Supabase.
+
+create table if not exists configuraciones_reportes (
+    id bigserial primary key,
+    email_destino text not null,
+    frecuencia text not null,
+    filtros text,
+    activo boolean not null default true,
+    ultimo_envio timestamptz,
+    created_at timestamptz not null default now()
+);
+
+-- Formato y tipo de reporte a generar (antes siempre se asumía PDF Completo)
+alter table configuraciones_reportes add column if not exists formato text not null default 'PDF';
+alter table configuraciones_reportes add column if not exists tipo text not null default 'Completo';
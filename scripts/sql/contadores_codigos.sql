@@ -0,0 +1,21 @@
+-- Contadores para la asignación de códigos (riesgos, incidentes, capacitaciones).
+-- Ejecutar una vez en el SQL Editor de Supabase.
+
+create table if not exists contadores_codigos (
+    prefijo text primary key,
+    ultimo_valor bigint not null default 0
+);
+
+-- Reserva un bloque de p_cantidad números para el prefijo y devuelve el último
+-- número del bloque. El upsert bloquea la fila del prefijo, por lo que dos
+-- procesos nunca reciben números repetidos.
+create or replace function reservar_codigos(p_prefijo text, p_cantidad integer)
+returns bigint
+language sql
+as $$
+    insert into contadores_codigos as c (prefijo, ultimo_valor)
+    values (p_prefijo, p_cantidad)
+    on conflict (prefijo)
+    do update set ultimo_valor = c.ultimo_valor + excluded.ultimo_valor
+    returning ultimo_valor;
+$$;
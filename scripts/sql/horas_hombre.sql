@@ -0,0 +1,50 @@
+-- Horas hombre y días perdidos por área y mes (exportaciones del sistema de
+-- asistencia) e indicadores legales precalculados a partir de ellas.
+-- Ejecutar una vez en el SQL Editor de Supabase, después de versiones_tablas.sql.
+
+create table if not exists horas_hombre (
+    id bigint generated always as identity primary key,
+    periodo date not null check (periodo = date_trunc('month', periodo)::date),  -- primer día del mes
+    area text not null,
+    trabajadores integer not null check (trabajadores >= 0),
+    horas_trabajadas numeric(14, 2) not null check (horas_trabajadas >= 0),
+    dias_perdidos integer not null default 0 check (dias_perdidos >= 0),
+    fuente text,
+    created_at timestamptz not null default now(),
+    unique (periodo, area)
+);
+
+-- Una fila por periodo, área y ventana ('mensual' o '12m' móvil). El área
+-- 'TOTAL' agrega toda la empresa. La llena app/utils/indicadores_sst.py.
+create table if not exists indicadores_sst (
+    periodo date not null,
+    area text not null,
+    ventana text not null check (ventana in ('mensual', '12m')),
+    accidentes integer not null default 0,
+    dias_perdidos integer not null default 0,
+    horas_hombre numeric(16, 2) not null default 0,
+    trabajadores numeric(10, 2) not null default 0,
+    tasa_frecuencia numeric(12, 4),
+    tasa_severidad numeric(12, 4),
+    indice_incidencia numeric(12, 4),
+    calculado_en timestamptz not null default now(),
+    primary key (periodo, area, ventana)
+);
+
+create index if not exists idx_indicadores_sst_ventana_periodo on indicadores_sst (ventana, periodo);
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['horas_hombre', 'indicadores_sst']
+    loop
+        execute format('drop trigger if exists trg_version_%1$s on %1$I', t);
+        execute format(
+            'create trigger trg_version_%1$s after insert or update or delete or truncate on %1$I '
+            'for each statement execute function incrementar_version_tabla()', t
+        );
+        insert into versiones_tablas (tabla) values (t) on conflict do nothing;
+    end loop;
+end;
+$$;
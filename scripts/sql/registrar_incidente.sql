@@ -0,0 +1,62 @@
+-- Registro idempotente de incidentes.
+-- Ejecutar una vez en el SQL Editor de Supabase.
+
+alter table incidentes add column if not exists idempotency_key uuid;
+alter table incidentes add column if not exists evidencia_fallida text[] not null default '{}';
+create unique index if not exists incidentes_idempotency_key_idx on incidentes (idempotency_key);
+
+-- Inserta el incidente junto con las referencias de evidencia en una sola
+-- llamada. Si la clave ya fue usada (doble clic, reintento) devuelve el
+-- incidente existente con duplicado = true y no inserta nada.
+create or replace function registrar_incidente(p_idempotency_key uuid, p_incidente jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_incidente incidentes;
+begin
+    insert into incidentes (
+        codigo, tipo, fecha_hora, area, puesto_trabajo, trabajador_id,
+        descripcion, consecuencias, testigos, estado, evidencia, idempotency_key
+    )
+    select
+        r.codigo, r.tipo, r.fecha_hora, r.area, r.puesto_trabajo, r.trabajador_id,
+        r.descripcion, r.consecuencias, r.testigos, r.estado, r.evidencia, p_idempotency_key
+    from jsonb_populate_record(null::incidentes, p_incidente) r
+    on conflict (idempotency_key) do nothing
+    returning * into v_incidente;
+
+    if found then
+        return jsonb_build_object('incidente', to_jsonb(v_incidente), 'duplicado', false);
+    end if;
+
+    select * into v_incidente from incidentes where idempotency_key = p_idempotency_key;
+    return jsonb_build_object('incidente', to_jsonb(v_incidente), 'duplicado', true);
+end;
+$$;
+
+-- La evidencia se sube en segundo plano después de registrar el incidente.
+-- Si una subida falla en todos los reintentos, su URL sale de evidencia y
+-- queda en evidencia_fallida para que no apunte a un archivo inexistente.
+create or replace function marcar_evidencia_fallida(p_idempotency_key uuid, p_url text)
+returns void
+language sql
+as $$
+    update incidentes
+    set evidencia = array_remove(evidencia, p_url),
+        evidencia_fallida = array_append(array_remove(evidencia_fallida, p_url), p_url)
+    where idempotency_key = p_idempotency_key;
+$$;
+
+-- Un reintento con la misma clave vuelve a subir la evidencia a la misma ruta;
+-- si esa URL estaba en evidencia_fallida, vuelve a evidencia.
+create or replace function restaurar_evidencia(p_idempotency_key uuid, p_url text)
+returns void
+language sql
+as $$
+    update incidentes
+    set evidencia = array_append(array_remove(evidencia, p_url), p_url),
+        evidencia_fallida = array_remove(evidencia_fallida, p_url)
+    where idempotency_key = p_idempotency_key
+      and p_url = any(evidencia_fallida);
+$$;
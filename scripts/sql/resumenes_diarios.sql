@@ -0,0 +1,188 @@
+-- Resúmenes diarios para los gráficos de tendencia: conteos por día de
+-- incidentes (área, tipo, hora), hallazgos (categoría, estado) y asignaciones
+-- de EPP (área del trabajador, estado). Se mantienen con triggers por fila
+-- (+1 / -1 en cada insert, update o delete), así los gráficos leen unos pocos
+-- cientos de filas en vez del historial completo. Días y horas en hora de Lima.
+-- Ejecutar una vez en el SQL Editor de Supabase (al final se llenan con el
+-- historial existente).
+
+create table if not exists resumen_incidentes_diario (
+    dia date not null,
+    area text not null default '',
+    tipo text not null default '',
+    hora smallint not null,
+    cantidad integer not null default 0,
+    primary key (dia, area, tipo, hora)
+);
+
+create table if not exists resumen_hallazgos_diario (
+    dia date not null,
+    categoria text not null default '',
+    estado text not null default '',
+    cantidad integer not null default 0,
+    primary key (dia, categoria, estado)
+);
+
+create table if not exists resumen_epp_diario (
+    dia date not null,
+    area text not null default '',
+    estado text not null default '',
+    cantidad integer not null default 0,
+    primary key (dia, area, estado)
+);
+
+-- ---------------------------------------------------------------------------
+-- Incidentes
+-- ---------------------------------------------------------------------------
+create or replace function sumar_resumen_incidentes(p_fecha timestamptz, p_area text, p_tipo text, p_delta integer)
+returns void
+language plpgsql
+as $$
+declare
+    v_local timestamp := p_fecha at time zone 'America/Lima';
+begin
+    if p_fecha is null then
+        return;
+    end if;
+    insert into resumen_incidentes_diario as r (dia, area, tipo, hora, cantidad)
+    values (v_local::date, coalesce(p_area, ''), coalesce(p_tipo, ''), extract(hour from v_local)::smallint, p_delta)
+    on conflict (dia, area, tipo, hora)
+    do update set cantidad = r.cantidad + excluded.cantidad;
+end;
+$$;
+
+create or replace function actualizar_resumen_incidentes()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_OP in ('UPDATE', 'DELETE') then
+        perform sumar_resumen_incidentes(OLD.fecha_hora, OLD.area, OLD.tipo, -1);
+    end if;
+    if TG_OP in ('INSERT', 'UPDATE') then
+        perform sumar_resumen_incidentes(NEW.fecha_hora, NEW.area, NEW.tipo, 1);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists trg_resumen_incidentes on incidentes;
+create trigger trg_resumen_incidentes
+    after insert or update of fecha_hora, area, tipo or delete on incidentes
+    for each row execute function actualizar_resumen_incidentes();
+
+-- ---------------------------------------------------------------------------
+-- Hallazgos
+-- ---------------------------------------------------------------------------
+create or replace function sumar_resumen_hallazgos(p_fecha timestamptz, p_categoria text, p_estado text, p_delta integer)
+returns void
+language plpgsql
+as $$
+begin
+    if p_fecha is null then
+        return;
+    end if;
+    insert into resumen_hallazgos_diario as r (dia, categoria, estado, cantidad)
+    values ((p_fecha at time zone 'America/Lima')::date, coalesce(p_categoria, ''), coalesce(p_estado, ''), p_delta)
+    on conflict (dia, categoria, estado)
+    do update set cantidad = r.cantidad + excluded.cantidad;
+end;
+$$;
+
+create or replace function actualizar_resumen_hallazgos()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_OP in ('UPDATE', 'DELETE') then
+        perform sumar_resumen_hallazgos(OLD.created_at, OLD.categoria, OLD.estado, -1);
+    end if;
+    if TG_OP in ('INSERT', 'UPDATE') then
+        perform sumar_resumen_hallazgos(NEW.created_at, NEW.categoria, NEW.estado, 1);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists trg_resumen_hallazgos on hallazgos;
+create trigger trg_resumen_hallazgos
+    after insert or update of created_at, categoria, estado or delete on hallazgos
+    for each row execute function actualizar_resumen_hallazgos();
+
+-- ---------------------------------------------------------------------------
+-- Asignaciones de EPP (el área es la del trabajador al momento del cambio)
+-- ---------------------------------------------------------------------------
+create or replace function sumar_resumen_epp(p_dia date, p_area text, p_estado text, p_delta integer)
+returns void
+language plpgsql
+as $$
+begin
+    if p_dia is null then
+        return;
+    end if;
+    insert into resumen_epp_diario as r (dia, area, estado, cantidad)
+    values (p_dia, coalesce(p_area, ''), coalesce(p_estado, ''), p_delta)
+    on conflict (dia, area, estado)
+    do update set cantidad = r.cantidad + excluded.cantidad;
+end;
+$$;
+
+create or replace function actualizar_resumen_epp()
+returns trigger
+language plpgsql
+as $$
+begin
+    if TG_OP in ('UPDATE', 'DELETE') then
+        perform sumar_resumen_epp(OLD.fecha_entrega::date, (select area from usuarios where id = OLD.trabajador_id), OLD.estado, -1);
+    end if;
+    if TG_OP in ('INSERT', 'UPDATE') then
+        perform sumar_resumen_epp(NEW.fecha_entrega::date, (select area from usuarios where id = NEW.trabajador_id), NEW.estado, 1);
+    end if;
+    return null;
+end;
+$$;
+
+drop trigger if exists trg_resumen_epp on epp_asignaciones;
+create trigger trg_resumen_epp
+    after insert or update of fecha_entrega, trabajador_id, estado or delete on epp_asignaciones
+    for each row execute function actualizar_resumen_epp();
+
+-- ---------------------------------------------------------------------------
+-- Reconstrucción completa desde las tablas base (carga inicial, o si se
+-- cambia el área de trabajadores con EPP asignado). Bloquea escrituras en
+-- las tablas base mientras corre para no perder ni duplicar conteos.
+-- ---------------------------------------------------------------------------
+create or replace function reconstruir_resumenes_diarios()
+returns void
+language plpgsql
+as $$
+begin
+    lock table incidentes, hallazgos, epp_asignaciones in share mode;
+    truncate resumen_incidentes_diario, resumen_hallazgos_diario, resumen_epp_diario;
+
+    insert into resumen_incidentes_diario (dia, area, tipo, hora, cantidad)
+    select (fecha_hora at time zone 'America/Lima')::date,
+           coalesce(area, ''),
+           coalesce(tipo, ''),
+           extract(hour from fecha_hora at time zone 'America/Lima')::smallint,
+           count(*)
+    from incidentes
+    where fecha_hora is not null
+    group by 1, 2, 3, 4;
+
+    insert into resumen_hallazgos_diario (dia, categoria, estado, cantidad)
+    select (created_at at time zone 'America/Lima')::date, coalesce(categoria, ''), coalesce(estado, ''), count(*)
+    from hallazgos
+    where created_at is not null
+    group by 1, 2, 3;
+
+    insert into resumen_epp_diario (dia, area, estado, cantidad)
+    select a.fecha_entrega::date, coalesce(u.area, ''), coalesce(a.estado, ''), count(*)
+    from epp_asignaciones a
+    left join usuarios u on u.id = a.trabajador_id
+    where a.fecha_entrega is not null
+    group by 1, 2, 3;
+end;
+$$;
+
+select reconstruir_resumenes_diarios();
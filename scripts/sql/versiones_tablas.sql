@@ -0,0 +1,41 @@
+-- Versión de datos por tabla, usada como parte de la clave de caché de reportes.
+-- Cada insert/update/delete incrementa la versión de la tabla afectada (una vez
+-- por sentencia, no por fila). Ejecutar una vez en el SQL Editor de Supabase.
+
+create table if not exists versiones_tablas (
+    tabla text primary key,
+    version bigint not null default 0,
+    actualizado_en timestamptz not null default now()
+);
+
+create or replace function incrementar_version_tabla()
+returns trigger
+language plpgsql
+as $$
+begin
+    insert into versiones_tablas as v (tabla, version, actualizado_en)
+    values (TG_TABLE_NAME, 1, now())
+    on conflict (tabla)
+    do update set version = v.version + 1, actualizado_en = now();
+    return null;
+end;
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array[
+        'incidentes', 'riesgos', 'epp_asignaciones', 'epp_catalogo', 'capacitaciones',
+        'asistentes_capacitacion', 'inspecciones', 'hallazgos', 'documentos', 'usuarios'
+    ]
+    loop
+        execute format('drop trigger if exists trg_version_%1$s on %1$I', t);
+        execute format(
+            'create trigger trg_version_%1$s after insert or update or delete or truncate on %1$I '
+            'for each statement execute function incrementar_version_tabla()', t
+        );
+        insert into versiones_tablas (tabla) values (t) on conflict do nothing;
+    end loop;
+end;
+$$;
@@ -0,0 +1,297 @@
+"""Tests de app/analytics con DataFrames chicos armados a mano (sin Streamlit ni Supabase)"""
+from datetime import date
+
+import pandas as pd
+import pytest
+
+from app.analytics import (
+    calcular_kpis, kpis_incidentes, kpis_epp, indicadores_legales, calcular_tasa_frecuencia,
+    clave_version, memorizar, limpiar_memo, kpis_por_version,
+    AREA_TOTAL, accidentes_mensuales, calcular_indicadores, serie_indicadores, totales_periodo
+)
+from app.analytics import memo
+
+HOY = date(2024, 6, 15)
+
+@pytest.fixture(autouse=True)
+def memo_vacio():
+    limpiar_memo()
+    yield
+    limpiar_memo()
+
+def datos_ejemplo():
+    return {
+        'incidentes': pd.DataFrame({
+            'tipo': ['accidente', 'accidente', 'incidente', 'enfermedad_laboral'],
+            'estado': ['cerrado', 'reportado', 'cerrado', 'reportado']
+        }),
+        'riesgos': pd.DataFrame({
+            'estado': ['pendiente', 'pendiente', 'controlado'],
+            'nivel_riesgo': [20, 9, 15]
+        }),
+        'epp': pd.DataFrame({
+            'fecha_vencimiento': ['2024-06-01', '2024-07-01', '2024-12-31']
+        }),
+        'hallazgos': pd.DataFrame({'estado': ['abierto', 'cerrado', 'abierto']}),
+        'capacitaciones': pd.DataFrame({'estado': ['realizada', 'programada', 'realizada', 'realizada']})
+    }
+
+# calcular_kpis
+
+def test_calcular_kpis_cuenta_por_columna():
+    kpis = calcular_kpis(datos_ejemplo(), HOY)
+    assert kpis['incidentes_total'] == 4
+    assert kpis['accidentes'] == 2
+    assert kpis['incidentes'] == 1
+    assert kpis['enfermedades'] == 1
+    assert kpis['riesgos_pendientes'] == 2
+    assert kpis['riesgos_criticos'] == 2
+    assert kpis['epp_vencidos'] == 1
+    assert kpis['epp_vence_30_dias'] == 2
+    assert kpis['hallazgos_abiertos'] == 2
+    assert kpis['capacitaciones_realizadas'] == 3
+    assert kpis['cumplimiento_capacitaciones'] == pytest.approx(75.0)
+    assert kpis['registros']['riesgos'] == 3
+
+def test_calcular_kpis_categorias_sin_filas_no_cuentan():
+    data = datos_ejemplo()
+    data['incidentes']['tipo'] = pd.Categorical(
+        data['incidentes']['tipo'], categories=['accidente', 'incidente', 'enfermedad_laboral', 'casi_accidente']
+    )
+    kpis = calcular_kpis(data, HOY)
+    assert 'casi_accidente' not in kpis['incidentes_por_tipo']
+    assert kpis['accidentes'] == 2
+
+def test_calcular_kpis_dataframes_vacios():
+    data = {clave: pd.DataFrame() for clave in datos_ejemplo()}
+    kpis = calcular_kpis(data, HOY)
+    assert kpis['incidentes_total'] == 0
+    assert kpis['incidentes_por_tipo'] == {}
+    assert kpis['accidentes'] is None
+    assert kpis['riesgos_criticos'] is None
+    assert kpis['epp_vencidos'] is None
+    assert kpis['capacitaciones_total'] == 0
+    assert kpis['cumplimiento_capacitaciones'] is None
+
+def test_calcular_kpis_columnas_ausentes_quedan_en_none():
+    data = {
+        'incidentes': pd.DataFrame({'codigo': ['INC-1']}),
+        'riesgos': pd.DataFrame({'area': ['Almacén']}),
+        'epp': pd.DataFrame({'estado': ['activo']})
+    }
+    kpis = calcular_kpis(data, HOY)
+    assert kpis['incidentes_total'] == 1
+    assert kpis['accidentes'] is None
+    assert kpis['riesgos_pendientes'] is None
+    assert kpis['riesgos_criticos'] is None
+    assert kpis['epp_vence_30_dias'] is None
+    assert kpis['hallazgos_abiertos'] is None
+
+# kpis_incidentes
+
+def test_kpis_incidentes_desde_json():
+    df = pd.DataFrame({
+        'estado': ['cerrado', 'reportado', 'cerrado', 'reportado'],
+        'consecuencias': [
+            '{"lesiones": "Leve", "danos": "No", "gravedad": 2}',
+            {'lesiones': 'No', 'danos': 'Mayor', 'gravedad': 3},
+            'no es json',
+            None
+        ]
+    })
+    kpis = kpis_incidentes(df, horas_hombre=500_000)
+    assert kpis['total'] == 4
+    assert kpis['cerrados'] == 2
+    assert kpis['tasa_cierre'] == pytest.approx(50.0)
+    assert kpis['riesgo_promedio'] == pytest.approx(5 / 4)
+    assert kpis['con_lesion'] == 1
+    assert kpis['tasa_frecuencia'] == pytest.approx(calcular_tasa_frecuencia(1, 500_000))
+
+def test_kpis_incidentes_columnas_decodificadas():
+    df = pd.DataFrame({
+        'estado': pd.Categorical(['cerrado', 'reportado', 'reportado']),
+        'lesiones': pd.Categorical(['Grave', 'No', None]),
+        'gravedad': [6.0, 1.0, None]
+    })
+    kpis = kpis_incidentes(df)
+    assert kpis['cerrados'] == 1
+    assert kpis['riesgo_promedio'] == pytest.approx(7 / 3)
+    assert kpis['con_lesion'] == 1
+    assert kpis['tasa_frecuencia'] is None
+
+def test_kpis_incidentes_vacio_y_sin_consecuencias():
+    vacio = kpis_incidentes(pd.DataFrame())
+    assert vacio == {
+        'total': 0, 'cerrados': 0, 'tasa_cierre': 0, 'riesgo_promedio': 0,
+        'con_lesion': 0, 'tasa_frecuencia': None
+    }
+    sin_consecuencias = kpis_incidentes(pd.DataFrame({'estado': ['reportado']}))
+    assert sin_consecuencias['riesgo_promedio'] == 0
+    assert sin_consecuencias['con_lesion'] == 0
+
+# kpis_epp
+
+def test_kpis_epp_vencidos_y_por_vencer():
+    asignaciones = pd.DataFrame({
+        'estado': ['activo', 'activo', 'activo', 'devuelto'],
+        'fecha_vencimiento': ['2024-06-10', '2024-07-01', '2025-01-01', '2024-01-01']
+    })
+    kpis = kpis_epp(asignaciones, HOY)
+    assert kpis == {'activos': 3, 'vencidos': 1, 'por_vencer': 1, 'cumplimiento': pytest.approx(200 / 3)}
+
+def test_kpis_epp_vacio_o_sin_columnas():
+    esperado = {'activos': 0, 'vencidos': 0, 'por_vencer': 0, 'cumplimiento': 0}
+    assert kpis_epp(pd.DataFrame(), HOY) == esperado
+    assert kpis_epp(None, HOY) == esperado
+    sin_vencimiento = kpis_epp(pd.DataFrame({'estado': ['activo', 'activo']}), HOY)
+    assert sin_vencimiento == {'activos': 2, 'vencidos': 0, 'por_vencer': 0, 'cumplimiento': 100.0}
+
+# indicadores_legales
+
+def test_indicadores_legales_combina_kpis_y_totales():
+    kpis = {'incidentes': 4, 'enfermedades': None}
+    totales = {
+        'tasa_frecuencia': 2.5, 'tasa_severidad': 10.0, 'indice_incidencia': 1.2,
+        'accidentes': 3, 'dias_perdidos': 12
+    }
+    assert indicadores_legales(kpis, totales) == {
+        'tasa_frecuencia': 2.5, 'tasa_severidad': 10.0, 'indice_incidencia': 1.2,
+        'accidentes': 3, 'dias_perdidos': 12, 'incidentes': 4, 'enfermedades': 0
+    }
+
+def test_indicadores_legales_sin_horas_hombre():
+    assert indicadores_legales({'incidentes': 1, 'enfermedades': 0}, None) is None
+
+# indicadores: TF, TS e II desde la serie de horas hombre
+
+def horas_ejemplo():
+    return pd.DataFrame({
+        'periodo': ['2024-01-01', '2024-01-01', '2024-03-01'],
+        'area': ['Producción', 'Almacén', 'Producción'],
+        'trabajadores': [10, 5, 10],
+        'horas_trabajadas': [2000, 1000, 2000],
+        'dias_perdidos': [0, 3, 6]
+    })
+
+def incidentes_indicadores():
+    return pd.DataFrame({
+        # 2024-02-01 04:00 UTC es el 31 de enero en Lima
+        'fecha_hora': ['2024-01-10T15:00:00+00:00', '2024-02-01T04:00:00+00:00',
+                       '2024-03-05T15:00:00+00:00', '2024-03-06T15:00:00+00:00'],
+        'area': ['Producción', 'Almacén', 'Producción', None],
+        'tipo': ['accidente', 'accidente', 'incidente', 'accidente']
+    })
+
+def fila(indicadores, periodo, area, ventana):
+    filas = indicadores[
+        (indicadores['periodo'] == pd.Timestamp(periodo)) & (indicadores['area'] == area) & (indicadores['ventana'] == ventana)
+    ]
+    assert len(filas) == 1
+    return filas.iloc[0]
+
+def test_accidentes_mensuales_por_area_y_total():
+    accidentes = accidentes_mensuales(incidentes_indicadores())
+    conteo = {(str(p.date()), a): n for p, a, n in accidentes.itertuples(index=False)}
+    # Solo accidentes; el que no tiene área cuenta en el total de la empresa
+    assert conteo == {
+        ('2024-01-01', 'Producción'): 1, ('2024-01-01', 'Almacén'): 1,
+        ('2024-01-01', AREA_TOTAL): 2, ('2024-03-01', AREA_TOTAL): 1
+    }
+    assert accidentes_mensuales(pd.DataFrame()).empty
+
+def test_calcular_indicadores_mensual():
+    indicadores = calcular_indicadores(horas_ejemplo(), accidentes_mensuales(incidentes_indicadores()))
+    produccion = fila(indicadores, '2024-01-01', 'Producción', 'mensual')
+    assert produccion['tasa_frecuencia'] == pytest.approx(500)       # 1 × 10⁶ / 2000
+    assert produccion['indice_incidencia'] == pytest.approx(10)      # 1 / 10 × 100
+    total = fila(indicadores, '2024-01-01', AREA_TOTAL, 'mensual')
+    assert (total['accidentes'], total['horas_hombre'], total['trabajadores']) == (2, 3000, 15)
+    assert total['tasa_severidad'] == pytest.approx(1000)            # 3 × 10⁶ / 3000
+    # Febrero no tiene horas: el mes existe en la grilla pero sin tasas
+    febrero = fila(indicadores, '2024-02-01', AREA_TOTAL, 'mensual')
+    assert febrero['horas_hombre'] == 0 and pd.isna(febrero['tasa_frecuencia'])
+
+def test_calcular_indicadores_doce_meses_moviles():
+    indicadores = calcular_indicadores(horas_ejemplo(), accidentes_mensuales(incidentes_indicadores()))
+    movil = fila(indicadores, '2024-03-01', AREA_TOTAL, '12m')
+    assert (movil['accidentes'], movil['dias_perdidos'], movil['horas_hombre']) == (3, 9, 5000)
+    # Trabajadores: promedio de los meses con horas (15 y 10), no de los tres meses
+    assert movil['trabajadores'] == pytest.approx(12.5)
+    assert movil['tasa_frecuencia'] == pytest.approx(600)
+    assert movil['tasa_severidad'] == pytest.approx(1800)
+    assert movil['indice_incidencia'] == pytest.approx(24)
+    assert calcular_indicadores(pd.DataFrame(), pd.DataFrame()).empty
+
+def test_totales_periodo_recalcula_tasas_desde_componentes():
+    indicadores = calcular_indicadores(horas_ejemplo(), accidentes_mensuales(incidentes_indicadores()))
+    empresa = totales_periodo(indicadores)
+    assert (empresa['accidentes'], empresa['dias_perdidos'], empresa['horas_hombre']) == (3, 9, 5000)
+    assert empresa['tasa_frecuencia'] == pytest.approx(600)
+    assert empresa['indice_incidencia'] == pytest.approx(24)
+
+    # Dos áreas: se suman los componentes, no se promedian las tasas
+    areas = totales_periodo(indicadores, ['Producción', 'Almacén'])
+    assert (areas['accidentes'], areas['horas_hombre']) == (2, 5000)
+    assert areas['tasa_frecuencia'] == pytest.approx(400)
+
+    movil = totales_periodo(indicadores, ['Almacén'], ventana='12m')
+    assert (movil['accidentes'], movil['dias_perdidos'], movil['horas_hombre']) == (1, 3, 1000)
+
+    assert totales_periodo(indicadores[indicadores['horas_hombre'] == 0]) is None
+    assert totales_periodo(pd.DataFrame()) is None
+
+def test_serie_indicadores_suma_areas_por_mes():
+    indicadores = calcular_indicadores(horas_ejemplo(), accidentes_mensuales(incidentes_indicadores()))
+    serie = serie_indicadores(indicadores, ['Producción', 'Almacén'])
+    enero = serie[(serie['periodo'] == pd.Timestamp('2024-01-01')) & (serie['ventana'] == 'mensual')].iloc[0]
+    assert (enero['accidentes'], enero['horas_hombre']) == (2, 3000)
+    assert enero['tasa_frecuencia'] == pytest.approx(2 * 1_000_000 / 3000)
+
+# memo: invalidación por versión y por día
+
+def test_clave_version_cambia_con_version_y_dia():
+    filtros = {'areas': ['B', 'A'], 'fecha_inicio': date(2024, 1, 1)}
+    base = clave_version('kpis', filtros, {'incidentes': 1}, HOY)
+    assert base == clave_version('kpis', {'fecha_inicio': date(2024, 1, 1), 'areas': ['A', 'B']}, {'incidentes': 1}, HOY)
+    assert base != clave_version('kpis', filtros, {'incidentes': 2}, HOY)
+    assert base != clave_version('kpis', filtros, {'incidentes': 1}, date(2024, 6, 16))
+    assert clave_version('kpis', filtros, None, HOY) is None
+
+def test_memorizar_reutiliza_hasta_que_cambia_la_version():
+    llamadas = []
+    def calcular():
+        llamadas.append(1)
+        return len(llamadas)
+
+    clave = clave_version('kpis', {}, {'incidentes': 1}, HOY)
+    assert memorizar(clave, calcular) == 1
+    assert memorizar(clave, calcular) == 1
+    nueva = clave_version('kpis', {}, {'incidentes': 2}, HOY)
+    assert memorizar(nueva, calcular) == 2
+    assert len(llamadas) == 2
+
+def test_memorizar_sin_clave_no_guarda():
+    llamadas = []
+    memorizar(None, lambda: llamadas.append(1))
+    memorizar(None, lambda: llamadas.append(1))
+    assert len(llamadas) == 2
+
+def test_memorizar_desaloja_la_entrada_menos_usada(monkeypatch):
+    monkeypatch.setattr(memo, 'MAXIMO_ENTRADAS', 2)
+    llamadas = []
+    def calcular(valor):
+        return lambda: llamadas.append(valor) or valor
+
+    memorizar('a', calcular('a'))
+    memorizar('b', calcular('b'))
+    memorizar('a', calcular('a'))  # 'a' pasa a ser la más reciente
+    memorizar('c', calcular('c'))  # desaloja 'b'
+    memorizar('a', calcular('a'))
+    memorizar('b', calcular('b'))
+    assert llamadas == ['a', 'b', 'c', 'b']
+
+def test_kpis_por_version_invalida_por_dia():
+    data = dict(datos_ejemplo(), versiones={'epp_asignaciones': 1}, origen='dashboard')
+    # Con la misma versión, el día cambia los vencimientos de EPP
+    assert kpis_por_version(data, {}, date(2024, 6, 15))['epp_vencidos'] == 1
+    assert kpis_por_version(data, {}, date(2024, 7, 2))['epp_vencidos'] == 2
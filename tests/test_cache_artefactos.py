@@ -0,0 +1,22 @@
+"""Tests de app/utils/cache_artefactos.py: clave de los reportes generados"""
+from datetime import date
+
+from app.utils.cache_artefactos import clave_artefacto
+
+FILTROS = {'fecha_inicio': date(2024, 1, 1), 'fecha_fin': date(2024, 3, 31), 'areas': ['Almacén', 'Producción']}
+VERSIONES = {'incidentes': 3, 'epp_asignaciones': 7}
+
+def test_misma_clave_con_filtros_equivalentes():
+    otra_forma = dict(FILTROS, areas=['Producción', 'Almacén'])
+    assert clave_artefacto('PDF', 'Completo', FILTROS, VERSIONES, hoy=date(2024, 4, 1)) == \
+        clave_artefacto('PDF', 'Completo', otra_forma, dict(VERSIONES), hoy=date(2024, 4, 1))
+
+def test_clave_cambia_con_versiones_formato_y_dia():
+    base = clave_artefacto('PDF', 'Completo', FILTROS, VERSIONES, hoy=date(2024, 4, 1))
+    assert base != clave_artefacto('PDF', 'Completo', FILTROS, dict(VERSIONES, incidentes=4), hoy=date(2024, 4, 1))
+    assert base != clave_artefacto('Excel', 'Completo', FILTROS, VERSIONES, hoy=date(2024, 4, 1))
+    # EPP por vencer y días de atraso cambian de un día a otro sin cambios en las tablas
+    assert base != clave_artefacto('PDF', 'Completo', FILTROS, VERSIONES, hoy=date(2024, 4, 2))
+
+def test_sin_versiones_no_se_cachea():
+    assert clave_artefacto('PDF', 'Completo', FILTROS, None) is None
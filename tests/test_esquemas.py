@@ -0,0 +1,81 @@
+"""Tests de app/utils/esquemas.py: tablas tipadas y conjuntos de solo lectura"""
+import pickle
+
+import pandas as pd
+import pytest
+
+from app.utils.esquemas import aplicar_esquema, solo_lectura
+
+def incidentes_ejemplo():
+    return [
+        {
+            'id': 1, 'codigo': 'INC-1', 'tipo': 'accidente', 'area': 'Producción', 'estado': 'cerrado',
+            'fecha_hora': '2024-03-01T15:30:00+00:00', 'usuarios': {'nombre_completo': 'Ana Torres'},
+            'consecuencias': '{"lesiones": "Leve", "danos": "No", "gravedad": 2}'
+        },
+        {
+            'id': 2, 'codigo': 'INC-2', 'tipo': 'incidente', 'area': 'Almacén', 'estado': 'reportado',
+            'fecha_hora': '2024-03-02T04:00:00+00:00', 'usuarios': None,
+            'consecuencias': {'lesiones': 'No', 'danos': 'Menor', 'gravedad': 1}
+        }
+    ]
+
+def conjunto_cargado():
+    """Como lo devuelven cargar_datos_reporte / cargar_datos_dashboard"""
+    return solo_lectura({
+        'incidentes': aplicar_esquema('incidentes', incidentes_ejemplo()),
+        'riesgos': aplicar_esquema('riesgos', [
+            {'area': 'Producción', 'tipo_peligro': 'Mecánico', 'estado': 'pendiente',
+             'probabilidad': 4, 'severidad': 5, 'nivel_riesgo': 20}
+        ]),
+        'hallazgos': pd.DataFrame(),
+        'versiones': {'incidentes': 3, 'riesgos': 1},
+        'origen': 'reportes'
+    })
+
+def test_solo_lectura_se_serializa_con_pickle():
+    data = conjunto_cargado()
+    copia = pickle.loads(pickle.dumps(data))
+    assert set(copia) == set(data)
+    assert copia['versiones'] == data['versiones']
+    assert copia['origen'] == 'reportes'
+    pd.testing.assert_frame_equal(copia['incidentes'], data['incidentes'])
+    pd.testing.assert_frame_equal(copia['riesgos'], data['riesgos'])
+
+def test_solo_lectura_no_admite_cambios():
+    data = conjunto_cargado()
+    with pytest.raises(TypeError):
+        data['incidentes'] = pd.DataFrame()
+    assert solo_lectura(None) is None
+    assert dict(data)['origen'] == 'reportes'
+
+@pytest.mark.parametrize('copy_on_write', [True, False])
+def test_solo_lectura_protege_los_dataframes(copy_on_write):
+    with pd.option_context('mode.copy_on_write', copy_on_write):
+        data = conjunto_cargado()
+        original = data['riesgos'].copy(deep=True)
+
+        riesgos = data['riesgos']
+        riesgos.loc[0, 'nivel_riesgo'] = 99
+        riesgos['nueva'] = 1
+        data['incidentes'].drop(columns='area', inplace=True)
+        data['versiones']['incidentes'] = 0
+
+        pd.testing.assert_frame_equal(data['riesgos'], original)
+        assert 'area' in data['incidentes'].columns
+        assert data['versiones'] == {'incidentes': 3, 'riesgos': 1}
+
+def test_aplicar_esquema_tipa_y_aplana():
+    df = aplicar_esquema('incidentes', incidentes_ejemplo())
+    assert isinstance(df['area'].dtype, pd.CategoricalDtype)
+    assert df['reportante'].tolist()[0] == 'Ana Torres'
+    assert pd.isna(df['reportante'].tolist()[1])
+    # Hora de Lima (UTC-5) sin zona: el 2 de marzo a las 04:00 UTC es el 1 de marzo
+    assert df['dia'].tolist() == [pd.Timestamp('2024-03-01'), pd.Timestamp('2024-03-01')]
+    assert df['hora'].tolist() == [10, 23]
+    assert df['gravedad'].tolist() == [2, 1]
+    assert df['lesiones'].tolist() == ['Leve', 'No']
+
+def test_aplicar_esquema_sin_filas():
+    assert aplicar_esquema('incidentes', []).empty
+    assert aplicar_esquema('incidentes', None).empty
@@ -0,0 +1,31 @@
+"""Tests de app/utils/filtros.py: formas canónicas de los filtros para las cachés"""
+from datetime import date, datetime
+
+from app.utils.filtros import clave_filtros, filtros_de_carga
+
+CAMPOS = ['fecha_inicio', 'fecha_fin', 'areas', 'tipos_incidente']
+
+def test_selecciones_equivalentes_dan_la_misma_clave():
+    a = filtros_de_carga({
+        'fecha_inicio': datetime(2024, 1, 1, 8, 30), 'fecha_fin': date(2024, 3, 31),
+        'areas': ['Producción', 'Almacén', 'Almacén'], 'tipos_incidente': [], 'nivel_riesgo_min': 5
+    }, CAMPOS)
+    b = filtros_de_carga({
+        'fecha_inicio': date(2024, 1, 1), 'fecha_fin': datetime(2024, 3, 31),
+        'areas': ('Almacén', 'Producción'), 'tipos_incidente': []
+    }, CAMPOS)
+    assert a == b == {
+        'fecha_inicio': date(2024, 1, 1), 'fecha_fin': date(2024, 3, 31),
+        'areas': ['Almacén', 'Producción'], 'tipos_incidente': []
+    }
+    assert clave_filtros(a) == clave_filtros(b)
+
+def test_todas_las_areas_equivale_a_ninguna():
+    disponibles = ['Almacén', 'Producción']
+    todas = filtros_de_carga({'areas': ['Producción', 'Almacén']}, CAMPOS, disponibles)
+    ninguna = filtros_de_carga({'areas': []}, CAMPOS, disponibles)
+    assert todas == ninguna
+    assert filtros_de_carga({'areas': ['Almacén']}, CAMPOS, disponibles)['areas'] == ['Almacén']
+
+def test_campos_faltantes_quedan_en_none():
+    assert filtros_de_carga(None, ['areas']) == {'areas': None}
@@ -0,0 +1,41 @@
+"""Tests de app/utils/importacion_helper.py: lectura por bloques de matrices IPERC"""
+import pandas as pd
+from openpyxl import Workbook
+
+from app.utils.importacion_helper import leer_archivo_en_bloques, normalizar_serie
+
+def matriz_irregular(ruta):
+    libro = Workbook()
+    hoja = libro.active
+    hoja.append(['Área', 'Peligro', 'Probabilidad', 'Severidad'])
+    hoja.append(['Producción', 'Ruido', 3, 2])
+    hoja.append(['Almacén', 'Caída'])                     # fila corta
+    hoja.append([None, None, None, None])                  # fila vacía
+    hoja.append(['Taller', 'Corte', 4, 5, 'nota suelta'])  # fila más larga que el encabezado
+    libro.save(ruta)
+    return ruta
+
+def test_excel_con_filas_irregulares(tmp_path):
+    ruta = matriz_irregular(tmp_path / 'iperc.xlsx')
+    bloques = list(leer_archivo_en_bloques(str(ruta), tamano_bloque=2))
+    assert [len(b) for b in bloques] == [2, 1]
+    for bloque in bloques:
+        assert list(bloque.columns) == ['Área', 'Peligro', 'Probabilidad', 'Severidad']
+
+    primero, segundo = bloques
+    # La fila corta se completa con vacíos en lugar de desplazar columnas
+    assert primero.loc[3].tolist() == ['Almacén', 'Caída', '', '']
+    # Las celdas de más se descartan; el índice es el número de fila del archivo
+    assert segundo.index.tolist() == [5]
+    assert segundo.loc[5].tolist() == ['Taller', 'Corte', '4', '5']
+
+def test_csv_conserva_numero_de_fila(tmp_path):
+    ruta = tmp_path / 'iperc.csv'
+    ruta.write_text('area,peligro\nProducción,Ruido\nAlmacén,\n', encoding='utf-8')
+    bloque, = leer_archivo_en_bloques(str(ruta))
+    assert bloque.index.tolist() == [2, 3]
+    assert bloque.loc[3, 'peligro'] == ''
+
+def test_normalizar_serie():
+    serie = pd.Series(['  Área  de  Producción', None, 'ALMACÉN'])
+    assert normalizar_serie(serie).tolist() == ['area de produccion', '', 'almacen']
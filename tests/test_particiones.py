@@ -0,0 +1,79 @@
+"""Tests de app/utils/particiones.py: reportes por área desde una sola carga"""
+import json
+
+import pandas as pd
+
+from app.analytics import resumir_incidentes
+from app.utils.esquemas import aplicar_esquema, solo_lectura
+from app.utils.particiones import SIN_AREA, areas_destino, particionar_por_area
+
+def conjunto_cargado():
+    """Como lo devuelve cargar_datos_reporte: tablas tipadas y de solo lectura"""
+    incidentes = aplicar_esquema('incidentes', [
+        {'id': i, 'tipo': 'incidente', 'area': area, 'fecha_hora': f'2024-03-0{i}T15:00:00+00:00'}
+        for i, area in enumerate(['Producción', 'Almacén', None, 'Producción'], start=1)
+    ])
+    return solo_lectura({
+        'incidentes': incidentes,
+        'resumen_incidentes': resumir_incidentes(incidentes),
+        'riesgos': aplicar_esquema('riesgos', [{'id': 1, 'area': 'Almacén', 'nivel_riesgo': 12}]),
+        'epp': aplicar_esquema('epp_asignaciones', [
+            {'id': 1, 'estado': 'activo', 'usuarios!epp_asignaciones_trabajador_id_fkey': {'nombre_completo': 'Ana', 'area': 'Producción'}},
+            {'id': 2, 'estado': 'activo', 'usuarios!epp_asignaciones_trabajador_id_fkey': {'nombre_completo': 'Luis', 'area': 'Almacén'}},
+            {'id': 3, 'estado': 'activo', 'usuarios!epp_asignaciones_trabajador_id_fkey': {'nombre_completo': 'Eva', 'area': None}}
+        ]),
+        'capacitaciones': aplicar_esquema('capacitaciones', [
+            {'id': 1, 'tema': 'EPP', 'area_destino': json.dumps(['Producción', 'Almacén'])},
+            {'id': 2, 'tema': 'Extintores', 'area_destino': json.dumps(['Almacén'])},
+            {'id': 3, 'tema': 'Inducción', 'area_destino': '[]'}
+        ]),
+        'inspecciones': aplicar_esquema('inspecciones', [
+            {'id': 10, 'area': 'Producción'}, {'id': 11, 'area': None}
+        ]),
+        'hallazgos': aplicar_esquema('hallazgos', [
+            {'id': 1, 'inspeccion_id': 10}, {'id': 2, 'inspeccion_id': 11}, {'id': 3, 'inspeccion_id': 99}
+        ]),
+        'documentos': aplicar_esquema('documentos', [{'id': 1, 'titulo': 'Política SST'}]),
+        'versiones': {'incidentes': 1},
+        'origen': 'reportes'
+    })
+
+def ids(partes, tabla):
+    return {area: sorted(data[tabla]['id'].tolist()) for area, data in partes.items()}
+
+def test_cada_fila_en_su_area_y_sin_area_explicita():
+    partes = particionar_por_area(conjunto_cargado())
+    assert list(partes) == ['Almacén', 'Producción', SIN_AREA]
+    assert ids(partes, 'incidentes') == {'Almacén': [2], 'Producción': [1, 4], SIN_AREA: [3]}
+    # El resumen diario usa '' para el área nula: va a la misma parte que sus incidentes
+    assert {area: int(data['resumen_incidentes']['cantidad'].sum()) for area, data in partes.items()} == \
+        {'Almacén': 1, 'Producción': 2, SIN_AREA: 1}
+    assert ids(partes, 'riesgos') == {'Almacén': [1], 'Producción': [], SIN_AREA: []}
+
+def test_capacitaciones_se_reparten_por_area_destino():
+    partes = particionar_por_area(conjunto_cargado())
+    assert ids(partes, 'capacitaciones') == {'Almacén': [1, 2], 'Producción': [1], SIN_AREA: [3]}
+    # Ninguna parte con la lista JSON como si fuera un área
+    assert not any(area.startswith('[') for area in partes)
+
+def test_epp_por_area_del_trabajador_y_hallazgos_por_inspeccion():
+    partes = particionar_por_area(conjunto_cargado())
+    assert ids(partes, 'epp') == {'Almacén': [2], 'Producción': [1], SIN_AREA: [3]}
+    assert ids(partes, 'hallazgos') == {'Almacén': [], 'Producción': [1], SIN_AREA: [2, 3]}
+    # Las tablas sin área se comparten; los metadatos se conservan
+    assert all(len(data['documentos']) == 1 and data['origen'] == 'reportes' for data in partes.values())
+
+def test_areas_pedidas_y_categorias_de_la_parte():
+    partes = particionar_por_area(conjunto_cargado(), ['Producción'])
+    assert list(partes) == ['Producción']
+    incidentes = partes['Producción']['incidentes']
+    assert list(incidentes['area'].cat.categories) == ['Producción']
+
+def test_areas_destino():
+    assert areas_destino('["Producción", "Almacén"]') == ['Producción', 'Almacén']
+    assert areas_destino(['Almacén']) == ['Almacén']
+    assert areas_destino('Oficinas') == ['Oficinas']
+    assert areas_destino(None) == [] and areas_destino('') == [] and areas_destino(float('nan')) == []
+
+def test_sin_datos():
+    assert particionar_por_area({'incidentes': pd.DataFrame(), 'versiones': {}}) == {}
@@ -0,0 +1,50 @@
+"""Tests de app/utils/pdf_tablas.py: listados largos del PDF en segmentos"""
+import io
+
+import pandas as pd
+import pytest
+from reportlab.lib.pagesizes import A4
+from reportlab.platypus import LongTable, Paragraph, SimpleDocTemplate
+
+from app.utils.pdf_tablas import calcular_anchos_columnas, tabla_paginada
+
+def listado(filas):
+    return pd.DataFrame({
+        'codigo': [f'INC-{i}' for i in range(filas)],
+        'descripcion': ['x' * 80] * filas,
+        'area': pd.Categorical(['Producción', None] * (filas // 2) + ['Almacén'] * (filas % 2))
+    })
+
+def test_segmentos_con_encabezado_repetido():
+    partes = list(tabla_paginada(listado(1050), ['codigo', 'descripcion'], filas_por_segmento=500))
+    assert [type(p) for p in partes] == [LongTable] * 3
+    assert [len(p._cellvalues) for p in partes] == [501, 501, 51]
+    assert all(p._cellvalues[0] == ['codigo', 'descripcion'] for p in partes)
+    assert all(p.repeatRows == 1 for p in partes)
+
+def test_celdas_largas_se_truncan():
+    tabla, = tabla_paginada(listado(2), ['codigo', 'descripcion', 'area'], largo_maximo=20)
+    assert tabla._cellvalues[1] == ['INC-0', 'x' * 17 + '...', 'Producción']
+
+def test_listado_se_corta_con_nota():
+    partes = list(tabla_paginada(listado(30), ['codigo'], filas_por_segmento=10, maximo_filas=25))
+    tablas = [p for p in partes if isinstance(p, LongTable)]
+    assert sum(len(t._cellvalues) - 1 for t in tablas) == 25
+    assert isinstance(partes[-1], Paragraph)
+    assert 'Se muestran 25 de 30 filas' in partes[-1].getPlainText()
+
+    sin_tope = list(tabla_paginada(listado(30), ['codigo'], filas_por_segmento=10, maximo_filas=None))
+    assert all(isinstance(p, LongTable) for p in sin_tope)
+
+def test_anchos_proporcionales_y_pdf_valido():
+    df = listado(40)
+    anchos = calcular_anchos_columnas(df, ['codigo', 'descripcion'], ancho_total=500)
+    assert sum(anchos) == pytest.approx(500)
+    assert anchos[1] > anchos[0]
+
+    salida = io.BytesIO()
+    SimpleDocTemplate(salida, pagesize=A4).build(list(tabla_paginada(df, ['codigo', 'descripcion'], filas_por_segmento=15)))
+    assert salida.getvalue().startswith(b'%PDF')
+
+def test_listado_vacio():
+    assert list(tabla_paginada(listado(0), ['codigo'])) == []